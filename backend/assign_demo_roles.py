@@ -12,6 +12,8 @@ import sys
 
 sys.path.append('/app/backend')
 
+from permission_cache import permission_cache
+
 load_dotenv()
 
 # Database connection
@@ -77,6 +79,7 @@ async def assign_roles_to_demo():
                 "assigned_by": "system"
             }
             await user_roles_collection.insert_one(assignment_doc)
+            permission_cache.invalidate_user(user_id)
             print(f"✅ Assigned Manager role to demo account")
         
         # Get all role assignments for this user
@@ -13,6 +13,7 @@ import sys
 sys.path.append('/app/backend')
 
 from auth import get_password_hash
+from permission_cache import permission_cache
 
 load_dotenv()
 
@@ -120,6 +121,7 @@ async def assign_superadmin_role_to_admin():
                 "assigned_by": "system"
             }
             await user_roles_collection.insert_one(assignment_doc)
+            permission_cache.invalidate_user(user_id)
             print(f"✓ Assigned superadmin role to admin@afms.com")
         
         # Also assign Administrator role for compatibility
@@ -144,6 +146,7 @@ async def assign_superadmin_role_to_admin():
                     "assigned_by": "system"
                 }
                 await user_roles_collection.insert_one(assignment_doc)
+                permission_cache.invalidate_user(user_id)
                 print(f"✓ Assigned Administrator role to admin@afms.com")
         
         # Get all role assignments for this user
@@ -5,15 +5,18 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
+import asyncio
 import os
 from enum import Enum
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import WriteConcern
 import uuid
 from database import database, users_collection, companies_collection, audit_logs_collection
 import logging
 import random
 from faker import Faker
 from token_blacklist import token_blacklist
+from permission_cache import permission_cache, request_permission_cache
 from rate_limiter import rate_limiter
 from security_utils import validate_password_strength
 
@@ -167,6 +170,9 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Account is deactivated"
         )
+    
+    # Fresh per-request memo for RBAC checks (see rbac.has_permission)
+    request_permission_cache.set({})
         
     return user
 
@@ -205,11 +211,104 @@ async def log_audit_event(
         "user_agent": user_agent
     }
     
+    # Hand off to the background writer when it is running (API server);
+    # scripts and workers without the writer fall back to a direct insert
+    if _audit_writer_task is not None and not _audit_writer_task.done():
+        try:
+            audit_queue.put_nowait(audit_event)
+            return
+        except asyncio.QueueFull:
+            # Writer is falling behind; apply backpressure with a direct insert
+            pass
+    
     try:
-        await audit_logs_collection.insert_one(audit_event)
+        await audit_log_writes.insert_one(audit_event)
     except Exception as e:
         logger.error(f"Failed to log audit event: {e}")
 
+# ============================================================================
+# AUDIT LOG BACKGROUND WRITER
+# ============================================================================
+
+# Audit events are queued by log_audit_event and written in batches so the
+# insert round-trip stays off the request path
+AUDIT_FLUSH_INTERVAL_SECONDS = 0.2
+AUDIT_MAX_BATCH_SIZE = 100
+AUDIT_QUEUE_MAX_SIZE = 10000
+
+# Audit writes only wait for the primary's acknowledgement (no journal or
+# replication wait); business writes keep the client's default write concern
+audit_log_writes = audit_logs_collection.with_options(
+    write_concern=WriteConcern(w=1, j=False)
+)
+
+audit_queue: asyncio.Queue = asyncio.Queue(maxsize=AUDIT_QUEUE_MAX_SIZE)
+_audit_writer_task: Optional[asyncio.Task] = None
+_AUDIT_QUEUE_STOP = object()
+
+async def _write_audit_batch(batch: List[Dict[str, Any]]):
+    """Insert a batch of audit events in one round-trip"""
+    try:
+        await audit_log_writes.insert_many(batch, ordered=False, bypass_document_validation=True)
+    except Exception as e:
+        logger.error(f"Failed to write {len(batch)} audit event(s): {e}")
+
+async def _flush_audit_queue():
+    """Drain the audit queue, flushing every batch interval or batch size"""
+    loop = asyncio.get_running_loop()
+    stopping = False
+    
+    while not stopping:
+        event = await audit_queue.get()
+        if event is _AUDIT_QUEUE_STOP:
+            break
+        
+        batch = [event]
+        deadline = loop.time() + AUDIT_FLUSH_INTERVAL_SECONDS
+        while len(batch) < AUDIT_MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(audit_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if event is _AUDIT_QUEUE_STOP:
+                stopping = True
+                break
+            batch.append(event)
+        
+        await _write_audit_batch(batch)
+    
+    # Flush anything still queued after the stop marker
+    remaining = []
+    while not audit_queue.empty():
+        event = audit_queue.get_nowait()
+        if event is not _AUDIT_QUEUE_STOP:
+            remaining.append(event)
+    if remaining:
+        await _write_audit_batch(remaining)
+
+def start_audit_log_writer():
+    """Start the background audit log writer on the running event loop"""
+    global _audit_writer_task
+    if _audit_writer_task is None or _audit_writer_task.done():
+        _audit_writer_task = asyncio.create_task(_flush_audit_queue())
+        logger.info("✅ Audit log writer started")
+
+async def stop_audit_log_writer():
+    """Stop the audit log writer after flushing all queued events"""
+    global _audit_writer_task
+    if _audit_writer_task is None:
+        return
+    
+    task = _audit_writer_task
+    _audit_writer_task = None
+    if not task.done():
+        await audit_queue.put(_AUDIT_QUEUE_STOP)
+        await task
+    logger.info("Audit log writer stopped")
+
 @auth_router.post("/register", response_model=Token)
 async def register_user(user_data: UserRegister, request: Request):
     """Register a new user and company"""
@@ -299,6 +398,7 @@ async def register_user(user_data: UserRegister, request: Request):
                 "assigned_by": "system"
             }
             await user_roles_collection.insert_one(assignment_doc)
+            permission_cache.invalidate_user(user_id)
             logger.info(f"✅ Auto-assigned superadmin role to first user: {user_data.email}")
     
     # Create tokens
@@ -1108,6 +1208,7 @@ async def assign_manager_role_to_user(user_id: str, company_id: str):
             "assigned_by": "system"
         }
         await user_roles_collection.insert_one(assignment_doc)
+        permission_cache.invalidate_user(user_id)
         logger.info(f"✅ Assigned Manager role to user {user_id}")
         return True
         
@@ -4,7 +4,6 @@ Handles background task processing for report generation and scheduling
 """
 import os
 from celery import Celery
-from celery.schedules import crontab
 import logging
 
 logger = logging.getLogger(__name__)
@@ -52,9 +51,9 @@ celery_app.conf.update(
     
     # Beat scheduler settings
     beat_schedule={
-        "check-scheduled-reports": {
-            "task": "report_tasks.check_scheduled_reports",
-            "schedule": crontab(minute="*/5"),  # Run every 5 minutes
+        "run-due-reports": {
+            "task": "report_tasks.dispatch_due_reports",
+            "schedule": 60.0,  # Run every minute
         },
     },
 )
@@ -1,13 +1,19 @@
 import motor.motor_asyncio
 import os
 from dotenv import load_dotenv
+from pymongo import ReadPreference
 
 # Load environment variables
 load_dotenv()
 
 # Database connection
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/afms_db")
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
+client = motor.motor_asyncio.AsyncIOMotorClient(
+    MONGO_URL,
+    maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "200")),
+    minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "20")),
+    maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "30000"))
+)
 database = client.afms_db
 
 # Collections
@@ -24,9 +30,17 @@ bank_connections_collection = database.bank_connections
 bank_transactions_collection = database.bank_transactions
 payment_transactions_collection = database.payment_transactions
 invoices_collection = database.invoices
+# Read-mostly invoice views (lists, aging report) may be served by replica set
+# secondaries; writes and read-after-write paths use invoices_collection
+invoices_read_collection = invoices_collection.with_options(
+    read_preference=ReadPreference.SECONDARY_PREFERRED
+)
 bills_collection = database.bills
 payment_schedules_collection = database.payment_schedules
 
+# Atomic per-company sequence counters (e.g., invoice numbers)
+counters_collection = database.counters
+
 # Phase 14: Report Scheduling & Integration Collections
 integrations_collection = database.integrations
 report_schedules_collection = database.report_schedules
@@ -35,6 +49,7 @@ scheduled_report_history_collection = database.scheduled_report_history
 # Phase 15: Reconciliation Collections
 reconciliation_sessions_collection = database.reconciliation_sessions
 reconciliation_matches_collection = database.reconciliation_matches
+reconciliation_bank_entries_collection = database.reconciliation_bank_entries
 
 # RBAC Collections
 permissions_collection = database.permissions
@@ -896,7 +896,11 @@ async def generate_enhanced_demo_data(db, company_id: str, user_id: str):
     reconciliation_count = 0
     bank_statement_files = []
     
-    from database import reconciliation_sessions_collection, reconciliation_matches_collection
+    from database import (
+        reconciliation_sessions_collection,
+        reconciliation_matches_collection,
+        reconciliation_bank_entries_collection
+    )
     
     # Generate 12 monthly reconciliation sessions (one for each month)
     for month_offset in range(12):
@@ -1085,7 +1089,6 @@ async def generate_enhanced_demo_data(db, company_id: str, user_id: str):
             'auto_match': True,
             'filename': csv_filename,
             'status': session_status,
-            'bank_entries': bank_entries,
             'total_bank_entries': len(bank_entries),
             'matched_count': sum(1 for e in bank_entries if e['matched']),
             'unmatched_count': sum(1 for e in bank_entries if not e['matched']),
@@ -1097,6 +1100,11 @@ async def generate_enhanced_demo_data(db, company_id: str, user_id: str):
         }
         
         await reconciliation_sessions_collection.insert_one(recon_session)
+        if bank_entries:
+            await reconciliation_bank_entries_collection.insert_many([
+                {'session_id': session_id, 'position': position, **entry}
+                for position, entry in enumerate(bank_entries)
+            ])
         reconciliation_count += 1
         
         # Create match records for matched entries
@@ -36,6 +36,12 @@ SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "false").lower() == "true"
 FROM_EMAIL = os.getenv("FROM_EMAIL", "noreply@afms.com")
 FROM_NAME = os.getenv("FROM_NAME", "AFMS Reports")
 
+# To header for messages delivered only to Bcc recipients
+UNDISCLOSED_RECIPIENTS = "undisclosed-recipients:;"
+
+# Recipients per merged report email, within common provider Bcc limits
+BCC_GROUP_SIZE = 50
+
 # Auto-detect provider
 EMAIL_PROVIDER = None
 if SENDGRID_API_KEY:
@@ -146,35 +152,16 @@ async def send_smtp_email(
     Send email via SMTP
     """
     try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"{config.get('from_name', 'AFMS')} <{config.get('from_email')}>"
-        msg['To'] = to_email
-        
-        if cc:
-            msg['Cc'] = ', '.join(cc)
-        if bcc:
-            msg['Bcc'] = ', '.join(bcc)
-        
-        # Add body parts
-        msg.attach(MIMEText(body, 'plain'))
-        if html_body:
-            msg.attach(MIMEText(html_body, 'html'))
-        
-        # Add attachments
-        if attachments:
-            for attachment in attachments:
-                part = MIMEApplication(attachment['content'])
-                part.add_header('Content-Disposition', 'attachment', filename=attachment['filename'])
-                msg.attach(part)
-        
-        # Prepare recipients
-        recipients = [to_email]
-        if cc:
-            recipients.extend(cc)
-        if bcc:
-            recipients.extend(bcc)
+        msg, recipients = _build_smtp_message(
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            config=config,
+            html_body=html_body,
+            attachments=attachments,
+            cc=cc,
+            bcc=bcc
+        )
         
         # Send email in thread pool to avoid blocking
         loop = asyncio.get_event_loop()
@@ -194,8 +181,164 @@ async def send_smtp_email(
         return False
 
 
-def _send_smtp_sync(msg, recipients, config):
-    """Synchronous SMTP send (runs in thread pool)"""
+async def send_bulk(
+    email_config: Dict[str, Any],
+    messages: List[tuple]
+) -> List[str]:
+    """
+    Send several emails, reusing one SMTP session for the whole batch
+    
+    Args:
+        email_config: Email configuration dictionary
+        messages: List of (to_email, subject, body, html_body, attachments, cc, bcc) tuples;
+            to_email may be None to deliver only to the Bcc recipients
+        
+    Returns:
+        List[str]: To/Bcc recipients whose email could not be delivered
+    """
+    provider = email_config.get("provider", "smtp")
+    
+    if provider != "smtp" and provider != "gmail":
+        # API providers have no session to reuse
+        failed_recipients = []
+        for to_email, subject, body, html_body, attachments, cc, bcc in messages:
+            # Bcc-only messages go to each recipient in turn
+            sends = [(to_email, bcc)] if to_email else [(recipient, None) for recipient in bcc or []]
+            for recipient, send_bcc in sends:
+                sent = await send_email(
+                    to_email=recipient,
+                    subject=subject,
+                    body=body,
+                    html_body=html_body,
+                    email_config=email_config,
+                    attachments=attachments,
+                    cc=cc,
+                    bcc=send_bcc
+                )
+                if not sent:
+                    failed_recipients.append(recipient)
+                    failed_recipients.extend(send_bcc or [])
+        return failed_recipients
+    
+    config = email_config.get("smtp_config", {})
+    
+    try:
+        built = {}
+        prepared = []
+        for to_email, subject, body, html_body, attachments, cc, bcc in messages:
+            # Messages with the same content share one MIME message, so each
+            # attachment is base64-encoded once; only the To header changes per send
+            content_key = (subject, body, html_body, id(attachments), tuple(cc or ()))
+            if content_key not in built:
+                built[content_key], _ = _build_smtp_message(
+                    to_email=to_email or UNDISCLOSED_RECIPIENTS,
+                    subject=subject,
+                    body=body,
+                    config=config,
+                    html_body=html_body,
+                    attachments=attachments,
+                    cc=cc
+                )
+            delivery = ([to_email] if to_email else []) + list(bcc or [])
+            prepared.append((
+                delivery,
+                built[content_key],
+                to_email or UNDISCLOSED_RECIPIENTS,
+                delivery + list(cc or [])
+            ))
+        
+        # Send emails in thread pool to avoid blocking
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None,
+            _send_smtp_bulk_sync,
+            prepared,
+            config
+        )
+        
+    except Exception as e:
+        logger.error(f"SMTP bulk email error: {e}")
+        return [
+            recipient
+            for to_email, _, _, _, _, _, bcc in messages
+            for recipient in ([to_email] if to_email else []) + list(bcc or [])
+        ]
+
+
+def build_recipient_messages(
+    recipients: List[str],
+    subject: str,
+    body: str,
+    html_body: Optional[str] = None,
+    attachments: Optional[List[Dict[str, Any]]] = None,
+    cc: Optional[List[str]] = None,
+    merge_recipients: bool = True
+) -> List[tuple]:
+    """
+    Build send_bulk message tuples for one email going to many recipients
+    
+    Merged sends go out as one Bcc message per BCC_GROUP_SIZE recipients;
+    otherwise each recipient gets their own copy. Either way the CC list is
+    only copied on the first message.
+    """
+    if merge_recipients:
+        return [
+            (None, subject, body, html_body, attachments,
+             (cc or None) if start == 0 else None,
+             recipients[start:start + BCC_GROUP_SIZE])
+            for start in range(0, len(recipients), BCC_GROUP_SIZE)
+        ]
+    
+    return [
+        (recipient, subject, body, html_body, attachments, (cc or None) if index == 0 else None, None)
+        for index, recipient in enumerate(recipients)
+    ]
+
+
+def _build_smtp_message(
+    to_email: str,
+    subject: str,
+    body: str,
+    config: Dict[str, Any],
+    html_body: Optional[str] = None,
+    attachments: Optional[List[Dict[str, Any]]] = None,
+    cc: Optional[List[str]] = None,
+    bcc: Optional[List[str]] = None
+):
+    """Build the MIME message and envelope recipients for an SMTP send"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = f"{config.get('from_name', 'AFMS')} <{config.get('from_email')}>"
+    msg['To'] = to_email
+    
+    # Bcc recipients only go in the envelope; sendmail() sends headers as-is
+    if cc:
+        msg['Cc'] = ', '.join(cc)
+    
+    # Add body parts
+    msg.attach(MIMEText(body, 'plain'))
+    if html_body:
+        msg.attach(MIMEText(html_body, 'html'))
+    
+    # Add attachments
+    if attachments:
+        for attachment in attachments:
+            part = MIMEApplication(attachment['content'])
+            part.add_header('Content-Disposition', 'attachment', filename=attachment['filename'])
+            msg.attach(part)
+    
+    # Prepare recipients
+    recipients = [to_email]
+    if cc:
+        recipients.extend(cc)
+    if bcc:
+        recipients.extend(bcc)
+    
+    return msg, recipients
+
+
+def _open_smtp_connection(config):
+    """Open and authenticate an SMTP connection"""
     # Use environment variables if config not provided
     host = config.get('host', SMTP_HOST)
     port = config.get('port', SMTP_PORT)
@@ -214,10 +357,64 @@ def _send_smtp_sync(msg, recipients, config):
     if username and password:
         server.login(username, password)
     
+    return server
+
+
+def _smtp_connection_alive(server) -> bool:
+    """Check an open SMTP connection still answers before reusing it"""
+    try:
+        return server.noop()[0] == 250
+    except smtplib.SMTPException:
+        return False
+
+
+def _send_smtp_sync(msg, recipients, config):
+    """Synchronous SMTP send (runs in thread pool)"""
+    server = _open_smtp_connection(config)
     server.sendmail(msg['From'], recipients, msg.as_string())
     server.quit()
 
 
+def _send_smtp_bulk_sync(prepared, config):
+    """Synchronous SMTP send of several messages over one connection (runs in thread pool)"""
+    failed_recipients = []
+    server = None
+    
+    try:
+        for index, (delivery, msg, to_header, recipients) in enumerate(prepared):
+            if server is not None and not _smtp_connection_alive(server):
+                server.close()
+                server = None
+            
+            if server is None:
+                try:
+                    server = _open_smtp_connection(config)
+                except Exception as e:
+                    logger.error(f"SMTP connection error: {e}")
+                    failed_recipients.extend(
+                        recipient for item in prepared[index:] for recipient in item[0]
+                    )
+                    break
+            
+            try:
+                msg.replace_header('To', to_header)
+                # Recipients the server rejected while accepting others
+                refused = server.sendmail(msg['From'], recipients, msg.as_string())
+                failed_recipients.extend(recipient for recipient in delivery if recipient in refused)
+                logger.info(f"Email sent successfully to {', '.join(delivery)}")
+            except Exception as e:
+                logger.error(f"SMTP email error for {', '.join(delivery)}: {e}")
+                failed_recipients.extend(delivery)
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except smtplib.SMTPException:
+                server.close()
+    
+    return failed_recipients
+
+
 async def send_sendgrid_email(
     to_email: str,
     subject: str,
@@ -16,6 +16,7 @@ import sys
 
 sys.path.append('/app/backend')
 from auth import get_password_hash
+from permission_cache import permission_cache
 
 load_dotenv()
 
@@ -134,6 +135,7 @@ async def assign_superadmin_to_user(user_email, superadmin_role_id):
         "assigned_by": "system"
     }
     await user_roles_collection.insert_one(assignment)
+    permission_cache.invalidate_user(user["_id"])
     print(f"  ✅ Assigned superadmin role to {user_email}")
     return True
 
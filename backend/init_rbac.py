@@ -16,6 +16,7 @@ import sys
 sys.path.append('/app/backend')
 
 from auth import get_password_hash
+from permission_cache import permission_cache
 
 load_dotenv()
 
@@ -469,6 +470,7 @@ async def create_superadmin_user(role_ids):
             "assigned_by": "system"
         }
         await user_roles_collection.insert_one(assignment_doc)
+        permission_cache.invalidate_user(user_id)
         print(f"  ✓ Assigned superadmin role")
     
     return user_id
@@ -0,0 +1,76 @@
+"""
+Migration script to convert invoice dates stored as "YYYY-MM-DD" strings into
+BSON dates. Invoices created through the receivables API now store
+invoice_date, due_date and payment_records.payment_date as dates so the aging
+report can diff them natively; this backfills invoices created before that.
+Values that do not parse as YYYY-MM-DD are left unchanged.
+"""
+
+import asyncio
+from database import invoices_collection
+
+DATE_FORMAT = "%Y-%m-%d"
+
+def to_date(field_path: str) -> dict:
+    """Aggregation expression converting a YYYY-MM-DD string field to a date"""
+    return {
+        "$dateFromString": {
+            "dateString": field_path,
+            "format": DATE_FORMAT,
+            "onError": field_path
+        }
+    }
+
+async def migrate_invoice_dates():
+    """Convert string invoice dates to BSON dates"""
+
+    for field in ("invoice_date", "due_date"):
+        result = await invoices_collection.update_many(
+            {field: {"$type": "string"}},
+            [{"$set": {field: to_date(f"${field}")}}]
+        )
+        print(f"✅ {field}: converted {result.modified_count} invoices")
+
+    result = await invoices_collection.update_many(
+        {"payment_records.payment_date": {"$type": "string"}},
+        [{"$set": {
+            "payment_records": {
+                "$map": {
+                    "input": "$payment_records",
+                    "as": "record",
+                    "in": {
+                        "$cond": [
+                            {"$eq": [{"$type": "$$record.payment_date"}, "string"]},
+                            {"$mergeObjects": [
+                                "$$record",
+                                {"payment_date": to_date("$$record.payment_date")}
+                            ]},
+                            "$$record"
+                        ]
+                    }
+                }
+            }
+        }}]
+    )
+    print(f"✅ payment_records.payment_date: converted {result.modified_count} invoices")
+
+    # Verify the migration
+    remaining = await invoices_collection.count_documents({
+        "$or": [
+            {"invoice_date": {"$type": "string"}},
+            {"due_date": {"$type": "string"}},
+            {"payment_records.payment_date": {"$type": "string"}}
+        ]
+    })
+
+    if remaining == 0:
+        print("✅ Verification passed: All invoice dates are stored as dates!")
+    else:
+        print(f"⚠️  Warning: {remaining} invoices still have unparseable string dates")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🔧 Invoice Dates Migration Script")
+    print("=" * 60)
+    asyncio.run(migrate_invoice_dates())
+    print("=" * 60)
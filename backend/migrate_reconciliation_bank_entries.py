@@ -0,0 +1,59 @@
+"""
+Migration script to move reconciliation bank entries out of the session
+documents. Statement lines used to be stored inline as a bank_entries array on
+each reconciliation session; they now live one document per line in the
+reconciliation_bank_entries collection, keyed by session_id and ordered by
+position. This copies the embedded entries across and removes the array.
+"""
+
+import asyncio
+from database import reconciliation_sessions_collection, reconciliation_bank_entries_collection
+
+async def migrate_reconciliation_bank_entries():
+    """Move embedded bank_entries arrays into their own collection"""
+
+    migrated_sessions = 0
+    migrated_entries = 0
+
+    cursor = reconciliation_sessions_collection.find(
+        {"bank_entries": {"$exists": True}},
+        {"bank_entries": 1}
+    )
+
+    async for session in cursor:
+        session_id = session["_id"]
+        entries = session.get("bank_entries") or []
+
+        # Re-running after a partial failure must not duplicate entries
+        await reconciliation_bank_entries_collection.delete_many({"session_id": session_id})
+
+        if entries:
+            await reconciliation_bank_entries_collection.insert_many([
+                {"session_id": session_id, "position": position, **entry}
+                for position, entry in enumerate(entries)
+            ])
+
+        await reconciliation_sessions_collection.update_one(
+            {"_id": session_id},
+            {"$unset": {"bank_entries": ""}}
+        )
+
+        migrated_sessions += 1
+        migrated_entries += len(entries)
+
+    print(f"✅ Moved {migrated_entries} bank entries from {migrated_sessions} sessions")
+
+    # Verify the migration
+    remaining = await reconciliation_sessions_collection.count_documents({"bank_entries": {"$exists": True}})
+
+    if remaining == 0:
+        print("✅ Verification passed: No sessions embed bank entries!")
+    else:
+        print(f"⚠️  Warning: {remaining} sessions still embed bank entries")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🔧 Reconciliation Bank Entries Migration Script")
+    print("=" * 60)
+    asyncio.run(migrate_reconciliation_bank_entries())
+    print("=" * 60)
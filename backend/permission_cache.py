@@ -0,0 +1,148 @@
+import redis
+import logging
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Optional
+import os
+
+logger = logging.getLogger(__name__)
+
+# Per-request memo of RBAC results, reset by get_current_user for every
+# authenticated request so repeated checks within a request hit the DB/Redis once
+request_permission_cache: ContextVar[Optional[Dict[Any, bool]]] = ContextVar(
+    "request_permission_cache", default=None
+)
+
+class PermissionCache:
+    """Redis-based cache for per-user RBAC lookups"""
+
+    SUPERADMIN_TTL_SECONDS = 300
+    PERMISSIONS_TTL_SECONDS = 300
+
+    # Stored in every cached permission set so users without permissions
+    # still get a key (Redis drops empty sets); never a real permission name
+    _LOADED_MARKER = ""
+
+    def __init__(self):
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+        try:
+            self.client = redis.from_url(
+                redis_url,
+                decode_responses=True,
+                socket_connect_timeout=5,
+                socket_timeout=5
+            )
+            # Test connection
+            self.client.ping()
+            logger.info("✅ Redis connection established for permission cache")
+        except redis.ConnectionError as e:
+            logger.error(f"❌ Redis connection failed: {e}")
+            logger.warning("⚠️  Permission cache disabled without Redis - RBAC checks will hit MongoDB")
+            self.client = None
+        except Exception as e:
+            logger.error(f"❌ Unexpected error connecting to Redis: {e}")
+            self.client = None
+
+    def _get_superadmin_key(self, user_id: str) -> str:
+        """Generate Redis key for a user's superadmin flag"""
+        return f"su:{user_id}"
+
+    def _get_permissions_key(self, user_id: str) -> str:
+        """Generate Redis key for a user's permission-name set"""
+        return f"perms:{user_id}"
+
+    def get_superadmin(self, user_id: str) -> Optional[bool]:
+        """Return the cached superadmin flag, or None on a miss"""
+
+        if not self.client:
+            return None
+
+        try:
+            value = self.client.get(self._get_superadmin_key(user_id))
+            if value is None:
+                return None
+            return value == "1"
+        except Exception as e:
+            logger.error(f"Failed to read superadmin cache: {e}")
+            return None
+
+    def set_superadmin(self, user_id: str, is_super: bool) -> None:
+        """Cache a user's superadmin flag"""
+
+        if not self.client:
+            return
+
+        try:
+            self.client.setex(
+                self._get_superadmin_key(user_id),
+                self.SUPERADMIN_TTL_SECONDS,
+                "1" if is_super else "0"
+            )
+        except Exception as e:
+            logger.error(f"Failed to write superadmin cache: {e}")
+
+    def has_permission(self, user_id: str, permission_name: str) -> Optional[bool]:
+        """Return whether the cached permission set contains the permission, or None on a miss"""
+
+        if not self.client:
+            return None
+
+        try:
+            key = self._get_permissions_key(user_id)
+            pipe = self.client.pipeline()
+            pipe.exists(key)
+            pipe.sismember(key, permission_name)
+            exists, is_member = pipe.execute()
+            if not exists:
+                return None
+            return bool(is_member)
+        except Exception as e:
+            logger.error(f"Failed to read permission cache: {e}")
+            return None
+
+    def set_permissions(self, user_id: str, permission_names: Iterable[str]) -> None:
+        """Cache the set of permission names granted to a user"""
+
+        if not self.client:
+            return
+
+        try:
+            key = self._get_permissions_key(user_id)
+            pipe = self.client.pipeline()
+            pipe.delete(key)
+            pipe.sadd(key, self._LOADED_MARKER, *permission_names)
+            pipe.expire(key, self.PERMISSIONS_TTL_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to write permission cache: {e}")
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop all cached RBAC data for a user (e.g., after role assignment)"""
+        self.invalidate_users([user_id])
+
+    def invalidate_users(self, user_ids: Iterable[str]) -> None:
+        """Drop all cached RBAC data for several users (e.g., after a role's permissions change)"""
+
+        # Results memoized earlier in this request may no longer hold
+        memo = request_permission_cache.get()
+        if memo:
+            memo.clear()
+
+        if not self.client:
+            return
+
+        keys = []
+        for user_id in user_ids:
+            keys.append(self._get_superadmin_key(user_id))
+            keys.append(self._get_permissions_key(user_id))
+
+        if not keys:
+            return
+
+        try:
+            self.client.delete(*keys)
+        except Exception as e:
+            logger.error(f"Failed to invalidate permission cache: {e}")
+
+# Global instance
+permission_cache = PermissionCache()
@@ -8,6 +8,14 @@ import hashlib
 
 logger = logging.getLogger(__name__)
 
+# Increments the rate-limit key and (re)applies its window atomically in one
+# round-trip, returning the request count for the current window
+RATE_LIMIT_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return count
+"""
+
 class RateLimiter:
     """Redis-based rate limiter for API endpoints"""
     
@@ -23,6 +31,7 @@ class RateLimiter:
             )
             # Test connection
             self.client.ping()
+            self._increment_script = self.client.register_script(RATE_LIMIT_SCRIPT)
             logger.info("✅ Redis connection established for rate limiting")
             self.enabled = True
         except redis.ConnectionError as e:
@@ -84,18 +93,10 @@ class RateLimiter:
             endpoint = endpoint_name or request.url.path
             key = self._get_rate_limit_key(identifier, endpoint)
             
-            # Use Redis pipeline for atomic operations
-            pipe = self.client.pipeline()
-            pipe.incr(key)
-            pipe.expire(key, window_seconds)
-            results = pipe.execute()
-            
-            current_requests = results[0]
+            current_requests = self._increment_script(keys=[key], args=[window_seconds])
             
             if current_requests > max_requests:
-                # Get TTL for Retry-After header
-                ttl = self.client.ttl(key)
-                
+                # The window was just re-applied, so it is the time until reset
                 logger.warning(
                     f"Rate limit exceeded for {identifier} on {endpoint}: "
                     f"{current_requests}/{max_requests} requests"
@@ -103,8 +104,8 @@ class RateLimiter:
                 
                 raise HTTPException(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail=f"Rate limit exceeded. Try again in {ttl} seconds.",
-                    headers={"Retry-After": str(ttl)}
+                    detail=f"Rate limit exceeded. Try again in {window_seconds} seconds.",
+                    headers={"Retry-After": str(window_seconds)}
                 )
             
             # Log if approaching limit (80%)
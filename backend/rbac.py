@@ -8,6 +8,7 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
+import asyncio
 import uuid
 import logging
 
@@ -18,6 +19,7 @@ from database import (
     audit_logs_collection
 )
 from auth import get_current_user, log_audit_event
+from permission_cache import permission_cache, request_permission_cache
 
 logger = logging.getLogger(__name__)
 
@@ -215,18 +217,7 @@ async def list_permissions(
     
     permissions = await permissions_collection.find(query).sort("resource", 1).to_list(length=None)
     
-    return [
-        PermissionResponse(
-            id=perm["_id"],
-            name=perm["name"],
-            resource=perm["resource"],
-            action=perm["action"],
-            description=perm.get("description"),
-            created_at=perm["created_at"],
-            is_system=perm.get("is_system", False)
-        )
-        for perm in permissions
-    ]
+    return [_perm_from_doc(perm) for perm in permissions]
 
 # ============================================================================
 # ROLE MANAGEMENT
@@ -436,6 +427,17 @@ async def update_role(
         {"$set": update_data}
     )
     
+    if role.get("is_system"):
+        invalidate_system_roles()
+    
+    # Cached permission sets of everyone holding this role are now stale
+    if role_data.permission_ids is not None:
+        assignments = await user_roles_collection.find(
+            {"role_id": role_id},
+            {"user_id": 1}
+        ).to_list(length=None)
+        permission_cache.invalidate_users(a["user_id"] for a in assignments)
+    
     await log_audit_event(
         user_id=current_user["_id"],
         company_id=current_user["company_id"],
@@ -552,6 +554,8 @@ async def assign_roles_to_user(
         }
         await user_roles_collection.insert_one(assignment_doc)
     
+    permission_cache.invalidate_user(assignment.user_id)
+    
     await log_audit_event(
         user_id=current_user["_id"],
         company_id=current_user["company_id"],
@@ -670,54 +674,54 @@ async def list_menus(
 ):
     """Get menu structure for current user based on permissions"""
     
-    # Get all active menus
-    all_menus = await menus_collection.find({"is_active": True}).sort("order", 1).to_list(length=None)
-    
-    # Get user permissions
-    user_permissions = await get_user_all_permissions(current_user["_id"])
-    user_permission_names = [p.name for p in user_permissions]
-    
-    # Check if user is superadmin
-    is_super = await is_superadmin(current_user["_id"])
-    
-    # Filter menus based on permissions
-    accessible_menus = []
-    for menu in all_menus:
-        required_perms = menu.get("required_permissions", [])
-        
-        # Superadmin can see all menus
-        if is_super:
-            accessible = True
-        # Check if user has all required permissions
-        elif not required_perms:
-            accessible = True
-        else:
-            accessible = all(perm in user_permission_names for perm in required_perms)
-        
-        if accessible:
-            menu_response = MenuResponse(
-                id=menu["_id"],
-                name=menu["name"],
-                label=menu["label"],
-                icon=menu.get("icon"),
-                path=menu["path"],
-                parent_id=menu.get("parent_id"),
-                order=menu["order"],
-                required_permissions=menu.get("required_permissions", []),
-                is_active=menu["is_active"],
-                children=[]
-            )
-            accessible_menus.append(menu_response)
+    # Superadmin can see all active menus
+    if await is_superadmin(current_user["_id"]):
+        accessible = await menus_collection.find({"is_active": True}).sort("order", 1).to_list(length=None)
+    else:
+        # Resolve the user's permission names and filter menus in one round-trip.
+        # The $lookup is uncorrelated, so MongoDB evaluates it once, not per menu.
+        pipeline = [
+            {"$match": {"is_active": True}},
+            {"$lookup": {
+                "from": "user_roles",
+                "pipeline": _user_permissions_pipeline(current_user["_id"]) + [
+                    {"$group": {"_id": None, "names": {"$addToSet": "$name"}}}
+                ],
+                "as": "user_permissions"
+            }},
+            {"$match": {"$expr": {"$setIsSubset": [
+                {"$ifNull": ["$required_permissions", []]},
+                {"$ifNull": [{"$arrayElemAt": ["$user_permissions.names", 0]}, []]}
+            ]}}},
+            {"$project": {"user_permissions": 0}},
+            {"$sort": {"order": 1}}
+        ]
+        accessible = await menus_collection.aggregate(pipeline).to_list(length=None)
+    
+    # Plain dicts are validated once by response_model on the way out
+    menu_dict = {
+        menu["_id"]: {
+            "id": menu["_id"],
+            "name": menu["name"],
+            "label": menu["label"],
+            "icon": menu.get("icon"),
+            "path": menu["path"],
+            "parent_id": menu.get("parent_id"),
+            "order": menu["order"],
+            "required_permissions": menu.get("required_permissions", []),
+            "is_active": menu["is_active"],
+            "children": []
+        }
+        for menu in accessible
+    }
     
-    # Build hierarchical structure
-    menu_dict = {menu.id: menu for menu in accessible_menus}
+    # Build hierarchical structure (dict preserves the order sort)
     root_menus = []
-    
-    for menu in accessible_menus:
-        if menu.parent_id and menu.parent_id in menu_dict:
-            menu_dict[menu.parent_id].children.append(menu)
-        elif not menu.parent_id:
+    for menu in menu_dict.values():
+        if not menu["parent_id"]:
             root_menus.append(menu)
+        elif menu["parent_id"] in menu_dict:
+            menu_dict[menu["parent_id"]]["children"].append(menu)
     
     return root_menus
 
@@ -725,100 +729,161 @@ async def list_menus(
 # HELPER FUNCTIONS
 # ============================================================================
 
+def _perm_from_doc(perm: Dict[str, Any]) -> PermissionResponse:
+    """Build a PermissionResponse from a permission document without re-validation
+    
+    Permission documents are only written from validated input, so
+    model_construct is safe and skips per-field validation.
+    """
+    return PermissionResponse.model_construct(
+        id=perm["_id"],
+        name=perm["name"],
+        resource=perm["resource"],
+        action=perm["action"],
+        description=perm.get("description"),
+        created_at=perm["created_at"],
+        is_system=perm.get("is_system", False)
+    )
+
 async def get_role_permissions(role_id: str) -> List[PermissionResponse]:
     """Get all permissions for a role"""
-    role = await roles_collection.find_one({"_id": role_id})
-    if not role or not role.get("permission_ids"):
-        return []
-    
-    permissions = await permissions_collection.find({
-        "_id": {"$in": role["permission_ids"]}
-    }).to_list(length=None)
+    pipeline = [
+        {"$match": {"_id": role_id}},
+        {"$lookup": {
+            "from": "permissions",
+            "localField": "permission_ids",
+            "foreignField": "_id",
+            "as": "perm"
+        }},
+        {"$unwind": "$perm"},
+        {"$replaceRoot": {"newRoot": "$perm"}}
+    ]
     
+    return [_perm_from_doc(perm) async for perm in roles_collection.aggregate(pipeline)]
+
+def _user_permissions_pipeline(user_id: str) -> List[Dict[str, Any]]:
+    """user_roles aggregation stages yielding each distinct permission document of a user"""
     return [
-        PermissionResponse(
-            id=perm["_id"],
-            name=perm["name"],
-            resource=perm["resource"],
-            action=perm["action"],
-            description=perm.get("description"),
-            created_at=perm["created_at"],
-            is_system=perm.get("is_system", False)
-        )
-        for perm in permissions
+        {"$match": {"user_id": user_id}},
+        {"$lookup": {
+            "from": "roles",
+            "localField": "role_id",
+            "foreignField": "_id",
+            "as": "role"
+        }},
+        {"$unwind": "$role"},
+        {"$unwind": "$role.permission_ids"},
+        {"$group": {"_id": "$role.permission_ids"}},
+        {"$lookup": {
+            "from": "permissions",
+            "localField": "_id",
+            "foreignField": "_id",
+            "as": "perm"
+        }},
+        {"$unwind": "$perm"},
+        {"$replaceRoot": {"newRoot": "$perm"}}
     ]
 
 async def get_user_all_permissions(user_id: str) -> List[PermissionResponse]:
     """Get all permissions for a user (aggregated from all roles)"""
     
-    # Get user's role assignments
-    assignments = await user_roles_collection.find({"user_id": user_id}).to_list(length=None)
-    role_ids = [a["role_id"] for a in assignments]
+    # Resolve assignments -> roles -> distinct permissions in one round-trip
+    pipeline = _user_permissions_pipeline(user_id)
     
-    if not role_ids:
-        return []
-    
-    # Get all roles
-    roles = await roles_collection.find({"_id": {"$in": role_ids}}).to_list(length=None)
-    
-    # Collect all permission IDs (use set to avoid duplicates)
-    permission_ids = set()
-    for role in roles:
-        if role.get("permission_ids"):
-            permission_ids.update(role["permission_ids"])
-    
-    if not permission_ids:
-        return []
-    
-    # Get permission details
-    permissions = await permissions_collection.find({
-        "_id": {"$in": list(permission_ids)}
-    }).to_list(length=None)
-    
-    return [
-        PermissionResponse(
-            id=perm["_id"],
-            name=perm["name"],
-            resource=perm["resource"],
-            action=perm["action"],
-            description=perm.get("description"),
-            created_at=perm["created_at"],
-            is_system=perm.get("is_system", False)
-        )
-        for perm in permissions
-    ]
+    return [_perm_from_doc(perm) async for perm in user_roles_collection.aggregate(pipeline)]
 
 async def has_permission(user_id: str, permission_name: str) -> bool:
     """Check if user has a specific permission"""
     
+    memo = request_permission_cache.get()
+    memo_key = ("permission", user_id, permission_name)
+    if memo is not None and memo_key in memo:
+        return memo[memo_key]
+    
+    result = await _has_permission(user_id, permission_name)
+    if memo is not None:
+        memo[memo_key] = result
+    return result
+
+async def _has_permission(user_id: str, permission_name: str) -> bool:
+    """Resolve a permission via the Redis cache, falling back to MongoDB"""
+    
     # Check if superadmin (has all permissions)
     if await is_superadmin(user_id):
         return True
     
+    cached = permission_cache.has_permission(user_id, permission_name)
+    if cached is not None:
+        return cached
+    
     # Get user permissions
     permissions = await get_user_all_permissions(user_id)
     permission_names = [p.name for p in permissions]
+    permission_cache.set_permissions(user_id, permission_names)
     
     return permission_name in permission_names
 
+# System role IDs by name, resolved once per process (system roles are
+# seeded once and never change ID)
+_system_role_ids: Dict[str, str] = {}
+_system_role_ids_lock = asyncio.Lock()
+
+async def _get_system_role_id(name: str) -> Optional[str]:
+    """Get a system role's ID, looking it up only on first use"""
+    role_id = _system_role_ids.get(name)
+    if role_id is not None:
+        return role_id
+    
+    async with _system_role_ids_lock:
+        # Another request may have resolved it while we waited
+        if name not in _system_role_ids:
+            role = await roles_collection.find_one(
+                {"name": name, "is_system": True},
+                {"_id": 1}
+            )
+            if not role:
+                return None
+            _system_role_ids[name] = role["_id"]
+    
+    return _system_role_ids[name]
+
+def invalidate_system_roles():
+    """Forget cached system role IDs (e.g., after system roles are re-seeded)"""
+    _system_role_ids.clear()
+
 async def is_superadmin(user_id: str) -> bool:
     """Check if user is a superadmin"""
     
-    # Check if user has superadmin role
-    superadmin_role = await roles_collection.find_one({
-        "name": SystemRole.SUPERADMIN,
-        "is_system": True
-    })
+    memo = request_permission_cache.get()
+    memo_key = ("superadmin", user_id)
+    if memo is not None and memo_key in memo:
+        return memo[memo_key]
+    
+    result = await _is_superadmin(user_id)
+    if memo is not None:
+        memo[memo_key] = result
+    return result
+
+async def _is_superadmin(user_id: str) -> bool:
+    """Resolve superadmin membership via the Redis cache, falling back to MongoDB"""
+    
+    cached = permission_cache.get_superadmin(user_id)
+    if cached is not None:
+        return cached
     
-    if not superadmin_role:
+    superadmin_role_id = await _get_system_role_id(SystemRole.SUPERADMIN.value)
+    if not superadmin_role_id:
         return False
     
-    assignment = await user_roles_collection.find_one({
-        "user_id": user_id,
-        "role_id": superadmin_role["_id"]
-    })
+    # Check if user has superadmin role
+    assignment = await user_roles_collection.find_one(
+        {"user_id": user_id, "role_id": superadmin_role_id},
+        {"_id": 1}
+    )
     
-    return assignment is not None
+    result = assignment is not None
+    permission_cache.set_superadmin(user_id, result)
+    return result
 
 # ============================================================================
 # PERMISSION DECORATOR
@@ -1,17 +1,51 @@
 """Accounts Receivable Management APIs"""
 from fastapi import APIRouter, HTTPException, Depends, status, Query
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta
 import uuid
 import logging
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from auth import get_current_user, log_audit_event
-from database import invoices_collection, payment_transactions_collection, accounts_collection
+from report_cache import report_cache
+from database import invoices_collection, invoices_read_collection, payment_transactions_collection, accounts_collection, counters_collection
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+INVOICE_DATE_FORMAT = "%Y-%m-%d"
+
+# Invoice date fields are accepted and returned as YYYY-MM-DD strings but
+# stored as BSON dates so MongoDB can compare and diff them natively
+INVOICE_DATE_FIELDS = ("invoice_date", "due_date")
+
+
+def parse_invoice_date(value: Any) -> datetime:
+    """Parse a YYYY-MM-DD string into the datetime stored in MongoDB
+    
+    Raises ValueError (a 422 from the request models) for anything else.
+    """
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        raise ValueError("expected a YYYY-MM-DD date")
+    return datetime.strptime(value, INVOICE_DATE_FORMAT)
+
+
+def format_invoice_dates(invoice: Dict[str, Any]) -> Dict[str, Any]:
+    """Render stored invoice/payment dates back as YYYY-MM-DD strings"""
+    # date.isoformat() renders YYYY-MM-DD without interpreting a format string
+    for field in INVOICE_DATE_FIELDS:
+        if isinstance(invoice.get(field), datetime):
+            invoice[field] = invoice[field].date().isoformat()
+    for record in invoice.get("payment_records") or ():
+        if isinstance(record.get("payment_date"), datetime):
+            record["payment_date"] = record["payment_date"].date().isoformat()
+    return invoice
+
+
 # Pydantic Models
 class InvoiceLineItem(BaseModel):
     description: str
@@ -24,28 +58,87 @@ class InvoiceCreate(BaseModel):
     customer_name: str
     customer_email: Optional[str] = None
     invoice_number: Optional[str] = None
-    invoice_date: str = Field(..., description="Invoice date (YYYY-MM-DD)")
-    due_date: str = Field(..., description="Payment due date (YYYY-MM-DD)")
+    invoice_date: datetime = Field(..., description="Invoice date (YYYY-MM-DD)")
+    due_date: datetime = Field(..., description="Payment due date (YYYY-MM-DD)")
     line_items: List[InvoiceLineItem]
     notes: Optional[str] = None
     terms: Optional[str] = Field("Net 30", description="Payment terms")
     tax_rate: Optional[float] = Field(0, ge=0, le=1)
+    
+    @field_validator('invoice_date', 'due_date', mode='before')
+    @classmethod
+    def validate_dates(cls, v):
+        return parse_invoice_date(v)
 
 class InvoiceUpdate(BaseModel):
     customer_name: Optional[str] = None
     customer_email: Optional[str] = None
-    due_date: Optional[str] = None
+    due_date: Optional[datetime] = Field(None, description="Payment due date (YYYY-MM-DD)")
     line_items: Optional[List[InvoiceLineItem]] = None
     notes: Optional[str] = None
     status: Optional[str] = None
+    
+    @field_validator('due_date', mode='before')
+    @classmethod
+    def validate_due_date(cls, v):
+        return None if v is None or v == "" else parse_invoice_date(v)
 
 class PaymentRecord(BaseModel):
     invoice_id: str
     amount: float = Field(..., gt=0)
-    payment_date: str
+    payment_date: datetime = Field(..., description="Payment date (YYYY-MM-DD)")
     payment_method: str = Field(..., description="cash, check, card, bank_transfer, other")
     reference: Optional[str] = None
     notes: Optional[str] = None
+    
+    @field_validator('payment_date', mode='before')
+    @classmethod
+    def validate_payment_date(cls, v):
+        return parse_invoice_date(v)
+
+
+async def _next_invoice_number(company_id: str) -> str:
+    """Atomically allocate the next invoice number for a company"""
+    counter_id = f"invoice:{company_id}"
+    
+    while True:
+        counter = await counters_collection.find_one_and_update(
+            {"_id": counter_id},
+            {"$inc": {"seq": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if counter:
+            return f"INV-{counter['seq']:05d}"
+        
+        # First invoice number for this company: seed the counter from the
+        # existing invoice count so numbering continues where it left off
+        count = await invoices_collection.count_documents({"company_id": company_id})
+        try:
+            await counters_collection.update_one(
+                {"_id": counter_id},
+                {"$setOnInsert": {"seq": count}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Another request seeded it concurrently
+            pass
+
+
+# Fields returned by the invoice list view; line items and payment records
+# are only loaded by the detail endpoint
+INVOICE_LIST_PROJECTION = {
+    "_id": 0,
+    "invoice_id": 1,
+    "company_id": 1,
+    "invoice_number": 1,
+    "customer_name": 1,
+    "invoice_date": 1,
+    "due_date": 1,
+    "total_amount": 1,
+    "amount_due": 1,
+    "payment_status": 1,
+    "status": 1
+}
 
 
 @router.post("/invoices", response_model=Dict[str, Any])
@@ -67,9 +160,7 @@ async def create_invoice(
         
         # Generate invoice number if not provided
         if not invoice_data.invoice_number:
-            # Get count of existing invoices
-            count = await invoices_collection.count_documents({"company_id": company_id})
-            invoice_data.invoice_number = f"INV-{count + 1:05d}"
+            invoice_data.invoice_number = await _next_invoice_number(company_id)
         
         # Create invoice document
         invoice_doc = {
@@ -81,7 +172,7 @@ async def create_invoice(
             "customer_email": invoice_data.customer_email,
             "invoice_date": invoice_data.invoice_date,
             "due_date": invoice_data.due_date,
-            "line_items": [item.dict() for item in invoice_data.line_items],
+            "line_items": [item.model_dump() for item in invoice_data.line_items],
             "subtotal": subtotal,
             "tax_rate": invoice_data.tax_rate,
             "tax_amount": tax_amount,
@@ -98,7 +189,15 @@ async def create_invoice(
             "updated_at": datetime.utcnow()
         }
         
-        await invoices_collection.insert_one(invoice_doc)
+        try:
+            await invoices_collection.insert_one(invoice_doc)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invoice number {invoice_doc['invoice_number']} already exists"
+            )
+        
+        report_cache.invalidate_aging_report(company_id)
         
         # Audit log
         await log_audit_event(
@@ -123,6 +222,8 @@ async def create_invoice(
             "message": "Invoice created successfully"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating invoice: {str(e)}")
         raise HTTPException(
@@ -136,6 +237,8 @@ async def list_invoices(
     status_filter: Optional[str] = None,
     payment_status: Optional[str] = None,
     limit: int = 50,
+    before: Optional[str] = Query(None, description="Return invoices dated before this invoice_date, YYYY-MM-DD (keyset pagination)"),
+    before_id: Optional[str] = Query(None, description="invoice_id of the last invoice on the previous page, to break invoice_date ties"),
     company_id: Optional[str] = Query(None, description="Filter by company ID (Super Admin only)"),
     current_user: dict = Depends(get_current_user)
 ):
@@ -143,6 +246,7 @@ async def list_invoices(
     List all invoices with optional filters
     - Regular users: See only their company's invoices
     - Super Admin: See invoices across all companies (optionally filter by company_id)
+    - Pass the last invoice's invoice_date/invoice_id as before/before_id to get the next page
     """
     try:
         # Check if user is superadmin
@@ -163,14 +267,29 @@ async def list_invoices(
             query["status"] = status_filter
         if payment_status:
             query["payment_status"] = payment_status
+        if before:
+            try:
+                before = parse_invoice_date(before)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="before must be a YYYY-MM-DD date"
+                )
+        if before and before_id:
+            query["$or"] = [
+                {"invoice_date": {"$lt": before}},
+                {"invoice_date": before, "invoice_id": {"$lt": before_id}}
+            ]
+        elif before:
+            query["invoice_date"] = {"$lt": before}
+        
+        cursor = invoices_read_collection.find(query, INVOICE_LIST_PROJECTION)
+        cursor = cursor.sort([("invoice_date", -1), ("invoice_id", -1)]).limit(limit).batch_size(limit)
+        
+        return [format_invoice_dates(invoice) async for invoice in cursor]
         
-        invoices = await invoices_collection.find(query).sort("invoice_date", -1).limit(limit).to_list(length=limit)
-        
-        for invoice in invoices:
-            invoice["_id"] = str(invoice["_id"])
-        
-        return invoices
-        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing invoices: {str(e)}")
         raise HTTPException(
@@ -202,7 +321,7 @@ async def get_invoice(
             )
         
         invoice["_id"] = str(invoice["_id"])
-        return invoice
+        return format_invoice_dates(invoice)
         
     except HTTPException:
         raise
@@ -227,51 +346,49 @@ async def update_invoice(
         company_id = current_user["company_id"]
         user_id = current_user["_id"]
         
-        # Get existing invoice
-        invoice = await invoices_collection.find_one({
-            "invoice_id": invoice_id,
-            "company_id": company_id
-        })
-        
-        if not invoice:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Invoice not found"
-            )
-        
-        # Prepare update
-        update_fields = {"updated_at": datetime.utcnow()}
+        # Prepare update; user-supplied values are wrapped in $literal so the
+        # pipeline update cannot read them as field paths or expressions
+        update_fields = {"updated_at": "$$NOW"}
         
         if update_data.customer_name:
-            update_fields["customer_name"] = update_data.customer_name
+            update_fields["customer_name"] = {"$literal": update_data.customer_name}
         if update_data.customer_email:
-            update_fields["customer_email"] = update_data.customer_email
+            update_fields["customer_email"] = {"$literal": update_data.customer_email}
         if update_data.due_date:
             update_fields["due_date"] = update_data.due_date
         if update_data.notes:
-            update_fields["notes"] = update_data.notes
+            update_fields["notes"] = {"$literal": update_data.notes}
         if update_data.status:
-            update_fields["status"] = update_data.status
+            update_fields["status"] = {"$literal": update_data.status}
             if update_data.status == "sent":
-                update_fields["sent_at"] = datetime.utcnow()
+                update_fields["sent_at"] = {"$ifNull": ["$sent_at", "$$NOW"]}
         
-        # Recalculate if line items changed
+        # Recalculate if line items changed, using the stored tax rate and
+        # amount paid so no read is needed first
         if update_data.line_items:
             subtotal = sum(item.amount for item in update_data.line_items)
-            tax_amount = subtotal * invoice.get("tax_rate", 0)
-            total_amount = subtotal + tax_amount
+            tax_amount = {"$multiply": [subtotal, {"$ifNull": ["$tax_rate", 0]}]}
+            total_amount = {"$add": [subtotal, tax_amount]}
             
-            update_fields["line_items"] = [item.dict() for item in update_data.line_items]
+            update_fields["line_items"] = {"$literal": [item.model_dump() for item in update_data.line_items]}
             update_fields["subtotal"] = subtotal
             update_fields["tax_amount"] = tax_amount
             update_fields["total_amount"] = total_amount
-            update_fields["amount_due"] = total_amount - invoice.get("amount_paid", 0)
+            update_fields["amount_due"] = {"$subtract": [total_amount, {"$ifNull": ["$amount_paid", 0]}]}
         
-        await invoices_collection.update_one(
-            {"invoice_id": invoice_id},
-            {"$set": update_fields}
+        result = await invoices_collection.update_one(
+            {"invoice_id": invoice_id, "company_id": company_id},
+            [{"$set": update_fields}]
         )
         
+        if result.matched_count == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Invoice not found"
+            )
+        
+        report_cache.invalidate_aging_report(company_id)
+        
         # Audit log
         await log_audit_event(
             user_id=user_id,
@@ -306,16 +423,14 @@ async def send_invoice(
         
         result = await invoices_collection.update_one(
             {"invoice_id": invoice_id, "company_id": company_id},
-            {
-                "$set": {
-                    "status": "sent",
-                    "sent_at": datetime.utcnow(),
-                    "updated_at": datetime.utcnow()
-                }
-            }
+            [{"$set": {
+                "status": "sent",
+                "sent_at": {"$ifNull": ["$sent_at", "$$NOW"]},
+                "updated_at": "$$NOW"
+            }}]
         )
         
-        if result.modified_count == 0:
+        if result.matched_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Invoice not found"
@@ -354,11 +469,45 @@ async def record_payment(
         company_id = current_user["company_id"]
         user_id = current_user["_id"]
         
-        # Get invoice
-        invoice = await invoices_collection.find_one({
-            "invoice_id": invoice_id,
-            "company_id": company_id
-        })
+        payment_record = {
+            "payment_id": str(uuid.uuid4()),
+            "amount": payment.amount,
+            "payment_date": payment.payment_date,
+            "payment_method": payment.payment_method,
+            "reference": payment.reference,
+            "notes": payment.notes,
+            "recorded_by": user_id
+        }
+        
+        # Apply the payment and derive the new status in a single atomic
+        # pipeline update (all expressions see the pre-payment document)
+        amount_paid = {"$add": [{"$ifNull": ["$amount_paid", 0]}, payment.amount]}
+        remaining = {"$subtract": ["$total_amount", amount_paid]}
+        fully_paid = {"$lte": [remaining, 0]}
+        
+        invoice = await invoices_collection.find_one_and_update(
+            {"invoice_id": invoice_id, "company_id": company_id},
+            [{"$set": {
+                "amount_paid": amount_paid,
+                "amount_due": {"$max": [remaining, 0]},
+                "payment_status": {"$switch": {
+                    "branches": [
+                        {"case": fully_paid, "then": "paid"},
+                        {"case": {"$gt": [amount_paid, 0]}, "then": "partial"}
+                    ],
+                    "default": "unpaid"
+                }},
+                "paid_at": {"$cond": [fully_paid, "$$NOW", None]},
+                "updated_at": "$$NOW",
+                # $literal keeps user-supplied strings from being read as field paths
+                "payment_records": {"$concatArrays": [
+                    {"$ifNull": ["$payment_records", []]},
+                    [{"$mergeObjects": [{"$literal": payment_record}, {"recorded_at": "$$NOW"}]}]
+                ]}
+            }}],
+            projection={"_id": 0, "amount_paid": 1, "amount_due": 1, "payment_status": 1},
+            return_document=ReturnDocument.AFTER
+        )
         
         if not invoice:
             raise HTTPException(
@@ -366,46 +515,7 @@ async def record_payment(
                 detail="Invoice not found"
             )
         
-        # Calculate new amounts
-        amount_paid = invoice.get("amount_paid", 0) + payment.amount
-        amount_due = invoice["total_amount"] - amount_paid
-        
-        # Determine payment status
-        if amount_due <= 0:
-            payment_status = "paid"
-            paid_at = datetime.utcnow()
-        elif amount_paid > 0:
-            payment_status = "partial"
-            paid_at = None
-        else:
-            payment_status = "unpaid"
-            paid_at = None
-        
-        # Update invoice
-        await invoices_collection.update_one(
-            {"invoice_id": invoice_id},
-            {
-                "$set": {
-                    "amount_paid": amount_paid,
-                    "amount_due": max(amount_due, 0),
-                    "payment_status": payment_status,
-                    "paid_at": paid_at,
-                    "updated_at": datetime.utcnow()
-                },
-                "$push": {
-                    "payment_records": {
-                        "payment_id": str(uuid.uuid4()),
-                        "amount": payment.amount,
-                        "payment_date": payment.payment_date,
-                        "payment_method": payment.payment_method,
-                        "reference": payment.reference,
-                        "notes": payment.notes,
-                        "recorded_by": user_id,
-                        "recorded_at": datetime.utcnow()
-                    }
-                }
-            }
-        )
+        report_cache.invalidate_aging_report(company_id)
         
         # Audit log
         await log_audit_event(
@@ -423,9 +533,9 @@ async def record_payment(
         
         return {
             "success": True,
-            "amount_paid": amount_paid,
-            "amount_due": max(amount_due, 0),
-            "payment_status": payment_status,
+            "amount_paid": invoice["amount_paid"],
+            "amount_due": invoice["amount_due"],
+            "payment_status": invoice["payment_status"],
             "message": "Payment recorded successfully"
         }
         
@@ -439,6 +549,19 @@ async def record_payment(
         )
 
 
+# $bucket lower boundaries (days overdue) mapped to aging report buckets;
+# anything outside the boundaries falls into the 90+ bucket
+AGING_BUCKET_MIN = -1_000_000_000
+AGING_BUCKET_MAX = 1_000_000_000
+AGING_BUCKET_NAMES = {
+    AGING_BUCKET_MIN: "current",
+    31: "30_days",
+    61: "60_days",
+    91: "90_plus",
+    AGING_BUCKET_MAX: "90_plus"
+}
+
+
 @router.get("/aging-report")
 async def get_aging_report(current_user: dict = Depends(get_current_user)):
     """
@@ -447,13 +570,44 @@ async def get_aging_report(current_user: dict = Depends(get_current_user)):
     try:
         company_id = current_user["company_id"]
         
-        # Get all unpaid/partial invoices
-        invoices = await invoices_collection.find({
-            "company_id": company_id,
-            "payment_status": {"$in": ["unpaid", "partial"]}
-        }).to_list(length=1000)
+        cached_report = report_cache.get_aging_report(company_id)
+        if cached_report is not None:
+            return cached_report
+        
+        # Bucket unpaid/partial invoices by days overdue server-side so only
+        # the four bucket totals come back over the wire
+        pipeline = [
+            {"$match": {
+                "company_id": company_id,
+                "payment_status": {"$in": ["unpaid", "partial"]}
+            }},
+            {"$project": {
+                "amount_due": {"$ifNull": ["$amount_due", "$total_amount"]},
+                # Legacy YYYY-MM-DD strings that migrate_invoice_dates.py hasn't
+                # converted still parse; anything unparseable diffs to null and
+                # falls into the 90+ bucket instead of failing the whole report
+                "days_overdue": {"$dateDiff": {
+                    "startDate": {"$convert": {
+                        "input": "$due_date",
+                        "to": "date",
+                        "onError": None,
+                        "onNull": None
+                    }},
+                    "endDate": "$$NOW",
+                    "unit": "day"
+                }}
+            }},
+            {"$bucket": {
+                "groupBy": "$days_overdue",
+                "boundaries": [AGING_BUCKET_MIN, 31, 61, 91, AGING_BUCKET_MAX],
+                "default": AGING_BUCKET_MAX,
+                "output": {
+                    "amount": {"$sum": "$amount_due"},
+                    "count": {"$sum": 1}
+                }
+            }}
+        ]
         
-        today = datetime.utcnow().date()
         aging_buckets = {
             "current": 0,  # 0-30 days
             "30_days": 0,  # 31-60 days
@@ -462,31 +616,24 @@ async def get_aging_report(current_user: dict = Depends(get_current_user)):
         }
         
         total_outstanding = 0
+        invoice_count = 0
         
-        for invoice in invoices:
-            amount_due = invoice.get("amount_due", invoice["total_amount"])
-            total_outstanding += amount_due
-            
-            # Calculate days overdue
-            due_date = datetime.strptime(invoice["due_date"], "%Y-%m-%d").date()
-            days_overdue = (today - due_date).days
-            
-            if days_overdue <= 30:
-                aging_buckets["current"] += amount_due
-            elif days_overdue <= 60:
-                aging_buckets["30_days"] += amount_due
-            elif days_overdue <= 90:
-                aging_buckets["60_days"] += amount_due
-            else:
-                aging_buckets["90_plus"] += amount_due
+        async for bucket in invoices_read_collection.aggregate(pipeline):
+            aging_buckets[AGING_BUCKET_NAMES[bucket["_id"]]] += bucket["amount"]
+            total_outstanding += bucket["amount"]
+            invoice_count += bucket["count"]
         
-        return {
+        report = {
             "total_outstanding": total_outstanding,
             "aging_buckets": aging_buckets,
-            "invoice_count": len(invoices),
-            "generated_at": datetime.utcnow().isoformat()
+            "invoice_count": invoice_count,
+            "generated_at": datetime.utcnow()
         }
         
+        report_cache.set_aging_report(company_id, report)
+        
+        return report
+        
     except Exception as e:
         logger.error(f"Error generating aging report: {str(e)}")
         raise HTTPException(
@@ -510,16 +657,15 @@ async def delete_invoice(
         # Mark as voided instead of deleting
         result = await invoices_collection.update_one(
             {"invoice_id": invoice_id, "company_id": company_id},
-            {
-                "$set": {
-                    "status": "voided",
-                    "voided_at": datetime.utcnow(),
-                    "voided_by": user_id
-                }
-            }
+            [{"$set": {
+                "status": "voided",
+                "voided_at": {"$ifNull": ["$voided_at", "$$NOW"]},
+                "voided_by": {"$literal": user_id},
+                "updated_at": "$$NOW"
+            }}]
         )
         
-        if result.modified_count == 0:
+        if result.matched_count == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Invoice not found"
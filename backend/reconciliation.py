@@ -4,17 +4,37 @@ from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Any
 from datetime import datetime, date, timedelta
 from decimal import Decimal
+import asyncio
 import uuid
-import csv
 import io
 import logging
 import re
-from xml.etree import ElementTree as ET
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# lxml builds the tree in C; fall back to the stdlib parser if it isn't installed
+try:
+    from lxml import etree as ET
+    HAS_LXML = True
+except ImportError:
+    from xml.etree import ElementTree as ET
+    HAS_LXML = False
+
+# RapidFuzz scores descriptions in C++; fall back to plain word overlap without it
+try:
+    from rapidfuzz import fuzz, utils as fuzz_utils
+    HAS_RAPIDFUZZ = True
+except ImportError:
+    HAS_RAPIDFUZZ = False
+
+from pymongo.errors import BulkWriteError
 
 from auth import get_current_user, log_audit_event
 from database import (
     reconciliation_sessions_collection,
     reconciliation_matches_collection,
+    reconciliation_bank_entries_collection,
     transactions_collection,
     accounts_collection
 )
@@ -22,6 +42,35 @@ from database import (
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+OFX_TRANSACTION_TAGS = ('STMTTRN', 'stmttrn')
+OFX_FIELD_TAGS = frozenset(('dtposted', 'trnamt', 'name', 'memo', 'fitid'))
+
+# Compiled once rather than looked up in re's cache on every call
+_WORD_RE = re.compile(r'\w+')
+_HEADER_RE = re.compile(r'date|transaction|amount|description', re.IGNORECASE)
+_XML_DECLARATION_RE = re.compile(rb'\s*<\?xml')
+
+# Date, Description, Amount or Debit, Credit or Balance, Balance
+CSV_COLUMNS = 5
+
+# Strips currency symbols and thousands separators from amount cells
+_CLEAN_AMOUNT = str.maketrans('', '', '$,')
+
+DATE_FORMATS = (
+    '%Y-%m-%d',
+    '%m/%d/%Y',
+    '%d/%m/%Y',
+    '%Y/%m/%d',
+    '%m-%d-%Y',
+    '%d-%m-%Y',
+    '%m/%d/%y',
+    '%d/%m/%y',
+    '%b %d, %Y',
+    '%B %d, %Y',
+    '%d %b %Y',
+    '%d %B %Y',
+)
+
 # Pydantic Models
 class BankStatementEntry(BaseModel):
     date: date
@@ -53,132 +102,192 @@ class ReconciliationCompleteRequest(BaseModel):
 # Statement Parsers
 def parse_csv_statement(file_content: str) -> List[Dict[str, Any]]:
     """Parse CSV bank statement - supports common formats"""
-    entries = []
     
     # Try to detect CSV format and parse
-    lines = file_content.strip().split('\n')
+    file_content = file_content.strip()
     
-    # Skip header rows (try to detect)
+    # Skip header rows (try to detect): everything up to and including the
+    # first line that mentions a known column name
     start_row = 0
-    for i, line in enumerate(lines):
-        lower_line = line.lower()
-        if any(keyword in lower_line for keyword in ['date', 'transaction', 'amount', 'description']):
-            start_row = i + 1
-            break
+    header_match = _HEADER_RE.search(file_content)
+    if header_match:
+        start_row = file_content.count('\n', 0, header_match.start()) + 1
     
-    csv_reader = csv.reader(lines[start_row:])
+    # Common CSV formats:
+    # Format 1: Date, Description, Amount, Balance
+    # Format 2: Date, Description, Debit, Credit, Balance
+    # Format 3: Transaction Date, Description, Amount
+    try:
+        # Name a column for every cell of the widest row so rows with extra
+        # trailing cells are kept instead of dropped as bad lines (quoted commas
+        # can only overcount); short rows are padded with ''
+        widest_row = max((line.count(',') + 1 for line in file_content.splitlines()), default=0)
+        width = max(CSV_COLUMNS, widest_row)
+        df = pd.read_csv(
+            io.StringIO(file_content),
+            header=None,
+            names=range(width),
+            index_col=False,
+            skiprows=start_row,
+            dtype=str,
+            na_filter=False,
+            skip_blank_lines=True,
+            engine='c'
+        )
+    except pd.errors.EmptyDataError:
+        return []
     
-    for row in csv_reader:
-        if len(row) < 3:  # Need at least date, description, amount
-            continue
-        
-        try:
-            # Common CSV formats:
-            # Format 1: Date, Description, Amount, Balance
-            # Format 2: Date, Description, Debit, Credit, Balance
-            # Format 3: Transaction Date, Description, Amount
-            
-            entry = {}
-            
-            # Try to parse date (first column usually)
-            date_str = row[0].strip()
-            entry['date'] = parse_date(date_str)
-            
-            # Description (second column usually)
-            entry['description'] = row[1].strip() if len(row) > 1 else ""
-            
-            # Amount parsing - handle debit/credit or single amount column
-            if len(row) >= 4 and is_number(row[2]) and is_number(row[3]):
-                # Debit/Credit format
-                debit = Decimal(row[2].replace(',', '').replace('$', '')) if row[2].strip() else Decimal('0')
-                credit = Decimal(row[3].replace(',', '').replace('$', '')) if row[3].strip() else Decimal('0')
-                entry['amount'] = credit - debit  # Positive for deposits, negative for withdrawals
-                
-                if len(row) > 4:
-                    entry['balance'] = Decimal(row[4].replace(',', '').replace('$', '')) if row[4].strip() else None
-            else:
-                # Single amount column
-                amount_str = row[2].replace(',', '').replace('$', '').strip() if len(row) > 2 else "0"
-                entry['amount'] = Decimal(amount_str)
-                
-                if len(row) > 3:
-                    entry['balance'] = Decimal(row[3].replace(',', '').replace('$', '')) if row[3].strip() else None
-            
-            entry['reference'] = row[0].strip()[:20]  # Use date as reference
-            
-            entries.append(entry)
+    # Rows with fewer than three cells have no amount and are skipped below
+    columns = [df[col].str.strip() for col in range(CSV_COLUMNS)]
+    amounts = [
+        pd.to_numeric(col.str.translate(_CLEAN_AMOUNT), errors='coerce')
+        for col in columns[2:]
+    ]
+    
+    # Amount parsing - handle debit/credit or single amount column
+    # Debit/Credit format: positive for deposits, negative for withdrawals
+    debit_credit = amounts[0].notna() & amounts[1].notna()
+    amount = amounts[1].sub(amounts[0]).where(debit_credit, amounts[0])
+    balance = amounts[1].where(~debit_credit, amounts[2])
+    
+    # Date is the first column; each distinct string is parsed once
+    raw_dates = columns[0]
+    parsed_dates = {value: _try_parse_date(value) for value in raw_dates.unique()}
+    dates = raw_dates.map(parsed_dates)
+    
+    valid = dates.notna() & amount.notna()
+    skipped = int((~valid).sum())
+    if skipped:
+        logger.warning(f"Skipped {skipped} CSV rows without a parseable date and amount")
+    
+    entries = []
+    for entry_date, description, entry_amount, entry_balance, reference in zip(
+        dates[valid].tolist(),
+        columns[1][valid].tolist(),
+        amount[valid].tolist(),
+        balance[valid].tolist(),
+        raw_dates[valid].tolist()
+    ):
+        entries.append({
+            'date': entry_date,
+            'description': description,
+            'amount': entry_amount,
+            'balance': None if entry_balance != entry_balance else entry_balance,  # NaN check
+            'reference': reference[:20]  # Use date as reference
+        })
+    
+    return entries
+
+def iter_ofx_transactions(content: bytes, start: int = 0):
+    """Stream STMTTRN elements, discarding each one once it has been processed"""
+    # BytesIO shares the bytes object; seeking skips any header without copying
+    stream = io.BytesIO(content)
+    stream.seek(start)
+    
+    if HAS_LXML:
+        # Recover mode tolerates the unclosed tags of SGML-style OFX, but nests
+        # each following transaction inside the previous one, so end events
+        # arrive innermost (last) first. Transactions are yielded in document
+        # order instead: an enclosing transaction's own fields are complete by
+        # the time the next one starts.
+        pending = None
+        for event, elem in ET.iterparse(
+            stream,
+            events=('start', 'end'),
+            tag=OFX_TRANSACTION_TAGS,
+            recover=True,
+            huge_tree=True
+        ):
+            if event == 'start':
+                if pending is not None:
+                    yield pending
+                pending = elem
+                continue
             
-        except Exception as e:
-            logger.warning(f"Failed to parse CSV row {row}: {str(e)}")
+            if elem is pending:
+                yield elem
+                pending = None
+            elem.clear()
+            # Drop already-processed transactions so the tree never grows; other
+            # siblings may still belong to an enclosing (SGML-nested) transaction
+            previous = elem.getprevious()
+            while previous is not None and previous.tag in OFX_TRANSACTION_TAGS:
+                elem.getparent().remove(previous)
+                previous = elem.getprevious()
+    else:
+        for _, elem in ET.iterparse(stream, events=('end',)):
+            if elem.tag in OFX_TRANSACTION_TAGS:
+                yield elem
+                elem.clear()
+
+def ofx_transaction_fields(txn) -> Dict[str, str]:
+    """Collect a STMTTRN element's field values, keyed by lowercased tag, in one pass"""
+    fields = {}
+    
+    for child in txn.iter():
+        tag = child.tag
+        if child is txn or not isinstance(tag, str):  # Skip the element itself and comments
             continue
+        
+        tag = tag.lower()
+        if tag == 'stmttrn':
+            # SGML recovery nests a following transaction inside this one
+            break
+        
+        text = child.text.strip() if child.text else ""
+        if tag in OFX_FIELD_TAGS and text and tag not in fields:
+            fields[tag] = text
     
-    return entries
+    return fields
 
 def parse_ofx_statement(file_content: str) -> List[Dict[str, Any]]:
     """Parse OFX/QFX bank statement (XML-based format)"""
     entries = []
     
     try:
-        # OFX can have SGML or XML format
-        # Try to convert SGML headers to XML if needed
-        if not file_content.strip().startswith('<?xml'):
+        content = file_content.encode('utf-8')
+        
+        # OFX can have SGML or XML format; SGML files start with a plain-text
+        # header block, so parsing starts at the <OFX> element instead
+        start_idx = 0
+        if not _XML_DECLARATION_RE.match(content):
             # Find the start of transactions
-            start_idx = file_content.find('<OFX>')
+            start_idx = content.find(b'<OFX>')
             if start_idx == -1:
-                start_idx = file_content.find('<ofx>')
-            if start_idx != -1:
-                file_content = '<?xml version="1.0"?>\n' + file_content[start_idx:]
-        
-        # Parse XML
-        root = ET.fromstring(file_content)
+                start_idx = content.find(b'<ofx>')
+            start_idx = max(start_idx, 0)
         
-        # Find all transaction elements (STMTTRN)
+        # Stream transaction elements (STMTTRN) instead of building the full tree
         # OFX structure: OFX/BANKMSGSRSV1/STMTTRNRS/STMTRS/BANKTRANLIST/STMTTRN
-        namespaces = {'': ''}  # OFX typically doesn't use namespaces
-        
-        # Try different possible paths
-        transaction_elements = []
-        for path in ['.//STMTTRN', './/stmttrn', './/STMTTRN', './/*[local-name()="STMTTRN"]']:
-            transaction_elements = root.findall(path)
-            if transaction_elements:
-                break
-        
-        for txn in transaction_elements:
+        for txn in iter_ofx_transactions(content, start_idx):
             try:
                 entry = {}
+                fields = ofx_transaction_fields(txn)
                 
                 # Date (DTPOSTED)
-                date_elem = txn.find('.//DTPOSTED') or txn.find('.//dtposted')
-                if date_elem is not None and date_elem.text:
+                if 'dtposted' in fields:
                     # OFX date format: YYYYMMDD or YYYYMMDDHHMMSS
-                    date_str = date_elem.text[:8]
+                    date_str = fields['dtposted'][:8]
                     entry['date'] = datetime.strptime(date_str, '%Y%m%d').date()
                 else:
                     continue  # Skip entries without date
                 
                 # Amount (TRNAMT)
-                amount_elem = txn.find('.//TRNAMT') or txn.find('.//trnamt')
-                if amount_elem is not None and amount_elem.text:
-                    entry['amount'] = Decimal(amount_elem.text)
+                if 'trnamt' in fields:
+                    entry['amount'] = float(fields['trnamt'])
                 else:
                     continue  # Skip entries without amount
                 
                 # Description (NAME or MEMO)
-                name_elem = txn.find('.//NAME') or txn.find('.//name')
-                memo_elem = txn.find('.//MEMO') or txn.find('.//memo')
-                
-                description = ""
-                if name_elem is not None and name_elem.text:
-                    description = name_elem.text
-                if memo_elem is not None and memo_elem.text:
-                    description = f"{description} - {memo_elem.text}" if description else memo_elem.text
+                description = fields.get('name', "")
+                if 'memo' in fields:
+                    description = f"{description} - {fields['memo']}" if description else fields['memo']
                 
                 entry['description'] = description.strip()
                 
                 # Reference (FITID)
-                fitid_elem = txn.find('.//FITID') or txn.find('.//fitid')
-                if fitid_elem is not None and fitid_elem.text:
-                    entry['reference'] = fitid_elem.text
+                if 'fitid' in fields:
+                    entry['reference'] = fields['fitid']
                 
                 entries.append(entry)
                 
@@ -202,65 +311,50 @@ def parse_qfx_statement(file_content: str) -> List[Dict[str, Any]]:
 
 def parse_date(date_str: str) -> date:
     """Parse date string in various formats"""
-    date_formats = [
-        '%Y-%m-%d',
-        '%m/%d/%Y',
-        '%d/%m/%Y',
-        '%Y/%m/%d',
-        '%m-%d-%Y',
-        '%d-%m-%Y',
-        '%m/%d/%y',
-        '%d/%m/%y',
-        '%b %d, %Y',
-        '%B %d, %Y',
-        '%d %b %Y',
-        '%d %B %Y',
-    ]
-    
-    for fmt in date_formats:
+    return _parse_date_cached(date_str.strip())
+
+@lru_cache(maxsize=4096)
+def _parse_date_cached(date_str: str) -> date:
+    """Try each supported format; statements repeat the same few dates, so results are memoized"""
+    for fmt in DATE_FORMATS:
         try:
-            return datetime.strptime(date_str.strip(), fmt).date()
+            return datetime.strptime(date_str, fmt).date()
         except ValueError:
             continue
     
     raise ValueError(f"Unable to parse date: {date_str}")
 
-def is_number(s: str) -> bool:
-    """Check if string can be converted to a number"""
+def _try_parse_date(date_str: str) -> Optional[date]:
+    """Parse a statement date, returning None instead of raising"""
     try:
-        float(s.replace(',', '').replace('$', '').strip())
-        return True
-    except (ValueError, AttributeError):
-        return False
+        return parse_date(date_str)
+    except ValueError:
+        return None
 
 # Matching Algorithms
 def calculate_match_confidence(
     bank_entry: Dict[str, Any],
     system_txn: Dict[str, Any],
-    tolerance_amount: Decimal = Decimal('0.01'),
+    tolerance_amount: float = 0.01,
     tolerance_days: int = 2
 ) -> float:
     """Calculate confidence score for a potential match (0.0 to 1.0)"""
     
     confidence = 0.0
     
-    # Amount matching (50% weight)
-    bank_amount = abs(Decimal(str(bank_entry['amount'])))
-    system_amount = abs(Decimal(str(system_txn['amount'])))
-    amount_diff = abs(bank_amount - system_amount)
+    # Amount matching (50% weight), compared in whole cents
+    tolerance_cents = amount_cents(tolerance_amount)
+    amount_diff = abs(amount_cents(bank_entry['amount']) - amount_cents(system_txn['amount']))
     
     if amount_diff == 0:
         confidence += 0.5
-    elif amount_diff <= tolerance_amount:
+    elif amount_diff <= tolerance_cents:
         confidence += 0.4
-    elif amount_diff <= tolerance_amount * 5:
+    elif amount_diff <= tolerance_cents * 5:
         confidence += 0.2
     
-    # Date matching (30% weight)
-    bank_date = bank_entry['date']
-    system_date = system_txn['transaction_date'].date() if isinstance(system_txn['transaction_date'], datetime) else system_txn['transaction_date']
-    
-    date_diff = abs((bank_date - system_date).days)
+    # Date matching (30% weight), compared as day ordinals
+    date_diff = abs(bank_entry['date'].toordinal() - _to_date(system_txn['transaction_date']).toordinal())
     
     if date_diff == 0:
         confidence += 0.3
@@ -270,19 +364,57 @@ def calculate_match_confidence(
         confidence += 0.1
     
     # Description similarity (20% weight)
-    bank_desc = bank_entry['description'].lower()
-    system_desc = system_txn['description'].lower()
+    confidence += description_similarity(bank_entry['description'], system_txn['description']) * 0.2
     
-    # Simple word matching
-    bank_words = set(re.findall(r'\w+', bank_desc))
-    system_words = set(re.findall(r'\w+', system_desc))
+    return round(confidence, 3)
+
+def description_similarity(bank_desc: str, system_desc: str) -> float:
+    """Similarity of two transaction descriptions (0.0 to 1.0)"""
+    return key_similarity(description_key(bank_desc), description_key(system_desc))
+
+def description_key(description: str) -> Any:
+    """Preprocessed form of a description, so each is normalized only once"""
+    if HAS_RAPIDFUZZ:
+        return fuzz_utils.default_process(description)
+    return description_words(description)
+
+def key_similarity(bank_key: Any, system_key: Any) -> float:
+    """Similarity of two preprocessed descriptions (0.0 to 1.0)"""
+    if HAS_RAPIDFUZZ:
+        # Token-set ratio tolerates extra words such as merchant suffixes
+        return fuzz.token_set_ratio(bank_key, system_key) / 100.0
     
-    if bank_words and system_words:
-        common_words = bank_words.intersection(system_words)
-        similarity = len(common_words) / max(len(bank_words), len(system_words))
-        confidence += similarity * 0.2
+    # Simple word matching
+    return word_overlap(bank_key, system_key)
+
+def description_words(description: str) -> frozenset:
+    """Lowercased set of words in a description"""
+    return frozenset(_WORD_RE.findall(description.lower()))
+
+def word_overlap(bank_words: frozenset, system_words: frozenset) -> float:
+    """Share of words two descriptions have in common (0.0 to 1.0)"""
+    if not bank_words or not system_words:
+        return 0.0
     
-    return round(confidence, 3)
+    common_words = bank_words.intersection(system_words)
+    return len(common_words) / max(len(bank_words), len(system_words))
+
+# Fields of a system transaction needed to score and suggest a match
+MATCH_CANDIDATE_PROJECTION = {
+    '_id': 1,
+    'transaction_date': 1,
+    'description': 1,
+    'amount': 1,
+    'reference_number': 1
+}
+
+def amount_cents(amount: Any) -> int:
+    """Absolute amount in whole cents, for exact tolerance comparisons"""
+    return round(abs(float(amount)) * 100)
+
+def _to_date(value: Any) -> date:
+    """Normalize a stored transaction date (datetime or date) to a date"""
+    return value.date() if isinstance(value, datetime) else value
 
 async def find_matching_transactions(
     bank_entries: List[Dict[str, Any]],
@@ -300,16 +432,56 @@ async def find_matching_transactions(
     min_date = min(dates) - timedelta(days=date_range_days)
     max_date = max(dates) + timedelta(days=date_range_days)
     
-    # Get unreconciled system transactions in date range
-    system_transactions = await transactions_collection.find({
-        'company_id': company_id,
-        'is_reconciled': False,
-        'status': {'$ne': 'void'},
-        'transaction_date': {
-            '$gte': datetime.combine(min_date, datetime.min.time()),
-            '$lte': datetime.combine(max_date, datetime.max.time())
-        }
-    }).to_list(length=None)
+    # Get unreconciled system transactions in date range, fetching only the
+    # fields used for scoring and suggestions
+    system_transactions = await transactions_collection.find(
+        {
+            'company_id': company_id,
+            'is_reconciled': False,
+            'status': {'$ne': 'void'},
+            'transaction_date': {
+                '$gte': datetime.combine(min_date, datetime.min.time()),
+                '$lte': datetime.combine(max_date, datetime.max.time())
+            }
+        },
+        MATCH_CANDIDATE_PROJECTION
+    ).to_list(length=None)
+    
+    # Scoring is CPU-bound; keep it off the event loop
+    return await asyncio.to_thread(score_matches, bank_entries, system_transactions)
+
+def score_matches(
+    bank_entries: List[Dict[str, Any]],
+    system_transactions: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Rank system transactions against each bank entry, keeping the top 5 suggestions"""
+    
+    # Amounts are compared in whole cents and scores kept in tenths so the
+    # tolerance checks and thresholds are exact integer comparisons; the
+    # weights match calculate_match_confidence
+    txn_count = len(system_transactions)
+    system_cents = np.fromiter(
+        (amount_cents(txn['amount']) for txn in system_transactions),
+        dtype=np.int64,
+        count=txn_count
+    )
+    system_ordinals = np.fromiter(
+        (_to_date(txn['transaction_date']).toordinal() for txn in system_transactions),
+        dtype=np.int64,
+        count=txn_count
+    )
+    
+    # Description similarity adds at most 0.2, so a candidate needs at least
+    # 0.2 from amount and date to clear 0.3: an amount within 5 cents or a
+    # date within 2 days. Sorting by each lets us binary-search both windows
+    # instead of scoring every system transaction
+    by_amount = np.argsort(system_cents, kind='stable')
+    sorted_cents = system_cents[by_amount]
+    by_date = np.argsort(system_ordinals, kind='stable')
+    sorted_ordinals = system_ordinals[by_date]
+    
+    # Normalize each description once rather than once per comparison
+    system_keys = [description_key(txn['description']) for txn in system_transactions]
     
     matches = []
     
@@ -317,10 +489,31 @@ async def find_matching_transactions(
         bank_entry_id = str(uuid.uuid4())
         bank_entry['id'] = bank_entry_id
         
+        bank_cents = amount_cents(bank_entry['amount'])
+        bank_ordinal = bank_entry['date'].toordinal()
+        
+        amount_lo = np.searchsorted(sorted_cents, bank_cents - 5, side='left')
+        amount_hi = np.searchsorted(sorted_cents, bank_cents + 5, side='right')
+        date_lo = np.searchsorted(sorted_ordinals, bank_ordinal - 2, side='left')
+        date_hi = np.searchsorted(sorted_ordinals, bank_ordinal + 2, side='right')
+        
+        # union1d returns sorted indices, keeping ties in system order
+        candidates = np.union1d(by_amount[amount_lo:amount_hi], by_date[date_lo:date_hi])
+        
+        amount_diff = np.abs(system_cents[candidates] - bank_cents)
+        date_diff = np.abs(system_ordinals[candidates] - bank_ordinal)
+        points = (
+            np.select([amount_diff == 0, amount_diff <= 1, amount_diff <= 5], [5, 4, 2], 0)
+            + np.select([date_diff == 0, date_diff <= 2, date_diff <= 4], [3, 2, 1], 0)
+        )
+        
         potential_matches = []
+        bank_key = description_key(bank_entry['description'])
         
-        for system_txn in system_transactions:
-            confidence = calculate_match_confidence(bank_entry, system_txn)
+        for idx, candidate_points in zip(candidates.tolist(), points.tolist()):
+            system_txn = system_transactions[idx]
+            similarity = key_similarity(bank_key, system_keys[idx])
+            confidence = round(candidate_points / 10 + similarity * 0.2, 3)
             
             if confidence > 0.3:  # Only include matches with >30% confidence
                 potential_matches.append({
@@ -346,6 +539,26 @@ async def find_matching_transactions(
     
     return matches
 
+# Bank entries are stored one document per statement line, keyed by
+# session_id and ordered by position; these fields are internal
+BANK_ENTRY_PROJECTION = {'_id': 0, 'session_id': 0, 'position': 0}
+
+def find_bank_entries(session_id: str, matched: Optional[bool] = None):
+    """Cursor over a session's bank entries in statement order"""
+    query = {'session_id': session_id}
+    if matched is not None:
+        query['matched'] = matched
+    return reconciliation_bank_entries_collection.find(query, BANK_ENTRY_PROJECTION).sort('position', 1)
+
+async def sum_amounts(collection, query: Dict[str, Any]) -> float:
+    """Sum the amount field of matching documents with a $group aggregation"""
+    async for totals in collection.aggregate([
+        {'$match': query},
+        {'$group': {'_id': None, 'total': {'$sum': '$amount'}}}
+    ]):
+        return totals['total']
+    return 0.0
+
 # API Endpoints
 @router.post("/upload-statement")
 async def upload_bank_statement(
@@ -363,35 +576,38 @@ async def upload_bank_statement(
         company_id = current_user['company_id']
         user_id = current_user['_id']
         
-        # Verify account exists
-        account = await accounts_collection.find_one({
-            '_id': account_id,
-            'company_id': company_id
-        })
+        # Pick parser based on file extension
+        filename = file.filename.lower()
         
-        if not account:
+        if filename.endswith('.csv'):
+            parse_statement = parse_csv_statement
+        elif filename.endswith('.ofx'):
+            parse_statement = parse_ofx_statement
+        elif filename.endswith('.qfx'):
+            parse_statement = parse_qfx_statement
+        else:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Account not found"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Unsupported file format. Please upload CSV, OFX, or QFX file."
             )
         
         # Read file content
         content = await file.read()
         file_content = content.decode('utf-8', errors='ignore')
         
-        # Parse based on file extension
-        filename = file.filename.lower()
+        # Parse in a worker thread while the account is verified
+        account, entries = await asyncio.gather(
+            accounts_collection.find_one({
+                '_id': account_id,
+                'company_id': company_id
+            }),
+            asyncio.to_thread(parse_statement, file_content)
+        )
         
-        if filename.endswith('.csv'):
-            entries = parse_csv_statement(file_content)
-        elif filename.endswith('.ofx'):
-            entries = parse_ofx_statement(file_content)
-        elif filename.endswith('.qfx'):
-            entries = parse_qfx_statement(file_content)
-        else:
+        if not account:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Unsupported file format. Please upload CSV, OFX, or QFX file."
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Account not found"
             )
         
         if not entries:
@@ -403,8 +619,34 @@ async def upload_bank_statement(
         # Find potential matches
         matches = await find_matching_transactions(entries, company_id, account_id)
         
-        # Create reconciliation session
         session_id = str(uuid.uuid4())
+        
+        # Auto-match high confidence matches if enabled. Decided before the
+        # session is written so the session and its matches are two inserts
+        auto_matched = {}
+        match_docs = []
+        if auto_match:
+            matched_at = datetime.utcnow()
+            for match in matches:
+                if match['suggested_matches'] and match['suggested_matches'][0]['confidence_score'] >= 0.8:
+                    # Auto-approve matches with 80%+ confidence
+                    best_match = match['suggested_matches'][0]
+                    auto_matched[match['bank_entry_id']] = best_match['system_transaction_id']
+                    
+                    match_docs.append({
+                        '_id': str(uuid.uuid4()),
+                        'session_id': session_id,
+                        'bank_entry_id': match['bank_entry_id'],
+                        'system_transaction_id': best_match['system_transaction_id'],
+                        'confidence_score': best_match['confidence_score'],
+                        'match_type': 'automatic',
+                        'matched_at': matched_at,
+                        'matched_by': user_id
+                    })
+        
+        auto_matched_count = len(match_docs)
+        
+        # Create reconciliation session
         session_doc = {
             '_id': session_id,
             'company_id': company_id,
@@ -417,60 +659,34 @@ async def upload_bank_statement(
             'auto_match': auto_match,
             'filename': file.filename,
             'status': 'in_progress',
-            'bank_entries': [
-                {
-                    'id': entry['id'],
-                    'date': entry['date'].isoformat(),
-                    'description': entry['description'],
-                    'amount': float(entry['amount']),
-                    'reference': entry.get('reference'),
-                    'balance': float(entry['balance']) if entry.get('balance') else None,
-                    'matched': False,
-                    'matched_transaction_id': None
-                }
-                for entry in entries
-            ],
             'total_bank_entries': len(entries),
-            'matched_count': 0,
-            'unmatched_count': len(entries),
+            'matched_count': auto_matched_count,
+            'unmatched_count': len(entries) - auto_matched_count,
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
         
+        bank_entry_docs = [
+            {
+                'session_id': session_id,
+                'position': position,
+                'id': entry['id'],
+                'date': entry['date'].isoformat(),
+                'description': entry['description'],
+                'amount': entry['amount'],
+                'reference': entry.get('reference'),
+                'balance': entry.get('balance'),
+                'matched': entry['id'] in auto_matched,
+                'matched_transaction_id': auto_matched.get(entry['id'])
+            }
+            for position, entry in enumerate(entries)
+        ]
+        
         await reconciliation_sessions_collection.insert_one(session_doc)
+        await reconciliation_bank_entries_collection.insert_many(bank_entry_docs, ordered=False)
         
-        # Auto-match high confidence matches if enabled
-        auto_matched_count = 0
-        if auto_match:
-            for match in matches:
-                if match['suggested_matches'] and match['suggested_matches'][0]['confidence_score'] >= 0.8:
-                    # Auto-approve matches with 80%+ confidence
-                    best_match = match['suggested_matches'][0]
-                    
-                    match_doc = {
-                        '_id': str(uuid.uuid4()),
-                        'session_id': session_id,
-                        'bank_entry_id': match['bank_entry_id'],
-                        'system_transaction_id': best_match['system_transaction_id'],
-                        'confidence_score': best_match['confidence_score'],
-                        'match_type': 'automatic',
-                        'matched_at': datetime.utcnow(),
-                        'matched_by': user_id
-                    }
-                    
-                    await reconciliation_matches_collection.insert_one(match_doc)
-                    
-                    # Update session
-                    await reconciliation_sessions_collection.update_one(
-                        {'_id': session_id},
-                        {
-                            '$inc': {'matched_count': 1, 'unmatched_count': -1},
-                            '$set': {f'bank_entries.{matches.index(match)}.matched': True,
-                                   f'bank_entries.{matches.index(match)}.matched_transaction_id': best_match['system_transaction_id']}
-                        }
-                    )
-                    
-                    auto_matched_count += 1
+        if match_docs:
+            await reconciliation_matches_collection.insert_many(match_docs, ordered=False)
         
         # Audit log
         await log_audit_event(
@@ -568,6 +784,7 @@ async def get_reconciliation_session(
     }).to_list(length=None)
     
     session['_id'] = str(session['_id'])
+    session['bank_entries'] = await find_bank_entries(session_id).to_list(length=None)
     session['matches'] = matches
     
     return session
@@ -598,31 +815,42 @@ async def match_transactions(
             )
         
         matched_count = 0
+        matched_at = datetime.utcnow()
         
+        # Skip entries that are already matched with one lookup; startup falls
+        # back to a non-unique index when duplicates exist, so it can't be relied on
+        requested_ids = {match.bank_entry_id for match in request.matches}
+        seen_ids = set(await reconciliation_matches_collection.distinct(
+            'bank_entry_id',
+            {'session_id': request.session_id, 'bank_entry_id': {'$in': list(requested_ids)}}
+        )) if requested_ids else set()
+        
+        match_docs = []
         for match in request.matches:
-            # Check if already matched
-            existing = await reconciliation_matches_collection.find_one({
-                'session_id': request.session_id,
-                'bank_entry_id': match.bank_entry_id
-            })
-            
-            if existing:
+            if match.bank_entry_id in seen_ids:
                 continue
-            
-            # Create match
-            match_doc = {
+            seen_ids.add(match.bank_entry_id)
+            match_docs.append({
                 '_id': str(uuid.uuid4()),
                 'session_id': request.session_id,
                 'bank_entry_id': match.bank_entry_id,
                 'system_transaction_id': match.system_transaction_id,
                 'confidence_score': match.confidence_score,
                 'match_type': 'manual',
-                'matched_at': datetime.utcnow(),
+                'matched_at': matched_at,
                 'matched_by': current_user['_id']
-            }
-            
-            await reconciliation_matches_collection.insert_one(match_doc)
-            matched_count += 1
+            })
+        
+        if match_docs:
+            # The unique (session_id, bank_entry_id) index, when present, also
+            # rejects entries matched concurrently; the rest are still inserted
+            try:
+                result = await reconciliation_matches_collection.insert_many(match_docs, ordered=False)
+                matched_count = len(result.inserted_ids)
+            except BulkWriteError as e:
+                if any(error['code'] != 11000 for error in e.details['writeErrors']):
+                    raise
+                matched_count = e.details['nInserted']
         
         # Update session counts
         await reconciliation_sessions_collection.update_one(
@@ -799,27 +1027,19 @@ async def get_reconciliation_report(
         )
     
     # Get matches
-    matches = await reconciliation_matches_collection.find({
-        'session_id': session_id
-    }).to_list(length=None)
+    matches = await reconciliation_matches_collection.find(
+        {'session_id': session_id},
+        {'_id': 0, 'bank_entry_id': 1, 'system_transaction_id': 1, 'confidence_score': 1, 'match_type': 1}
+    ).to_list(length=None)
     
-    # Get matched transaction details
     matched_transaction_ids = [match['system_transaction_id'] for match in matches]
-    matched_transactions = []
-    
-    if matched_transaction_ids:
-        matched_transactions = await transactions_collection.find({
-            '_id': {'$in': matched_transaction_ids}
-        }).to_list(length=None)
-    
-    # Calculate reconciliation summary
-    total_bank_amount = sum(Decimal(str(entry['amount'])) for entry in session['bank_entries'])
-    total_matched_amount = sum(Decimal(str(txn['amount'])) for txn in matched_transactions)
     
-    unmatched_bank_entries = [
-        entry for entry in session['bank_entries']
-        if not entry.get('matched', False)
-    ]
+    # Calculate reconciliation summary; both totals are summed server-side
+    total_bank_amount, total_matched_amount, unmatched_bank_entries = await asyncio.gather(
+        sum_amounts(reconciliation_bank_entries_collection, {'session_id': session_id}),
+        sum_amounts(transactions_collection, {'_id': {'$in': matched_transaction_ids}}),
+        find_bank_entries(session_id, matched=False).to_list(length=None)
+    )
     
     report = {
         'session_id': session_id,
@@ -832,9 +1052,9 @@ async def get_reconciliation_report(
             'total_bank_entries': session['total_bank_entries'],
             'matched_count': session['matched_count'],
             'unmatched_count': session['unmatched_count'],
-            'total_bank_amount': float(total_bank_amount),
-            'total_matched_amount': float(total_matched_amount),
-            'difference': float(total_bank_amount - total_matched_amount)
+            'total_bank_amount': total_bank_amount,
+            'total_matched_amount': total_matched_amount,
+            'difference': round(total_bank_amount - total_matched_amount, 2)
         },
         'matched_transactions': [
             {
@@ -859,27 +1079,36 @@ async def delete_reconciliation_session(
 ):
     """Delete a reconciliation session"""
     
-    session = await reconciliation_sessions_collection.find_one({
-        '_id': session_id,
-        'company_id': current_user['company_id']
-    })
+    # Completed sessions are excluded by the filter, so this only deletes what may be deleted
+    session = await reconciliation_sessions_collection.find_one_and_delete(
+        {
+            '_id': session_id,
+            'company_id': current_user['company_id'],
+            'status': {'$ne': 'completed'}
+        },
+        projection={'_id': 1}
+    )
     
     if not session:
+        # Only a failed delete pays for the read that tells the two errors apart
+        existing = await reconciliation_sessions_collection.find_one(
+            {'_id': session_id, 'company_id': current_user['company_id']},
+            {'_id': 1}
+        )
+        if existing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot delete completed reconciliation"
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Reconciliation session not found"
         )
     
-    if session['status'] == 'completed':
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cannot delete completed reconciliation"
-        )
-    
-    # Delete matches
-    await reconciliation_matches_collection.delete_many({'session_id': session_id})
-    
-    # Delete session
-    await reconciliation_sessions_collection.delete_one({'_id': session_id})
+    # Delete matches and bank entries
+    await asyncio.gather(
+        reconciliation_matches_collection.delete_many({'session_id': session_id}),
+        reconciliation_bank_entries_collection.delete_many({'session_id': session_id})
+    )
     
     return {'success': True, 'message': 'Reconciliation session deleted'}
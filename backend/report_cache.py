@@ -0,0 +1,88 @@
+import redis
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+import os
+
+logger = logging.getLogger(__name__)
+
+def _json_default(value: Any) -> str:
+    """Serialize datetimes the way the API responses render them"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class ReportCache:
+    """Redis-based cache for expensive per-company reports"""
+
+    AGING_REPORT_TTL_SECONDS = 300
+
+    def __init__(self):
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+        try:
+            self.client = redis.from_url(
+                redis_url,
+                decode_responses=True,
+                socket_connect_timeout=5,
+                socket_timeout=5
+            )
+            # Test connection
+            self.client.ping()
+            logger.info("✅ Redis connection established for report cache")
+        except redis.ConnectionError as e:
+            logger.error(f"❌ Redis connection failed: {e}")
+            logger.warning("⚠️  Report cache disabled without Redis - reports will be computed on every request")
+            self.client = None
+        except Exception as e:
+            logger.error(f"❌ Unexpected error connecting to Redis: {e}")
+            self.client = None
+
+    def _get_aging_report_key(self, company_id: str) -> str:
+        """Generate Redis key for a company's aging report"""
+        return f"aging:{company_id}"
+
+    def get_aging_report(self, company_id: str) -> Optional[Dict[str, Any]]:
+        """Return the cached aging report, or None on a miss"""
+
+        if not self.client:
+            return None
+
+        try:
+            value = self.client.get(self._get_aging_report_key(company_id))
+            if value is None:
+                return None
+            return json.loads(value)
+        except Exception as e:
+            logger.error(f"Failed to read aging report cache: {e}")
+            return None
+
+    def set_aging_report(self, company_id: str, report: Dict[str, Any]) -> None:
+        """Cache a company's aging report"""
+
+        if not self.client:
+            return
+
+        try:
+            self.client.setex(
+                self._get_aging_report_key(company_id),
+                self.AGING_REPORT_TTL_SECONDS,
+                json.dumps(report, default=_json_default)
+            )
+        except Exception as e:
+            logger.error(f"Failed to write aging report cache: {e}")
+
+    def invalidate_aging_report(self, company_id: str) -> None:
+        """Drop a company's cached aging report (e.g., after a payment is recorded)"""
+
+        if not self.client:
+            return
+
+        try:
+            self.client.delete(self._get_aging_report_key(company_id))
+        except Exception as e:
+            logger.error(f"Failed to invalidate aging report cache: {e}")
+
+# Global instance
+report_cache = ReportCache()
@@ -4,435 +4,562 @@ Provides PDF and Excel export functionality for financial reports
 """
 import io
 import csv
-from typing import Dict, Any, List
+from collections import ChainMap
+from typing import Dict, Any, Iterator, List, Optional
 from datetime import datetime
 from decimal import Decimal
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Table, LongTable, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
 from fastapi.responses import StreamingResponse
 import logging
 
+# xlsxwriter is faster than openpyxl for very large sheets; without it every export uses openpyxl
+try:
+    import xlsxwriter
+    HAS_XLSXWRITER = True
+except ImportError:
+    xlsxwriter = None
+    HAS_XLSXWRITER = False
+
 logger = logging.getLogger(__name__)
 
+# Shared by every Excel header cell so openpyxl registers a single style
+_HEADER_FONT = Font(bold=True)
+
+# Amounts are written to Excel as numbers and displayed with this format
+_CURRENCY_FORMAT = '"$"#,##0.00'
+
+_format_currency = "${:,.2f}".format
+
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Height ReportLab measures for a single line of table text with default padding
+_TABLE_ROW_HEIGHT = 18
+
+# Ledger and trial balance tables longer than this get fixed row heights
+_FIXED_ROW_HEIGHT_THRESHOLD = 500
+
+# Trial balances and ledgers with more rows than this go through xlsxwriter
+_LARGE_EXCEL_ROW_THRESHOLD = 5000
+
+# PDF header block; fields missing from the report data fall back to _METADATA_DEFAULTS
+_METADATA_TEMPLATE = (
+    "<b>Company:</b> {company_name}<br/>"
+    "<b>Generated:</b> {generated}<br/>"
+    "<b>Period:</b> {period_start} to {period_end}<br/>"
+    "<b>Currency:</b> {currency}"
+)
+
+_METADATA_DEFAULTS = {
+    'company_name': 'N/A',
+    'period_start': '',
+    'period_end': '',
+    'currency': 'USD'
+}
+
+_TITLE_COLOR = colors.HexColor('#1a1a1a')
+_HEADING_COLOR = colors.HexColor('#333333')
+
+_STYLES = getSampleStyleSheet()
+
+_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=20,
+    textColor=_TITLE_COLOR,
+    spaceAfter=30,
+    alignment=TA_CENTER
+)
+
+_HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_STYLES['Heading2'],
+    fontSize=14,
+    textColor=_HEADING_COLOR,
+    spaceAfter=12,
+    spaceBefore=12
+)
+
+# Table styles are shared by every export; setStyle only reads them
+_PROFIT_LOSS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
+])
+
+_BALANCE_SHEET_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
+])
+
+_CASH_FLOW_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
+])
+
+_TRIAL_BALANCE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (1, -1), 'LEFT'),
+    ('ALIGN', (2, 0), (3, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
+])
+
+# Bold right-aligned totals; callers add any per-report TEXTCOLOR on top
+_SUMMARY_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('LINEABOVE', (0, 0), (-1, 0), 2, colors.black),
+    ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
+])
+
+# Identical for every account in the general ledger
+_GL_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (2, -1), 'LEFT'),
+    ('ALIGN', (3, 0), (5, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+
+def _iter_slices(data) -> Iterator[bytes]:
+    """Yield a finished document in fixed-size chunks for StreamingResponse"""
+    # Iterating a BytesIO directly would split binary output on every newline byte
+    for start in range(0, len(data), _STREAM_CHUNK_SIZE):
+        yield bytes(data[start:start + _STREAM_CHUNK_SIZE])
+
+
+def _single_line(text):
+    """Collapse line breaks so a PDF table cell stays one row high"""
+    return text.replace('\n', ' ') if isinstance(text, str) else text
+
+
+class _PDFSink:
+    """Write target for SimpleDocTemplate that keeps the finished document bytes"""
+    
+    def __init__(self):
+        self.data = b''
+    
+    def write(self, data: bytes):
+        # ReportLab serializes the whole document and writes it in one call,
+        # so holding the bytes object avoids copying it into a BytesIO
+        self.data += data
+
+
+class _CSVChunkBuffer:
+    """File-like target for csv.writer that groups written rows into encoded chunks"""
+    
+    CHUNK_SIZE = _STREAM_CHUNK_SIZE
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self._pending: List[str] = []
+        self._pending_size = 0
+    
+    def write(self, row: str):
+        self._pending.append(row)
+        self._pending_size += len(row)
+        if self._pending_size >= self.CHUNK_SIZE:
+            self._flush()
+    
+    def _flush(self):
+        if self._pending:
+            self.chunks.append(''.join(self._pending).encode())
+            self._pending = []
+            self._pending_size = 0
+    
+    def getchunks(self) -> List[bytes]:
+        """Return the response body chunks, including any partially filled chunk"""
+        self._flush()
+        return self.chunks
+
 
 class ReportExporter:
     """Handle export of financial reports to various formats"""
     
+    @staticmethod
+    def render(report_data: Dict[str, Any], report_type: str, export_format: str) -> bytes:
+        """Render report data to the file bytes of an export format"""
+        
+        renderer = _RENDERERS.get(export_format)
+        if renderer is None:
+            raise ValueError(f"Unknown export format: {export_format}")
+        return renderer(report_data, report_type)
+    
     @staticmethod
     def export_to_pdf(report_data: Dict[str, Any], report_type: str) -> StreamingResponse:
         """Export report data to PDF format"""
         
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.75*inch, bottomMargin=0.75*inch)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=20,
-            textColor=colors.HexColor('#1a1a1a'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
+        # One timestamp for the metadata line and the filename
+        now = datetime.utcnow()
         
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#333333'),
-            spaceAfter=12,
-            spaceBefore=12
+        filename = f"{report_type}_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
+        
+        return StreamingResponse(
+            _iter_slices(ReportExporter.render_pdf(report_data, report_type, now)),
+            media_type='application/pdf',
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
         )
+    
+    @staticmethod
+    def render_pdf(report_data: Dict[str, Any], report_type: str, now: Optional[datetime] = None) -> bytes:
+        """Render report data to PDF bytes"""
+        
+        now = now or datetime.utcnow()
+        
+        pdf = _PDFSink()
+        doc = SimpleDocTemplate(pdf, pagesize=letter, topMargin=0.75*inch, bottomMargin=0.75*inch)
+        story = []
         
         # Title
-        story.append(Paragraph(report_data.get('report_name', 'Financial Report'), title_style))
+        story.append(Paragraph(report_data.get('report_name', 'Financial Report'), _TITLE_STYLE))
         story.append(Spacer(1, 0.2*inch))
         
         # Report metadata
-        metadata_text = f"""
-        <b>Company:</b> {report_data.get('company_name', 'N/A')}<br/>
-        <b>Generated:</b> {datetime.utcnow().strftime('%B %d, %Y at %I:%M %p')}<br/>
-        <b>Period:</b> {report_data.get('period_start', '')} to {report_data.get('period_end', '')}<br/>
-        <b>Currency:</b> {report_data.get('currency', 'USD')}
-        """
-        story.append(Paragraph(metadata_text, styles['Normal']))
+        metadata_text = _METADATA_TEMPLATE.format_map(ChainMap(
+            {'generated': now.strftime('%B %d, %Y at %I:%M %p')},
+            report_data,
+            _METADATA_DEFAULTS
+        ))
+        story.append(Paragraph(metadata_text, _STYLES['Normal']))
         story.append(Spacer(1, 0.3*inch))
         
         if report_type == 'profit_loss':
-            story.extend(ReportExporter._build_profit_loss_pdf(report_data, heading_style))
+            story.extend(ReportExporter._build_profit_loss_pdf(report_data))
         elif report_type == 'balance_sheet':
-            story.extend(ReportExporter._build_balance_sheet_pdf(report_data, heading_style))
+            story.extend(ReportExporter._build_balance_sheet_pdf(report_data))
         elif report_type == 'cash_flow':
-            story.extend(ReportExporter._build_cash_flow_pdf(report_data, heading_style))
+            story.extend(ReportExporter._build_cash_flow_pdf(report_data))
         elif report_type == 'trial_balance':
-            story.extend(ReportExporter._build_trial_balance_pdf(report_data, heading_style))
+            story.extend(ReportExporter._build_trial_balance_pdf(report_data))
         elif report_type == 'general_ledger':
-            story.extend(ReportExporter._build_general_ledger_pdf(report_data, heading_style))
+            story.extend(ReportExporter._build_general_ledger_pdf(report_data))
         
         # Build PDF
         doc.build(story)
-        buffer.seek(0)
-        
-        filename = f"{report_type}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.pdf"
         
-        return StreamingResponse(
-            buffer,
-            media_type='application/pdf',
-            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
-        )
+        return pdf.data
     
     @staticmethod
-    def _build_profit_loss_pdf(data: Dict[str, Any], heading_style) -> List:
+    def _build_profit_loss_pdf(data: Dict[str, Any]) -> List:
         """Build Profit & Loss statement PDF content"""
         elements = []
         
         # Revenue section
-        elements.append(Paragraph("<b>REVENUE</b>", heading_style))
-        
-        revenue_data = [['Account', 'Account Number', 'Amount']]
-        for account in data.get('revenue_accounts', []):
-            revenue_data.append([
-                account.get('account_name', ''),
-                account.get('account_number', ''),
-                f"${float(account.get('amount', 0)):,.2f}"
+        revenue_accounts = data.get('revenue_accounts', [])
+        if revenue_accounts or data.get('total_revenue'):
+            elements.append(Paragraph("<b>REVENUE</b>", _HEADING_STYLE))
+            
+            revenue_data = [['Account', 'Account Number', 'Amount']]
+            revenue_data.extend([
+                [
+                    account.get('account_name', ''),
+                    account.get('account_number', ''),
+                    _format_currency(float(account.get('amount', 0)))
+                ]
+                for account in revenue_accounts
             ])
-        
-        revenue_data.append(['', '<b>Total Revenue</b>', f"<b>${float(data.get('total_revenue', 0)):,.2f}</b>"])
-        
-        revenue_table = Table(revenue_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
-        revenue_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ]))
-        
-        elements.append(revenue_table)
-        elements.append(Spacer(1, 0.3*inch))
+            
+            revenue_data.append(['', '<b>Total Revenue</b>', f"<b>{_format_currency(float(data.get('total_revenue', 0)))}</b>"])
+            
+            revenue_table = Table(revenue_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
+            revenue_table.setStyle(_PROFIT_LOSS_TABLE_STYLE)
+            
+            elements.append(revenue_table)
+            elements.append(Spacer(1, 0.3*inch))
         
         # Expenses section
-        elements.append(Paragraph("<b>EXPENSES</b>", heading_style))
-        
-        expense_data = [['Account', 'Account Number', 'Amount']]
-        for account in data.get('expense_accounts', []):
-            expense_data.append([
-                account.get('account_name', ''),
-                account.get('account_number', ''),
-                f"${float(account.get('amount', 0)):,.2f}"
+        expense_accounts = data.get('expense_accounts', [])
+        if expense_accounts or data.get('total_expenses'):
+            elements.append(Paragraph("<b>EXPENSES</b>", _HEADING_STYLE))
+            
+            expense_data = [['Account', 'Account Number', 'Amount']]
+            expense_data.extend([
+                [
+                    account.get('account_name', ''),
+                    account.get('account_number', ''),
+                    _format_currency(float(account.get('amount', 0)))
+                ]
+                for account in expense_accounts
             ])
-        
-        expense_data.append(['', '<b>Total Expenses</b>', f"<b>${float(data.get('total_expenses', 0)):,.2f}</b>"])
-        
-        expense_table = Table(expense_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
-        expense_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ]))
-        
-        elements.append(expense_table)
-        elements.append(Spacer(1, 0.3*inch))
+            
+            expense_data.append(['', '<b>Total Expenses</b>', f"<b>{_format_currency(float(data.get('total_expenses', 0)))}</b>"])
+            
+            expense_table = Table(expense_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
+            expense_table.setStyle(_PROFIT_LOSS_TABLE_STYLE)
+            
+            elements.append(expense_table)
+            elements.append(Spacer(1, 0.3*inch))
         
         # Net income
         net_income = float(data.get('net_income', 0))
         net_income_color = colors.green if net_income >= 0 else colors.red
         
         summary_data = [
-            ['<b>Gross Profit</b>', f"<b>${float(data.get('gross_profit', 0)):,.2f}</b>"],
-            ['<b>Net Income</b>', f"<b>${net_income:,.2f}</b>"]
+            ['<b>Gross Profit</b>', f"<b>{_format_currency(float(data.get('gross_profit', 0)))}</b>"],
+            ['<b>Net Income</b>', f"<b>{_format_currency(net_income)}</b>"]
         ]
         
         summary_table = Table(summary_data, colWidths=[4.5*inch, 1.5*inch])
-        summary_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('LINEABOVE', (0, 0), (-1, 0), 2, colors.black),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-            ('TEXTCOLOR', (1, -1), (1, -1), net_income_color),
-        ]))
+        summary_table.setStyle(_SUMMARY_TABLE_STYLE)
+        summary_table.setStyle([('TEXTCOLOR', (1, -1), (1, -1), net_income_color)])
         
         elements.append(summary_table)
         
         return elements
     
     @staticmethod
-    def _build_balance_sheet_pdf(data: Dict[str, Any], heading_style) -> List:
+    def _split_current_rows(accounts: List[Dict[str, Any]]):
+        """Build balance rows for current and non-current accounts in a single pass"""
+        current_rows, non_current_rows = [], []
+        for account in accounts:
+            get = account.get
+            (current_rows if get('is_current') else non_current_rows).append([
+                f"  {get('account_name', '')}",
+                get('account_number', ''),
+                _format_currency(float(get('balance', 0)))
+            ])
+        return current_rows, non_current_rows
+    
+    @staticmethod
+    def _build_balance_sheet_pdf(data: Dict[str, Any]) -> List:
         """Build Balance Sheet PDF content"""
         elements = []
         
         # Assets section
-        elements.append(Paragraph("<b>ASSETS</b>", heading_style))
-        
-        asset_data = [['Account', 'Account Number', 'Balance']]
-        
-        # Current assets
-        asset_data.append(['<b>Current Assets</b>', '', ''])
-        for account in data.get('asset_accounts', []):
-            if account.get('is_current'):
-                asset_data.append([
-                    f"  {account.get('account_name', '')}",
-                    account.get('account_number', ''),
-                    f"${float(account.get('balance', 0)):,.2f}"
-                ])
-        
-        asset_data.append(['', '<i>Total Current Assets</i>', f"<i>${float(data.get('current_assets', 0)):,.2f}</i>"])
-        
-        # Non-current assets
-        asset_data.append(['<b>Non-Current Assets</b>', '', ''])
-        for account in data.get('asset_accounts', []):
-            if not account.get('is_current'):
-                asset_data.append([
-                    f"  {account.get('account_name', '')}",
-                    account.get('account_number', ''),
-                    f"${float(account.get('balance', 0)):,.2f}"
-                ])
-        
-        asset_data.append(['', '<i>Total Non-Current Assets</i>', f"<i>${float(data.get('non_current_assets', 0)):,.2f}</i>"])
-        asset_data.append(['', '<b>TOTAL ASSETS</b>', f"<b>${float(data.get('total_assets', 0)):,.2f}</b>"])
-        
-        asset_table = Table(asset_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
-        asset_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ]))
-        
-        elements.append(asset_table)
-        elements.append(Spacer(1, 0.3*inch))
+        asset_accounts = data.get('asset_accounts', [])
+        if asset_accounts or data.get('total_assets'):
+            elements.append(Paragraph("<b>ASSETS</b>", _HEADING_STYLE))
+            
+            current_rows, non_current_rows = ReportExporter._split_current_rows(asset_accounts)
+            
+            asset_data = [['Account', 'Account Number', 'Balance']]
+            
+            # Current assets
+            if current_rows or data.get('current_assets'):
+                asset_data.append(['<b>Current Assets</b>', '', ''])
+                asset_data.extend(current_rows)
+                asset_data.append(['', '<i>Total Current Assets</i>', f"<i>{_format_currency(float(data.get('current_assets', 0)))}</i>"])
+            
+            # Non-current assets
+            if non_current_rows or data.get('non_current_assets'):
+                asset_data.append(['<b>Non-Current Assets</b>', '', ''])
+                asset_data.extend(non_current_rows)
+                asset_data.append(['', '<i>Total Non-Current Assets</i>', f"<i>{_format_currency(float(data.get('non_current_assets', 0)))}</i>"])
+            
+            asset_data.append(['', '<b>TOTAL ASSETS</b>', f"<b>{_format_currency(float(data.get('total_assets', 0)))}</b>"])
+            
+            asset_table = Table(asset_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
+            asset_table.setStyle(_BALANCE_SHEET_TABLE_STYLE)
+            
+            elements.append(asset_table)
+            elements.append(Spacer(1, 0.3*inch))
         
         # Liabilities section
-        elements.append(Paragraph("<b>LIABILITIES</b>", heading_style))
-        
-        liability_data = [['Account', 'Account Number', 'Balance']]
-        
-        # Current liabilities
-        liability_data.append(['<b>Current Liabilities</b>', '', ''])
-        for account in data.get('liability_accounts', []):
-            if account.get('is_current'):
-                liability_data.append([
-                    f"  {account.get('account_name', '')}",
-                    account.get('account_number', ''),
-                    f"${float(account.get('balance', 0)):,.2f}"
-                ])
-        
-        liability_data.append(['', '<i>Total Current Liabilities</i>', f"<i>${float(data.get('current_liabilities', 0)):,.2f}</i>"])
-        
-        # Long-term liabilities
-        liability_data.append(['<b>Long-Term Liabilities</b>', '', ''])
-        for account in data.get('liability_accounts', []):
-            if not account.get('is_current'):
-                liability_data.append([
-                    f"  {account.get('account_name', '')}",
-                    account.get('account_number', ''),
-                    f"${float(account.get('balance', 0)):,.2f}"
-                ])
-        
-        liability_data.append(['', '<i>Total Long-Term Liabilities</i>', f"<i>${float(data.get('long_term_liabilities', 0)):,.2f}</i>"])
-        liability_data.append(['', '<b>TOTAL LIABILITIES</b>', f"<b>${float(data.get('total_liabilities', 0)):,.2f}</b>"])
-        
-        liability_table = Table(liability_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
-        liability_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ]))
-        
-        elements.append(liability_table)
-        elements.append(Spacer(1, 0.3*inch))
+        liability_accounts = data.get('liability_accounts', [])
+        if liability_accounts or data.get('total_liabilities'):
+            elements.append(Paragraph("<b>LIABILITIES</b>", _HEADING_STYLE))
+            
+            current_rows, non_current_rows = ReportExporter._split_current_rows(liability_accounts)
+            
+            liability_data = [['Account', 'Account Number', 'Balance']]
+            
+            # Current liabilities
+            if current_rows or data.get('current_liabilities'):
+                liability_data.append(['<b>Current Liabilities</b>', '', ''])
+                liability_data.extend(current_rows)
+                liability_data.append(['', '<i>Total Current Liabilities</i>', f"<i>{_format_currency(float(data.get('current_liabilities', 0)))}</i>"])
+            
+            # Long-term liabilities
+            if non_current_rows or data.get('long_term_liabilities'):
+                liability_data.append(['<b>Long-Term Liabilities</b>', '', ''])
+                liability_data.extend(non_current_rows)
+                liability_data.append(['', '<i>Total Long-Term Liabilities</i>', f"<i>{_format_currency(float(data.get('long_term_liabilities', 0)))}</i>"])
+            
+            liability_data.append(['', '<b>TOTAL LIABILITIES</b>', f"<b>{_format_currency(float(data.get('total_liabilities', 0)))}</b>"])
+            
+            liability_table = Table(liability_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
+            liability_table.setStyle(_BALANCE_SHEET_TABLE_STYLE)
+            
+            elements.append(liability_table)
+            elements.append(Spacer(1, 0.3*inch))
         
         # Equity section
-        elements.append(Paragraph("<b>EQUITY</b>", heading_style))
-        
-        equity_data = [['Account', 'Account Number', 'Balance']]
-        
-        for account in data.get('equity_accounts', []):
-            equity_data.append([
-                account.get('account_name', ''),
-                account.get('account_number', ''),
-                f"${float(account.get('balance', 0)):,.2f}"
+        equity_accounts = data.get('equity_accounts', [])
+        if equity_accounts or data.get('total_equity'):
+            elements.append(Paragraph("<b>EQUITY</b>", _HEADING_STYLE))
+            
+            equity_data = [['Account', 'Account Number', 'Balance']]
+            
+            equity_data.extend([
+                [
+                    account.get('account_name', ''),
+                    account.get('account_number', ''),
+                    _format_currency(float(account.get('balance', 0)))
+                ]
+                for account in equity_accounts
             ])
-        
-        equity_data.append(['', '<b>TOTAL EQUITY</b>', f"<b>${float(data.get('total_equity', 0)):,.2f}</b>"])
-        
-        equity_table = Table(equity_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
-        equity_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ]))
-        
-        elements.append(equity_table)
-        elements.append(Spacer(1, 0.2*inch))
+            
+            equity_data.append(['', '<b>TOTAL EQUITY</b>', f"<b>{_format_currency(float(data.get('total_equity', 0)))}</b>"])
+            
+            equity_table = Table(equity_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
+            equity_table.setStyle(_BALANCE_SHEET_TABLE_STYLE)
+            
+            elements.append(equity_table)
+            elements.append(Spacer(1, 0.2*inch))
         
         # Balance equation check
         total_liabilities_equity = float(data.get('total_liabilities', 0)) + float(data.get('total_equity', 0))
         balance_check = Table([
-            ['', '<b>TOTAL LIABILITIES + EQUITY</b>', f"<b>${total_liabilities_equity:,.2f}</b>"],
+            ['', '<b>TOTAL LIABILITIES + EQUITY</b>', f"<b>{_format_currency(total_liabilities_equity)}</b>"],
         ], colWidths=[3*inch, 1.5*inch, 1.5*inch])
-        balance_check.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('LINEABOVE', (0, 0), (-1, 0), 2, colors.black),
-        ]))
+        balance_check.setStyle(_SUMMARY_TABLE_STYLE)
         elements.append(balance_check)
         
         # Balance validation
         if data.get('is_balanced', False):
             elements.append(Spacer(1, 0.2*inch))
-            elements.append(Paragraph("<font color='green'><b>✓ Balance Sheet is Balanced</b></font>", heading_style))
+            elements.append(Paragraph("<font color='green'><b>✓ Balance Sheet is Balanced</b></font>", _HEADING_STYLE))
         
         return elements
     
     @staticmethod
-    def _build_cash_flow_pdf(data: Dict[str, Any], heading_style) -> List:
+    def _build_cash_flow_pdf(data: Dict[str, Any]) -> List:
         """Build Cash Flow statement PDF content"""
         elements = []
         
         # Operating activities
-        elements.append(Paragraph("<b>CASH FLOWS FROM OPERATING ACTIVITIES</b>", heading_style))
-        
-        operating_data = [['Description', 'Amount']]
-        for activity in data.get('operating_activities', []):
-            operating_data.append([
-                activity.get('description', ''),
-                f"${float(activity.get('amount', 0)):,.2f}"
+        operating_activities = data.get('operating_activities', [])
+        if operating_activities or data.get('operating_cash_flow'):
+            elements.append(Paragraph("<b>CASH FLOWS FROM OPERATING ACTIVITIES</b>", _HEADING_STYLE))
+            
+            operating_data = [['Description', 'Amount']]
+            operating_data.extend([
+                [
+                    activity.get('description', ''),
+                    _format_currency(float(activity.get('amount', 0)))
+                ]
+                for activity in operating_activities
             ])
-        
-        operating_data.append(['<b>Net Cash from Operating Activities</b>', 
-                              f"<b>${float(data.get('operating_cash_flow', 0)):,.2f}</b>"])
-        
-        operating_table = Table(operating_data, colWidths=[4*inch, 2*inch])
-        operating_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ]))
-        
-        elements.append(operating_table)
-        elements.append(Spacer(1, 0.2*inch))
+            
+            operating_data.append(['<b>Net Cash from Operating Activities</b>', 
+                                  f"<b>{_format_currency(float(data.get('operating_cash_flow', 0)))}</b>"])
+            
+            operating_table = Table(operating_data, colWidths=[4*inch, 2*inch])
+            operating_table.setStyle(_CASH_FLOW_TABLE_STYLE)
+            
+            elements.append(operating_table)
+            elements.append(Spacer(1, 0.2*inch))
         
         # Investing activities
-        elements.append(Paragraph("<b>CASH FLOWS FROM INVESTING ACTIVITIES</b>", heading_style))
-        
-        investing_data = [['Description', 'Amount']]
-        for activity in data.get('investing_activities', []):
-            investing_data.append([
-                activity.get('description', ''),
-                f"${float(activity.get('amount', 0)):,.2f}"
+        investing_activities = data.get('investing_activities', [])
+        if investing_activities or data.get('investing_cash_flow'):
+            elements.append(Paragraph("<b>CASH FLOWS FROM INVESTING ACTIVITIES</b>", _HEADING_STYLE))
+            
+            investing_data = [['Description', 'Amount']]
+            investing_data.extend([
+                [
+                    activity.get('description', ''),
+                    _format_currency(float(activity.get('amount', 0)))
+                ]
+                for activity in investing_activities
             ])
-        
-        investing_data.append(['<b>Net Cash from Investing Activities</b>', 
-                              f"<b>${float(data.get('investing_cash_flow', 0)):,.2f}</b>"])
-        
-        investing_table = Table(investing_data, colWidths=[4*inch, 2*inch])
-        investing_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ]))
-        
-        elements.append(investing_table)
-        elements.append(Spacer(1, 0.2*inch))
+            
+            investing_data.append(['<b>Net Cash from Investing Activities</b>', 
+                                  f"<b>{_format_currency(float(data.get('investing_cash_flow', 0)))}</b>"])
+            
+            investing_table = Table(investing_data, colWidths=[4*inch, 2*inch])
+            investing_table.setStyle(_CASH_FLOW_TABLE_STYLE)
+            
+            elements.append(investing_table)
+            elements.append(Spacer(1, 0.2*inch))
         
         # Financing activities
-        elements.append(Paragraph("<b>CASH FLOWS FROM FINANCING ACTIVITIES</b>", heading_style))
-        
-        financing_data = [['Description', 'Amount']]
-        for activity in data.get('financing_activities', []):
-            financing_data.append([
-                activity.get('description', ''),
-                f"${float(activity.get('amount', 0)):,.2f}"
+        financing_activities = data.get('financing_activities', [])
+        if financing_activities or data.get('financing_cash_flow'):
+            elements.append(Paragraph("<b>CASH FLOWS FROM FINANCING ACTIVITIES</b>", _HEADING_STYLE))
+            
+            financing_data = [['Description', 'Amount']]
+            financing_data.extend([
+                [
+                    activity.get('description', ''),
+                    _format_currency(float(activity.get('amount', 0)))
+                ]
+                for activity in financing_activities
             ])
-        
-        financing_data.append(['<b>Net Cash from Financing Activities</b>', 
-                              f"<b>${float(data.get('financing_cash_flow', 0)):,.2f}</b>"])
-        
-        financing_table = Table(financing_data, colWidths=[4*inch, 2*inch])
-        financing_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ]))
-        
-        elements.append(financing_table)
-        elements.append(Spacer(1, 0.3*inch))
+            
+            financing_data.append(['<b>Net Cash from Financing Activities</b>', 
+                                  f"<b>{_format_currency(float(data.get('financing_cash_flow', 0)))}</b>"])
+            
+            financing_table = Table(financing_data, colWidths=[4*inch, 2*inch])
+            financing_table.setStyle(_CASH_FLOW_TABLE_STYLE)
+            
+            elements.append(financing_table)
+            elements.append(Spacer(1, 0.3*inch))
         
         # Net change summary
         net_change_color = colors.green if float(data.get('net_change_in_cash', 0)) >= 0 else colors.red
         
         summary_data = [
-            ['<b>Net Change in Cash</b>', f"<b>${float(data.get('net_change_in_cash', 0)):,.2f}</b>"],
-            ['<b>Beginning Cash Balance</b>', f"<b>${float(data.get('beginning_cash', 0)):,.2f}</b>"],
-            ['<b>Ending Cash Balance</b>', f"<b>${float(data.get('ending_cash', 0)):,.2f}</b>"]
+            ['<b>Net Change in Cash</b>', f"<b>{_format_currency(float(data.get('net_change_in_cash', 0)))}</b>"],
+            ['<b>Beginning Cash Balance</b>', f"<b>{_format_currency(float(data.get('beginning_cash', 0)))}</b>"],
+            ['<b>Ending Cash Balance</b>', f"<b>{_format_currency(float(data.get('ending_cash', 0)))}</b>"]
         ]
         
         summary_table = Table(summary_data, colWidths=[4*inch, 2*inch])
-        summary_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('LINEABOVE', (0, 0), (-1, 0), 2, colors.black),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-            ('TEXTCOLOR', (1, 0), (1, 0), net_change_color),
-        ]))
+        summary_table.setStyle(_SUMMARY_TABLE_STYLE)
+        summary_table.setStyle([('TEXTCOLOR', (1, 0), (1, 0), net_change_color)])
         
         elements.append(summary_table)
         
         return elements
     
     @staticmethod
-    def _build_trial_balance_pdf(data: Dict[str, Any], heading_style) -> List:
+    def _long_table(rows: List[List], col_widths: List[float], style: TableStyle) -> LongTable:
+        """Build a LongTable whose header row repeats on every page"""
+        # Measuring every cell dominates layout time for big tables; their rows
+        # are single-line text, so give ReportLab the height up front instead
+        row_heights = [_TABLE_ROW_HEIGHT] * len(rows) if len(rows) > _FIXED_ROW_HEIGHT_THRESHOLD else None
+        table = LongTable(rows, colWidths=col_widths, rowHeights=row_heights, repeatRows=1)
+        table.setStyle(style)
+        return table
+    
+    @staticmethod
+    def _build_trial_balance_pdf(data: Dict[str, Any]) -> List:
         """Build Trial Balance PDF content"""
         elements = []
         
-        elements.append(Paragraph("<b>TRIAL BALANCE</b>", heading_style))
+        elements.append(Paragraph("<b>TRIAL BALANCE</b>", _HEADING_STYLE))
         
         tb_data = [['Account Number', 'Account Name', 'Debit', 'Credit']]
         
@@ -447,28 +574,20 @@ class ReportExporter:
             total_credits += credit
             
             tb_data.append([
-                account.get('account_number', ''),
-                account.get('account_name', ''),
-                f"${debit:,.2f}" if debit > 0 else '',
-                f"${credit:,.2f}" if credit > 0 else ''
+                _single_line(account.get('account_number', '')),
+                _single_line(account.get('account_name', '')),
+                _format_currency(debit) if debit > 0 else '',
+                _format_currency(credit) if credit > 0 else ''
             ])
         
         tb_data.append([
             '', '<b>TOTALS</b>',
-            f"<b>${total_debits:,.2f}</b>",
-            f"<b>${total_credits:,.2f}</b>"
+            f"<b>{_format_currency(total_debits)}</b>",
+            f"<b>{_format_currency(total_credits)}</b>"
         ])
         
-        tb_table = Table(tb_data, colWidths=[1.2*inch, 2.8*inch, 1.5*inch, 1.5*inch])
-        tb_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (1, -1), 'LEFT'),
-            ('ALIGN', (2, 0), (3, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('LINEABOVE', (0, -1), (-1, -1), 2, colors.black),
-        ]))
+        tb_table = ReportExporter._long_table(tb_data, [1.2*inch, 2.8*inch, 1.5*inch, 1.5*inch],
+                                              _TRIAL_BALANCE_TABLE_STYLE)
         
         elements.append(tb_table)
         
@@ -476,47 +595,41 @@ class ReportExporter:
         if abs(total_debits - total_credits) < 0.01:
             elements.append(Spacer(1, 0.2*inch))
             elements.append(Paragraph("<font color='green'><b>✓ Trial Balance is Balanced</b></font>", 
-                                    heading_style))
+                                    _HEADING_STYLE))
         else:
             elements.append(Spacer(1, 0.2*inch))
-            elements.append(Paragraph(f"<font color='red'><b>⚠ Trial Balance is Out of Balance by ${abs(total_debits - total_credits):,.2f}</b></font>", 
-                                    heading_style))
+            elements.append(Paragraph(f"<font color='red'><b>⚠ Trial Balance is Out of Balance by {_format_currency(abs(total_debits - total_credits))}</b></font>", 
+                                    _HEADING_STYLE))
         
         return elements
     
     @staticmethod
-    def _build_general_ledger_pdf(data: Dict[str, Any], heading_style) -> List:
+    def _build_general_ledger_pdf(data: Dict[str, Any]) -> List:
         """Build General Ledger PDF content"""
         elements = []
         
         for account_data in data.get('accounts', []):
             elements.append(Paragraph(
                 f"<b>{account_data.get('account_number', '')} - {account_data.get('account_name', '')}</b>",
-                heading_style
+                _HEADING_STYLE
             ))
             
             gl_data = [['Date', 'Description', 'Reference', 'Debit', 'Credit', 'Balance']]
             
-            for txn in account_data.get('transactions', []):
-                gl_data.append([
+            gl_data.extend([
+                [
                     txn.get('date', ''),
-                    txn.get('description', '')[:40],  # Truncate long descriptions
-                    txn.get('reference', ''),
-                    f"${float(txn.get('debit', 0)):,.2f}" if txn.get('debit') else '',
-                    f"${float(txn.get('credit', 0)):,.2f}" if txn.get('credit') else '',
-                    f"${float(txn.get('balance', 0)):,.2f}"
-                ])
+                    _single_line(txn.get('description', ''))[:40],  # Truncate long descriptions
+                    _single_line(txn.get('reference', '')),
+                    _format_currency(float(txn.get('debit', 0))) if txn.get('debit') else '',
+                    _format_currency(float(txn.get('credit', 0))) if txn.get('credit') else '',
+                    _format_currency(float(txn.get('balance', 0)))
+                ]
+                for txn in account_data.get('transactions', [])
+            ])
             
-            gl_table = Table(gl_data, colWidths=[0.8*inch, 2.2*inch, 0.8*inch, 1*inch, 1*inch, 1*inch])
-            gl_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (2, -1), 'LEFT'),
-                ('ALIGN', (3, 0), (5, -1), 'RIGHT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ]))
+            gl_table = ReportExporter._long_table(gl_data, [0.8*inch, 2.2*inch, 0.8*inch, 1*inch, 1*inch, 1*inch],
+                                                  _GL_TABLE_STYLE)
             
             elements.append(gl_table)
             elements.append(Spacer(1, 0.3*inch))
@@ -527,128 +640,307 @@ class ReportExporter:
     def export_to_excel(report_data: Dict[str, Any], report_type: str) -> StreamingResponse:
         """Export report data to Excel format"""
         
+        output = ReportExporter._render_excel(report_data, report_type)
+        
+        filename = f"{report_type}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        
+        return StreamingResponse(
+            _iter_slices(output.getbuffer()),
+            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    
+    @staticmethod
+    def _render_excel(report_data: Dict[str, Any], report_type: str) -> io.BytesIO:
+        """Render report data to an in-memory Excel workbook file"""
+        
         output = io.BytesIO()
         
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        if HAS_XLSXWRITER and ReportExporter._excel_row_count(report_data, report_type) > _LARGE_EXCEL_ROW_THRESHOLD:
+            # constant_memory flushes each row to a temp file as soon as the next one starts
+            workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+            
+            if report_type == 'trial_balance':
+                ReportExporter._write_trial_balance_xlsxwriter(report_data, workbook)
+            elif report_type == 'general_ledger':
+                ReportExporter._write_general_ledger_xlsxwriter(report_data, workbook)
+            
+            workbook.close()
+        else:
+            # Write-only mode streams rows out as they are appended instead of
+            # holding every cell object in memory until save
+            workbook = Workbook(write_only=True)
+            
             if report_type == 'profit_loss':
-                ReportExporter._write_profit_loss_excel(report_data, writer)
+                ReportExporter._write_profit_loss_excel(report_data, workbook)
             elif report_type == 'balance_sheet':
-                ReportExporter._write_balance_sheet_excel(report_data, writer)
+                ReportExporter._write_balance_sheet_excel(report_data, workbook)
             elif report_type == 'cash_flow':
-                ReportExporter._write_cash_flow_excel(report_data, writer)
+                ReportExporter._write_cash_flow_excel(report_data, workbook)
             elif report_type == 'trial_balance':
-                ReportExporter._write_trial_balance_excel(report_data, writer)
+                ReportExporter._write_trial_balance_excel(report_data, workbook)
             elif report_type == 'general_ledger':
-                ReportExporter._write_general_ledger_excel(report_data, writer)
-        
-        output.seek(0)
-        
-        filename = f"{report_type}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
+                ReportExporter._write_general_ledger_excel(report_data, workbook)
+            
+            workbook.save(output)
         
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
-        )
+        return output
+    
+    @staticmethod
+    def _header_row(worksheet, labels: List[str]) -> List[WriteOnlyCell]:
+        """Build a bold header row for a write-only worksheet"""
+        cells = []
+        for label in labels:
+            cell = WriteOnlyCell(worksheet, value=label)
+            cell.font = _HEADER_FONT
+            cells.append(cell)
+        return cells
     
     @staticmethod
-    def _write_profit_loss_excel(data: Dict[str, Any], writer):
+    def _currency_cell(worksheet, value) -> WriteOnlyCell:
+        """Build a numeric cell displayed as currency"""
+        cell = WriteOnlyCell(worksheet, value=value)
+        cell.number_format = _CURRENCY_FORMAT
+        return cell
+    
+    @staticmethod
+    def _append_accounts(worksheet, accounts: List[Dict[str, Any]], value_key: str, value_label: str,
+                         total_label: str, total):
+        """Append an account section: header, one row per account, then its total"""
+        currency_cell = ReportExporter._currency_cell
+        worksheet.append(ReportExporter._header_row(worksheet, ['Account', 'Account Number', value_label]))
+        for account in accounts:
+            worksheet.append([
+                account.get('account_name', ''),
+                account.get('account_number', ''),
+                currency_cell(worksheet, account.get(value_key, 0))
+            ])
+        worksheet.append([total_label, '', currency_cell(worksheet, total)])
+    
+    @staticmethod
+    def _append_activities(worksheet, activities: List[Dict[str, Any]], total_label: str, total):
+        """Append a cash flow section: header, one row per activity, then its net total"""
+        currency_cell = ReportExporter._currency_cell
+        worksheet.append(ReportExporter._header_row(worksheet, ['Description', 'Amount']))
+        for activity in activities:
+            worksheet.append([
+                activity.get('description', ''),
+                currency_cell(worksheet, activity.get('amount', 0))
+            ])
+        worksheet.append([total_label, currency_cell(worksheet, total)])
+    
+    @staticmethod
+    def _write_profit_loss_excel(data: Dict[str, Any], workbook):
         """Write Profit & Loss to Excel"""
-        revenue_df = pd.DataFrame(data.get('revenue_accounts', []))
-        expense_df = pd.DataFrame(data.get('expense_accounts', []))
+        worksheet = workbook.create_sheet('Profit & Loss')
+        worksheet.append([data.get('report_name', 'Profit & Loss Statement')])
+        worksheet.append([])
         
         # Write revenue
-        revenue_df.to_excel(writer, sheet_name='Profit & Loss', startrow=2, index=False)
+        worksheet.append(['REVENUE'])
+        ReportExporter._append_accounts(worksheet, data.get('revenue_accounts', []), 'amount', 'Amount',
+                                        'Total Revenue', data.get('total_revenue', 0))
+        worksheet.append([])
         
         # Write expenses
-        expense_df.to_excel(writer, sheet_name='Profit & Loss', 
-                           startrow=len(revenue_df) + 5, index=False)
+        worksheet.append(['EXPENSES'])
+        ReportExporter._append_accounts(worksheet, data.get('expense_accounts', []), 'amount', 'Amount',
+                                        'Total Expenses', data.get('total_expenses', 0))
+        worksheet.append([])
         
-        # Get worksheet to add headers
-        worksheet = writer.sheets['Profit & Loss']
-        worksheet.cell(1, 1, data.get('report_name', 'Profit & Loss Statement'))
-        worksheet.cell(2, 1, 'REVENUE')
-        worksheet.cell(len(revenue_df) + 4, 1, 'EXPENSES')
+        worksheet.append(['Net Income', '', ReportExporter._currency_cell(worksheet, data.get('net_income', 0))])
     
     @staticmethod
-    def _write_balance_sheet_excel(data: Dict[str, Any], writer):
+    def _write_balance_sheet_excel(data: Dict[str, Any], workbook):
         """Write Balance Sheet to Excel"""
-        # Create separate DataFrames for assets, liabilities, and equity
-        assets_df = pd.DataFrame(data.get('asset_accounts', []))
-        liabilities_df = pd.DataFrame(data.get('liability_accounts', []))
-        equity_df = pd.DataFrame(data.get('equity_accounts', []))
-        
-        assets_df.to_excel(writer, sheet_name='Balance Sheet', startrow=2, index=False)
-        liabilities_df.to_excel(writer, sheet_name='Balance Sheet', 
-                               startrow=len(assets_df) + 5, index=False)
-        equity_df.to_excel(writer, sheet_name='Balance Sheet', 
-                          startrow=len(assets_df) + len(liabilities_df) + 8, index=False)
+        worksheet = workbook.create_sheet('Balance Sheet')
+        worksheet.append([data.get('report_name', 'Balance Sheet')])
+        worksheet.append([])
+        
+        worksheet.append(['ASSETS'])
+        ReportExporter._append_accounts(worksheet, data.get('asset_accounts', []), 'balance', 'Balance',
+                                        'Total Assets', data.get('total_assets', 0))
+        worksheet.append([])
+        
+        worksheet.append(['LIABILITIES'])
+        ReportExporter._append_accounts(worksheet, data.get('liability_accounts', []), 'balance', 'Balance',
+                                        'Total Liabilities', data.get('total_liabilities', 0))
+        worksheet.append([])
+        
+        worksheet.append(['EQUITY'])
+        ReportExporter._append_accounts(worksheet, data.get('equity_accounts', []), 'balance', 'Balance',
+                                        'Total Equity', data.get('total_equity', 0))
     
     @staticmethod
-    def _write_cash_flow_excel(data: Dict[str, Any], writer):
+    def _write_cash_flow_excel(data: Dict[str, Any], workbook):
         """Write Cash Flow to Excel"""
-        operating_df = pd.DataFrame(data.get('operating_activities', []))
-        investing_df = pd.DataFrame(data.get('investing_activities', []))
-        financing_df = pd.DataFrame(data.get('financing_activities', []))
-        
-        operating_df.to_excel(writer, sheet_name='Cash Flow', startrow=2, index=False)
-        investing_df.to_excel(writer, sheet_name='Cash Flow', 
-                             startrow=len(operating_df) + 5, index=False)
-        financing_df.to_excel(writer, sheet_name='Cash Flow', 
-                             startrow=len(operating_df) + len(investing_df) + 8, index=False)
+        currency_cell = ReportExporter._currency_cell
+        worksheet = workbook.create_sheet('Cash Flow')
+        worksheet.append([data.get('report_name', 'Cash Flow Statement')])
+        worksheet.append([])
+        
+        worksheet.append(['CASH FLOWS FROM OPERATING ACTIVITIES'])
+        ReportExporter._append_activities(worksheet, data.get('operating_activities', []),
+                                          'Net Cash from Operating Activities', data.get('operating_cash_flow', 0))
+        worksheet.append([])
+        
+        worksheet.append(['CASH FLOWS FROM INVESTING ACTIVITIES'])
+        ReportExporter._append_activities(worksheet, data.get('investing_activities', []),
+                                          'Net Cash from Investing Activities', data.get('investing_cash_flow', 0))
+        worksheet.append([])
+        
+        worksheet.append(['CASH FLOWS FROM FINANCING ACTIVITIES'])
+        ReportExporter._append_activities(worksheet, data.get('financing_activities', []),
+                                          'Net Cash from Financing Activities', data.get('financing_cash_flow', 0))
+        worksheet.append([])
+        
+        worksheet.append(['Net Change in Cash', currency_cell(worksheet, data.get('net_change_in_cash', 0))])
+        worksheet.append(['Beginning Cash Balance', currency_cell(worksheet, data.get('beginning_cash', 0))])
+        worksheet.append(['Ending Cash Balance', currency_cell(worksheet, data.get('ending_cash', 0))])
     
     @staticmethod
-    def _write_trial_balance_excel(data: Dict[str, Any], writer):
+    def _write_trial_balance_excel(data: Dict[str, Any], workbook):
         """Write Trial Balance to Excel"""
-        df = pd.DataFrame(data.get('accounts', []))
-        df.to_excel(writer, sheet_name='Trial Balance', index=False)
+        worksheet = workbook.create_sheet('Trial Balance')
+        worksheet.append(ReportExporter._header_row(
+            worksheet, ['Account Number', 'Account Name', 'Debit', 'Credit']
+        ))
+        
+        currency_cell = ReportExporter._currency_cell
+        accounts = data.get('accounts', [])
+        for account in accounts:
+            worksheet.append([
+                account.get('account_number', ''),
+                account.get('account_name', ''),
+                currency_cell(worksheet, account.get('debit_balance') or None),
+                currency_cell(worksheet, account.get('credit_balance') or None)
+            ])
         
-        # Add totals row
-        worksheet = writer.sheets['Trial Balance']
-        last_row = len(df) + 2
-        worksheet.cell(last_row, 1, 'TOTALS')
-        worksheet.cell(last_row, 3, f'=SUM(C2:C{last_row-1})')  # Debit total
-        worksheet.cell(last_row, 4, f'=SUM(D2:D{last_row-1})')  # Credit total
+        # Totals go out as the last streamed row; write-only sheets can't be patched afterwards
+        last_row = len(accounts) + 1
+        worksheet.append([
+            'TOTALS', '',
+            currency_cell(worksheet, f'=SUM(C2:C{last_row})'),
+            currency_cell(worksheet, f'=SUM(D2:D{last_row})')
+        ])
     
     @staticmethod
-    def _write_general_ledger_excel(data: Dict[str, Any], writer):
+    def _write_general_ledger_excel(data: Dict[str, Any], workbook):
         """Write General Ledger to Excel"""
         # Create separate sheet for each account
         accounts = data.get('accounts', [])
         
+        currency_cell = ReportExporter._currency_cell
+        
         # If no accounts, create a summary sheet
         if not accounts:
-            summary_df = pd.DataFrame([{
-                'Message': 'No transactions found for the selected period'
-            }])
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
+            worksheet = workbook.create_sheet('Summary')
+            worksheet.append(ReportExporter._header_row(worksheet, ['Message']))
+            worksheet.append(['No transactions found for the selected period'])
             return
         
         for i, account_data in enumerate(accounts):
             sheet_name = f"Account {i+1}"[:31]  # Excel sheet name limit
-            df = pd.DataFrame(account_data.get('transactions', []))
+            worksheet = workbook.create_sheet(sheet_name)
             
-            if df.empty:
-                # Create empty sheet with headers
-                df = pd.DataFrame(columns=['date', 'description', 'reference', 'debit', 'credit', 'balance'])
+            # Account info above the transactions
+            worksheet.append([f"{account_data.get('account_number', '')} - {account_data.get('account_name', '')}"])
+            worksheet.append([])
+            worksheet.append(ReportExporter._header_row(
+                worksheet, ['Date', 'Description', 'Reference', 'Debit', 'Credit', 'Balance']
+            ))
             
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
+            for txn in account_data.get('transactions', []):
+                worksheet.append([
+                    txn.get('date', ''),
+                    txn.get('description', ''),
+                    txn.get('reference', ''),
+                    currency_cell(worksheet, txn.get('debit') or None),
+                    currency_cell(worksheet, txn.get('credit') or None),
+                    currency_cell(worksheet, txn.get('balance', 0))
+                ])
+    
+    @staticmethod
+    def _excel_row_count(data: Dict[str, Any], report_type: str) -> int:
+        """Number of data rows in a trial balance or general ledger export, 0 for other reports"""
+        if report_type == 'trial_balance':
+            return len(data.get('accounts', []))
+        if report_type == 'general_ledger':
+            return sum(len(account_data.get('transactions', [])) for account_data in data.get('accounts', []))
+        return 0
+    
+    @staticmethod
+    def _write_trial_balance_xlsxwriter(data: Dict[str, Any], workbook):
+        """Write a large Trial Balance to Excel with xlsxwriter; same layout as the openpyxl writer"""
+        worksheet = workbook.add_worksheet('Trial Balance')
+        bold = workbook.add_format({'bold': True})
+        currency = workbook.add_format({'num_format': _CURRENCY_FORMAT})
+        
+        # constant_memory requires rows to be written strictly in order
+        worksheet.write_row(0, 0, ['Account Number', 'Account Name', 'Debit', 'Credit'], bold)
+        
+        accounts = data.get('accounts', [])
+        for row, account in enumerate(accounts, start=1):
+            worksheet.write(row, 0, account.get('account_number', ''))
+            worksheet.write(row, 1, account.get('account_name', ''))
+            worksheet.write(row, 2, account.get('debit_balance') or None, currency)
+            worksheet.write(row, 3, account.get('credit_balance') or None, currency)
+        
+        last_row = len(accounts) + 1
+        worksheet.write(last_row, 0, 'TOTALS')
+        worksheet.write_formula(last_row, 2, f'=SUM(C2:C{last_row})', currency)
+        worksheet.write_formula(last_row, 3, f'=SUM(D2:D{last_row})', currency)
+    
+    @staticmethod
+    def _write_general_ledger_xlsxwriter(data: Dict[str, Any], workbook):
+        """Write a large General Ledger to Excel with xlsxwriter; same layout as the openpyxl writer"""
+        bold = workbook.add_format({'bold': True})
+        currency = workbook.add_format({'num_format': _CURRENCY_FORMAT})
+        
+        for i, account_data in enumerate(data.get('accounts', [])):
+            worksheet = workbook.add_worksheet(f"Account {i+1}"[:31])  # Excel sheet name limit
             
-            # Add account info
-            worksheet = writer.sheets[sheet_name]
-            worksheet.insert_rows(0, 2)
-            worksheet.cell(1, 1, f"{account_data.get('account_number', '')} - {account_data.get('account_name', '')}")
+            # Account info above the transactions
+            worksheet.write(0, 0, f"{account_data.get('account_number', '')} - {account_data.get('account_name', '')}")
+            worksheet.write_row(2, 0, ['Date', 'Description', 'Reference', 'Debit', 'Credit', 'Balance'], bold)
+            
+            for row, txn in enumerate(account_data.get('transactions', []), start=3):
+                worksheet.write(row, 0, txn.get('date', ''))
+                worksheet.write(row, 1, txn.get('description', ''))
+                worksheet.write(row, 2, txn.get('reference', ''))
+                worksheet.write(row, 3, txn.get('debit') or None, currency)
+                worksheet.write(row, 4, txn.get('credit') or None, currency)
+                worksheet.write(row, 5, txn.get('balance', 0), currency)
     
     @staticmethod
     def export_to_csv(report_data: Dict[str, Any], report_type: str) -> StreamingResponse:
         """Export report data to CSV format"""
         
-        output = io.StringIO()
+        # One timestamp for the header line and the filename
+        now = datetime.utcnow()
+        
+        output = ReportExporter._render_csv(report_data, report_type, now)
+        
+        filename = f"{report_type}_{now.strftime('%Y%m%d_%H%M%S')}.csv"
+        
+        return StreamingResponse(
+            iter(output.getchunks()),
+            media_type='text/csv',
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    
+    @staticmethod
+    def _render_csv(report_data: Dict[str, Any], report_type: str, now: Optional[datetime] = None) -> _CSVChunkBuffer:
+        """Render report data to CSV, grouped into encoded chunks"""
+        
+        now = now or datetime.utcnow()
+        
+        output = _CSVChunkBuffer()
         writer = csv.writer(output)
         
         # Write report header
         writer.writerow([report_data.get('report_name', 'Financial Report')])
-        writer.writerow([f"Generated: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"])
+        writer.writerow([f"Generated: {now.strftime('%Y-%m-%d %H:%M:%S')}"])
         writer.writerow([f"Period: {report_data.get('period_start', '')} to {report_data.get('period_end', '')}"])
         writer.writerow([])
         
@@ -663,15 +955,7 @@ class ReportExporter:
         elif report_type == 'general_ledger':
             ReportExporter._write_general_ledger_csv(report_data, writer)
         
-        output.seek(0)
-        
-        filename = f"{report_type}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-        
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type='text/csv',
-            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
-        )
+        return output
     
     @staticmethod
     def _write_profit_loss_csv(data: Dict[str, Any], writer):
@@ -829,3 +1113,11 @@ class ReportExporter:
                 ])
             
             writer.writerow([])  # Empty row between accounts
+
+
+# File-bytes renderers used by ReportExporter.render, by export format
+_RENDERERS = {
+    'pdf': ReportExporter.render_pdf,
+    'excel': lambda report_data, report_type: ReportExporter._render_excel(report_data, report_type).getvalue(),
+    'csv': lambda report_data, report_type: b"".join(ReportExporter._render_csv(report_data, report_type).getchunks()),
+}
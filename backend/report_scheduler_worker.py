@@ -5,11 +5,18 @@ Handles automated report generation and email delivery using APScheduler
 
 import logging
 import asyncio
-from datetime import datetime, timedelta
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.combining import OrTrigger
 from apscheduler.triggers.cron import CronTrigger
-from typing import Dict, Any, List
-import io
+from apscheduler.triggers.date import DateTrigger
+from pymongo import UpdateOne
+from typing import Dict, Any, List, Optional, Tuple
 
 from database import (
     report_schedules_collection,
@@ -18,21 +25,69 @@ from database import (
     users_collection,
     integrations_collection
 )
-from reports import (
-    generate_profit_loss,
-    generate_balance_sheet,
-    generate_cash_flow_statement,
-    generate_trial_balance,
-    generate_general_ledger
-)
-from report_exports import ReportExporter
-from email_service import send_email, generate_report_email_html, is_email_configured
+from email_service import send_bulk, build_recipient_messages, generate_report_email_html, is_email_configured
 
 logger = logging.getLogger(__name__)
 
 # Global scheduler instance
 report_scheduler = None
 
+# Process pool for CPU-bound report rendering, created on first export
+export_pool = None
+
+# The due-schedule check runs as a one-off job armed for the earliest next_run
+DUE_CHECK_JOB_ID = 'check_due_reports'
+
+# Upper bound on how long the check sleeps, as a backstop for schedules
+# created or edited outside this process
+DUE_CHECK_MAX_SLEEP = timedelta(minutes=15)
+
+# Retry interval for schedules that failed and are still overdue
+DUE_CHECK_RETRY_DELAY = timedelta(minutes=1)
+
+# Maximum number of due schedules executed at once
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "8"))
+REPORT_WORKER_SEMAPHORE = asyncio.Semaphore(REPORT_WORKERS)
+
+# In-process TTL caches for lookups that rarely change between executions,
+# keyed by company_id; misses are cached briefly so missing rows aren't re-queried
+COMPANY_CACHE_TTL_SECONDS = 300
+EMAIL_CONFIG_CACHE_TTL_SECONDS = 120
+MISSING_CACHE_TTL_SECONDS = 5
+LOOKUP_CACHE_MAX_ENTRIES = 4096
+_company_cache: Dict[str, Tuple[float, Any]] = {}
+_email_config_cache: Dict[str, Tuple[float, Any]] = {}
+
+# Fields a due schedule needs to run and to work out its next run
+DUE_SCHEDULE_PROJECTION = {
+    "schedule_id": 1,
+    "company_id": 1,
+    "name": 1,
+    "report_type": 1,
+    "export_format": 1,
+    "frequency": 1,
+    "time_of_day": 1,
+    "day_of_week": 1,
+    "day_of_month": 1,
+    "recipients": 1,
+    "cc_recipients": 1,
+    "include_attachments": 1,
+    "merge_recipients": 1
+}
+
+# Builder in the reports module and the dates it takes, by report type:
+# "period" builders take start/end datetimes, "as_of" builders a single date
+REPORT_GENERATORS = {
+    "profit_loss": ("build_profit_loss_report", "period"),
+    "balance_sheet": ("build_balance_sheet_report", "as_of"),
+    "cash_flow": ("build_cash_flow_report", "period"),
+    "trial_balance": ("build_trial_balance_report", "as_of"),
+    "general_ledger": ("build_general_ledger_report", "period")
+}
+
+# Due schedules fetched per cursor batch
+DUE_SCHEDULE_BATCH_SIZE = 100
+
 
 def initialize_report_scheduler():
     """Initialize the report scheduler"""
@@ -43,52 +98,109 @@ def initialize_report_scheduler():
         report_scheduler.start()
         logger.info("✅ Report scheduler initialized")
         
-        # Schedule the check for due reports (runs every minute)
-        report_scheduler.add_job(
-            check_and_run_due_schedules,
-            CronTrigger(minute='*'),  # Every minute
-            id='check_due_reports',
-            replace_existing=True
-        )
-        logger.info("✅ Report checker scheduled (runs every minute)")
+        start_history_writer()
+        
+        # Run the check for due reports now; each run re-arms it for the next due schedule
+        schedule_due_check(datetime.now(timezone.utc))
+        logger.info("✅ Report checker scheduled (runs when the next schedule is due)")
     
     return report_scheduler
 
 
-def shutdown_report_scheduler():
-    """Shutdown the report scheduler"""
-    global report_scheduler
+def as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes read back from Mongo as the UTC they are stored in"""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def schedule_due_check(run_at: datetime):
+    """Arm the due-schedule check to run at the given (UTC) time"""
+    report_scheduler.add_job(
+        check_and_run_due_schedules,
+        DateTrigger(run_date=run_at, timezone=timezone.utc),
+        id=DUE_CHECK_JOB_ID,
+        replace_existing=True,
+        misfire_grace_time=3600,
+        coalesce=True
+    )
+
+
+async def arm_next_due_check():
+    """Arm the due-schedule check for the earliest next_run among enabled schedules"""
+    if report_scheduler is None:
+        return
+    
+    now = datetime.now(timezone.utc)
+    run_at = now + DUE_CHECK_MAX_SLEEP
+    
+    try:
+        next_schedule = await report_schedules_collection.find_one(
+            {"enabled": True, "next_run": {"$ne": None}},
+            {"next_run": 1},
+            sort=[("next_run", 1)]
+        )
+        
+        if next_schedule:
+            next_run = as_utc(next_schedule["next_run"])
+            # Overdue schedules failed on this run; retry them on the old cadence
+            run_at = min(run_at, next_run if next_run > now else now + DUE_CHECK_RETRY_DELAY)
+            
+    except Exception as e:
+        logger.error(f"Error finding next due schedule: {e}")
+        run_at = now + DUE_CHECK_RETRY_DELAY
+    
+    schedule_due_check(run_at)
+
+
+async def shutdown_report_scheduler():
+    """Shutdown the report scheduler, flushing queued execution history"""
+    global report_scheduler, export_pool
     
     if report_scheduler:
         report_scheduler.shutdown()
         report_scheduler = None
         logger.info("✅ Report scheduler stopped")
+    
+    await stop_history_writer()
+    
+    if export_pool:
+        export_pool.shutdown(wait=False, cancel_futures=True)
+        export_pool = None
 
 
 async def check_and_run_due_schedules():
     """Check for schedules that are due to run and execute them"""
     try:
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         
-        # Find all enabled schedules that are due to run
-        due_schedules = await report_schedules_collection.find({
-            "enabled": True,
-            "next_run": {"$lte": now}
-        }).to_list(length=None)
+        # Schedules sharing a company, report type and format get the same
+        # report for this tick, so each one is generated and exported once
+        start_date, end_date = get_report_period(now)
+        reports = {}
         
-        if due_schedules:
-            logger.info(f"Found {len(due_schedules)} due schedule(s) to run")
+        # Bookkeeping is collected per schedule and written in one batch each
+        schedule_updates = []
+        failure_records = []
         
-        for schedule in due_schedules:
+        # Runs one due schedule; the caller acquires its worker slot
+        async def run_one(schedule):
             try:
+                report_key = (
+                    schedule.get("company_id"),
+                    schedule.get("report_type"),
+                    schedule.get("export_format", "pdf")
+                )
+                if report_key not in reports:
+                    reports[report_key] = asyncio.ensure_future(
+                        build_report(*report_key, start_date=start_date, end_date=end_date)
+                    )
+                
                 # Run the schedule
-                await execute_scheduled_report(schedule)
+                await execute_scheduled_report(schedule, precomputed_report=await reports[report_key])
                 
                 # Calculate next run time
-                next_run = calculate_next_run_time(schedule)
+                next_run = calculate_next_run_time(schedule, now=now)
                 
-                # Update schedule
-                await report_schedules_collection.update_one(
+                schedule_updates.append(UpdateOne(
                     {"_id": schedule["_id"]},
                     {
                         "$set": {
@@ -96,70 +208,133 @@ async def check_and_run_due_schedules():
                             "next_run": next_run
                         }
                     }
-                )
+                ))
                 
                 logger.info(f"Schedule {schedule['schedule_id']} completed. Next run: {next_run}")
                 
             except Exception as e:
                 logger.error(f"Error executing schedule {schedule.get('schedule_id')}: {e}")
                 # Record failure in history
-                await record_execution_history(
+                failure_records.append(build_execution_history(
                     schedule_id=schedule.get("schedule_id"),
                     status="failed",
                     error_message=str(e)
-                )
-                
+                ))
+            finally:
+                REPORT_WORKER_SEMAPHORE.release()
+        
+        # Stream enabled schedules that are due to run, starting each one as
+        # soon as a worker slot is free (at most REPORT_WORKERS at a time);
+        # waiting for a slot before reading on keeps memory bounded
+        cursor = report_schedules_collection.find(
+            {"enabled": True, "next_run": {"$lte": now}},
+            DUE_SCHEDULE_PROJECTION
+        ).batch_size(DUE_SCHEDULE_BATCH_SIZE)
+        
+        tasks = []
+        try:
+            async for schedule in cursor:
+                await REPORT_WORKER_SEMAPHORE.acquire()
+                tasks.append(asyncio.create_task(run_one(schedule)))
+        finally:
+            # Started schedules still finish (and get their bookkeeping) if the cursor fails
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        if tasks:
+            logger.info(f"Ran {len(tasks)} due schedule(s)")
+        
+        if schedule_updates:
+            await report_schedules_collection.bulk_write(schedule_updates, ordered=False)
+        
+        if failure_records:
+            await save_execution_history(failure_records)
+        
     except Exception as e:
         logger.error(f"Error checking due schedules: {e}")
+    
+    await arm_next_due_check()
+
+
+async def _cached_lookup(cache: Dict[str, Tuple[float, Any]], key: str, ttl: int, fetch):
+    """Return a cached lookup, awaiting fetch() on a miss or once the entry expires"""
+    now = time.monotonic()
+    entry = cache.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    
+    value = await fetch()
+    
+    if len(cache) >= LOOKUP_CACHE_MAX_ENTRIES:
+        cache.clear()
+    cache[key] = (now + (ttl if value is not None else MISSING_CACHE_TTL_SECONDS), value)
+    return value
+
+
+async def get_company(company_id: str) -> Optional[Dict[str, Any]]:
+    """Get the company fields a scheduled report email needs"""
+    return await _cached_lookup(
+        _company_cache,
+        company_id,
+        COMPANY_CACHE_TTL_SECONDS,
+        lambda: companies_collection.find_one({"_id": company_id}, {"name": 1})
+    )
 
 
-async def execute_scheduled_report(schedule: Dict[str, Any]):
-    """Execute a scheduled report: generate and email"""
+async def get_email_integration(company_id: str) -> Optional[Dict[str, Any]]:
+    """Get the config of a company's enabled email integration (None if missing or disabled)"""
+    return await _cached_lookup(
+        _email_config_cache,
+        company_id,
+        EMAIL_CONFIG_CACHE_TTL_SECONDS,
+        lambda: integrations_collection.find_one(
+            {"company_id": company_id, "integration_type": "email", "enabled": True},
+            {"config": 1, "_id": 0}
+        )
+    )
+
+
+async def execute_scheduled_report(schedule: Dict[str, Any], precomputed_report: Optional[Tuple[Dict[str, Any], bytes]] = None):
+    """Execute a scheduled report: generate (unless precomputed) and email"""
     schedule_id = schedule.get("schedule_id")
     company_id = schedule.get("company_id")
     report_type = schedule.get("report_type")
     export_format = schedule.get("export_format", "pdf")
     
+    # One timestamp for the subject, bodies and filename
+    now = datetime.now(timezone.utc)
+    generated_at = now.strftime('%B %d, %Y at %I:%M %p UTC')
+    
     logger.info(f"Executing schedule {schedule_id}: {report_type} ({export_format})")
     
     try:
         # Get company information
-        company = await companies_collection.find_one({"_id": company_id})
+        company = await get_company(company_id)
         if not company:
             raise Exception(f"Company {company_id} not found")
         
         # Get email configuration
-        email_config_doc = await integrations_collection.find_one({
-            "company_id": company_id,
-            "integration_type": "email"
-        })
+        email_config_doc = await get_email_integration(company_id)
         
-        if not email_config_doc or not email_config_doc.get("enabled", False):
+        if not email_config_doc:
             raise Exception("Email integration not configured or disabled")
         
         email_config = email_config_doc.get("config", {})
         
-        # Generate the report
-        report_data = await generate_report_data(
-            company_id=company_id,
-            report_type=report_type
-        )
-        
-        if not report_data:
-            raise Exception("Failed to generate report data")
-        
-        # Export report to requested format
-        report_bytes = await export_report(
-            report_data=report_data,
-            report_type=report_type,
-            export_format=export_format
-        )
-        
-        if not report_bytes:
-            raise Exception("Failed to export report")
+        # Generate and export the report
+        if precomputed_report:
+            report_data, report_bytes = precomputed_report
+        else:
+            start_date, end_date = get_report_period(now)
+            report_data, report_bytes = await build_report(
+                company_id=company_id,
+                report_type=report_type,
+                export_format=export_format,
+                start_date=start_date,
+                end_date=end_date
+            )
         
         # Prepare email
-        subject = f"{schedule.get('name', 'Scheduled Report')} - {datetime.utcnow().strftime('%B %d, %Y')}"
+        subject = f"{schedule.get('name', 'Scheduled Report')} - {now.strftime('%B %d, %Y')}"
         
         # Plain text body
         body = f"""
@@ -170,7 +345,7 @@ Your scheduled {report_type.replace('_', ' ').title()} report is ready.
 Report Details:
 - Report: {schedule.get('name', 'Scheduled Report')}
 - Company: {company.get('name', 'N/A')}
-- Generated: {datetime.utcnow().strftime('%B %d, %Y at %I:%M %p UTC')}
+- Generated: {generated_at}
 - Format: {export_format.upper()}
 
 Please find the complete report attached to this email.
@@ -183,14 +358,14 @@ AFMS - Advanced Finance Management System
         html_body = generate_report_email_html(
             report_type=report_type.replace('_', ' ').title(),
             report_data={
-                'generated_at': datetime.utcnow().strftime('%B %d, %Y at %I:%M %p UTC'),
+                'generated_at': generated_at,
                 'period': report_data.get('period_start', 'N/A') + ' to ' + report_data.get('period_end', 'N/A')
             },
             company_name=company.get('name', 'N/A')
         )
         
         # Prepare attachment
-        filename = f"{report_type}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+        filename = f"{report_type}_{now.strftime('%Y%m%d_%H%M%S')}.{export_format}"
         attachments = [
             {
                 "filename": filename,
@@ -202,29 +377,18 @@ AFMS - Advanced Finance Management System
         recipients = schedule.get("recipients", [])
         cc_recipients = schedule.get("cc_recipients", [])
         
-        success_count = 0
-        failed_recipients = []
+        messages = build_recipient_messages(
+            recipients,
+            subject,
+            body,
+            html_body=html_body,
+            attachments=attachments,
+            cc=cc_recipients,
+            merge_recipients=schedule.get("merge_recipients", True)
+        )
         
-        for recipient in recipients:
-            try:
-                success = await send_email(
-                    to_email=recipient,
-                    subject=subject,
-                    body=body,
-                    html_body=html_body,
-                    email_config=email_config,
-                    attachments=attachments,
-                    cc=cc_recipients if cc_recipients else None
-                )
-                
-                if success:
-                    success_count += 1
-                else:
-                    failed_recipients.append(recipient)
-                    
-            except Exception as e:
-                logger.error(f"Failed to send email to {recipient}: {e}")
-                failed_recipients.append(recipient)
+        failed_recipients = await send_bulk(email_config, messages)
+        success_count = len(recipients) - len(failed_recipients)
         
         # Record execution in history
         await record_execution_history(
@@ -247,84 +411,121 @@ AFMS - Advanced Finance Management System
         raise
 
 
-async def generate_report_data(company_id: str, report_type: str) -> Dict[str, Any]:
+def get_report_period(now: datetime) -> Tuple[datetime, datetime]:
+    """Default report date range: from the start of last month up to now"""
+    start_date = now.replace(day=1) - timedelta(days=1)
+    return start_date.replace(day=1), now
+
+
+async def build_report(
+    company_id: str,
+    report_type: str,
+    export_format: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Tuple[Dict[str, Any], bytes]:
+    """Generate a report and export it, returning the report data and file bytes"""
+    if start_date is None or end_date is None:
+        start_date, end_date = get_report_period(datetime.now(timezone.utc))
+    
+    report_data = await generate_report_data(
+        company_id=company_id,
+        report_type=report_type,
+        start_date=start_date,
+        end_date=end_date
+    )
+    
+    if not report_data:
+        raise Exception("Failed to generate report data")
+    
+    # Export report to requested format
+    report_bytes = await export_report(
+        report_data=report_data,
+        report_type=report_type,
+        export_format=export_format
+    )
+    
+    if not report_bytes:
+        raise Exception("Failed to export report")
+    
+    return report_data, report_bytes
+
+
+async def generate_report_data(
+    company_id: str,
+    report_type: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Dict[str, Any]:
     """Generate report data based on report type"""
     
     # Default date range: last month
-    end_date = datetime.utcnow()
-    start_date = end_date.replace(day=1) - timedelta(days=1)
-    start_date = start_date.replace(day=1)
+    if start_date is None or end_date is None:
+        start_date, end_date = get_report_period(datetime.now(timezone.utc))
     
     try:
-        if report_type == "profit_loss":
-            return await generate_profit_loss(
-                company_id=company_id,
-                start_date=start_date.isoformat(),
-                end_date=end_date.isoformat()
-            )
-        elif report_type == "balance_sheet":
-            return await generate_balance_sheet(
-                company_id=company_id,
-                as_of_date=end_date.isoformat()
-            )
-        elif report_type == "cash_flow":
-            return await generate_cash_flow_statement(
-                company_id=company_id,
-                start_date=start_date.isoformat(),
-                end_date=end_date.isoformat()
-            )
-        elif report_type == "trial_balance":
-            return await generate_trial_balance(
-                company_id=company_id,
-                as_of_date=end_date.isoformat()
-            )
-        elif report_type == "general_ledger":
-            return await generate_general_ledger(
-                company_id=company_id,
-                start_date=start_date.isoformat(),
-                end_date=end_date.isoformat()
-            )
-        else:
+        if report_type not in REPORT_GENERATORS:
             raise ValueError(f"Unknown report type: {report_type}")
+        
+        # Imported on first use so a worker with nothing due never loads the
+        # report generators (and the API modules they pull in)
+        import reports
+        
+        builder_name, date_params = REPORT_GENERATORS[report_type]
+        builder = getattr(reports, builder_name)
+        
+        # The builders compare against the naive UTC datetimes stored in Mongo
+        start_date = as_utc(start_date).replace(tzinfo=None)
+        end_date = as_utc(end_date).replace(tzinfo=None)
+        
+        if date_params == "period":
+            report = await builder(company_id, start_date, end_date)
+        else:
+            report = await builder(company_id, end_date.date())
+        
+        return report.model_dump()
             
     except Exception as e:
         logger.error(f"Error generating report data: {e}")
         return None
 
 
+def get_export_pool() -> ProcessPoolExecutor:
+    """Get the process pool that renders report files, creating it on first use"""
+    global export_pool
+    
+    if export_pool is None:
+        export_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("forkserver")
+        )
+    
+    return export_pool
+
+
 async def export_report(report_data: Dict[str, Any], report_type: str, export_format: str) -> bytes:
     """Export report to requested format"""
     try:
-        if export_format == "pdf":
-            response = ReportExporter.export_to_pdf(report_data, report_type)
-            # Read the response body
-            body = b""
-            async for chunk in response.body_iterator:
-                body += chunk
-            return body
-            
-        elif export_format == "excel":
-            response = ReportExporter.export_to_excel(report_data, report_type)
-            body = b""
-            async for chunk in response.body_iterator:
-                body += chunk
-            return body
-            
-        elif export_format == "csv":
-            response = ReportExporter.export_to_csv(report_data, report_type)
-            body = b""
-            async for chunk in response.body_iterator:
-                body += chunk if isinstance(chunk, bytes) else chunk.encode()
-            return body
-        else:
-            raise ValueError(f"Unknown export format: {export_format}")
+        # Imported on first use so ReportLab and openpyxl only load once a report is due
+        from report_exports import ReportExporter
+        
+        # ReportLab and openpyxl are pure Python, so rendering in worker
+        # processes lets exports for different schedules use separate cores
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_export_pool(),
+            ReportExporter.render,
+            report_data,
+            report_type,
+            export_format
+        )
             
     except Exception as e:
         logger.error(f"Error exporting report: {e}")
         return None
 
 
-async def record_execution_history(
+def build_execution_history(
     schedule_id: str,
     status: str,
     recipients_sent: int = 0,
@@ -333,121 +534,170 @@ async def record_execution_history(
     report_type: str = None,
     export_format: str = None,
     error_message: str = None
-):
-    """Record execution history for a schedule"""
+) -> Dict[str, Any]:
+    """Build an execution history record for a schedule"""
+    return {
+        "schedule_id": schedule_id,
+        "executed_at": datetime.now(timezone.utc),
+        "status": status,  # completed, failed, partial
+        "recipients_sent": recipients_sent,
+        "recipients_failed": recipients_failed,
+        "failed_recipients": failed_recipients or [],
+        "report_type": report_type,
+        "export_format": export_format,
+        "error_message": error_message
+    }
+
+
+async def record_execution_history(**kwargs):
+    """Record execution history for a schedule (fields as for build_execution_history)"""
+    await save_execution_history([build_execution_history(**kwargs)])
+
+
+async def save_execution_history(records: List[Dict[str, Any]]):
+    """Hand history records to the background writer, or insert them directly without it"""
+    queued = 0
+    
+    if _history_writer_task is not None and not _history_writer_task.done():
+        for record in records:
+            try:
+                history_queue.put_nowait(record)
+            except asyncio.QueueFull:
+                # Writer is falling behind; apply backpressure with a direct insert
+                break
+            queued += 1
+    
+    if queued < len(records):
+        await _write_history_batch(records[queued:])
+
+
+# History records are queued by save_execution_history and written in
+# batches so the insert round-trip stays off the execution path
+HISTORY_FLUSH_INTERVAL_SECONDS = 2.0
+HISTORY_MAX_BATCH_SIZE = 200
+HISTORY_QUEUE_MAX_SIZE = 10000
+
+history_queue: asyncio.Queue = asyncio.Queue(maxsize=HISTORY_QUEUE_MAX_SIZE)
+_history_writer_task: Optional[asyncio.Task] = None
+_HISTORY_QUEUE_STOP = object()
+
+
+async def _write_history_batch(batch: List[Dict[str, Any]]):
+    """Insert a batch of history records in one round-trip"""
     try:
-        history_record = {
-            "schedule_id": schedule_id,
-            "executed_at": datetime.utcnow(),
-            "status": status,  # completed, failed, partial
-            "recipients_sent": recipients_sent,
-            "recipients_failed": recipients_failed,
-            "failed_recipients": failed_recipients or [],
-            "report_type": report_type,
-            "export_format": export_format,
-            "error_message": error_message
-        }
-        
-        await scheduled_report_history_collection.insert_one(history_record)
-        
+        await scheduled_report_history_collection.insert_many(batch, ordered=False)
     except Exception as e:
-        logger.error(f"Error recording execution history: {e}")
+        logger.error(f"Error recording execution history ({len(batch)} record(s)): {e}")
+
+
+async def _flush_history_queue():
+    """Drain the history queue, flushing every batch interval or batch size"""
+    loop = asyncio.get_running_loop()
+    stopping = False
+    
+    while not stopping:
+        record = await history_queue.get()
+        if record is _HISTORY_QUEUE_STOP:
+            break
+        
+        batch = [record]
+        deadline = loop.time() + HISTORY_FLUSH_INTERVAL_SECONDS
+        while len(batch) < HISTORY_MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                record = await asyncio.wait_for(history_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if record is _HISTORY_QUEUE_STOP:
+                stopping = True
+                break
+            batch.append(record)
+        
+        await _write_history_batch(batch)
+    
+    # Flush anything still queued after the stop marker
+    remaining = []
+    while not history_queue.empty():
+        record = history_queue.get_nowait()
+        if record is not _HISTORY_QUEUE_STOP:
+            remaining.append(record)
+    if remaining:
+        await _write_history_batch(remaining)
+
 
+def start_history_writer():
+    """Start the background history writer on the running event loop"""
+    global _history_writer_task
+    if _history_writer_task is None or _history_writer_task.done():
+        _history_writer_task = asyncio.create_task(_flush_history_queue())
+        logger.info("✅ Report history writer started")
 
-def calculate_next_run_time(schedule: Dict[str, Any]) -> datetime:
-    """Calculate the next run time for a schedule"""
-    frequency = schedule.get("frequency")
-    time_of_day = schedule.get("time_of_day", "09:00")  # HH:MM
+
+async def stop_history_writer():
+    """Stop the history writer after flushing all queued records"""
+    global _history_writer_task
+    if _history_writer_task is None:
+        return
     
-    # Parse time
+    task = _history_writer_task
+    _history_writer_task = None
+    if not task.done():
+        await history_queue.put(_HISTORY_QUEUE_STOP)
+        await task
+    logger.info("Report history writer stopped")
+
+
+# Months that are shorter than a given day of month in at least some years
+SHORT_MONTHS = {29: "2", 30: "2", 31: "2,4,6,9,11"}
+
+
+@lru_cache(maxsize=1024)
+def build_schedule_trigger(
+    frequency: str,
+    time_of_day: str,
+    day_of_week: Optional[str],
+    day_of_month: Optional[int]
+):
+    """Build (and memoize) the cron trigger equivalent to a schedule's timing"""
     hours, minutes = map(int, time_of_day.split(':'))
     
-    now = datetime.utcnow()
+    def cron(**fields):
+        return CronTrigger(hour=hours, minute=minutes, timezone=timezone.utc, **fields)
     
-    if frequency == "daily":
-        # Next occurrence of the specified time
-        next_run = now.replace(hour=hours, minute=minutes, second=0, microsecond=0)
-        if next_run <= now:
-            next_run += timedelta(days=1)
-        return next_run
-        
-    elif frequency == "weekly":
-        # Next occurrence of the specified day and time
-        day_of_week = schedule.get("day_of_week", "monday")
-        weekday_map = {
-            "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
-            "friday": 4, "saturday": 5, "sunday": 6
-        }
-        target_weekday = weekday_map.get(day_of_week, 0)
-        
-        # Calculate days until target weekday
-        days_ahead = target_weekday - now.weekday()
-        if days_ahead <= 0:  # Target day already happened this week
-            days_ahead += 7
-        
-        next_run = now + timedelta(days=days_ahead)
-        next_run = next_run.replace(hour=hours, minute=minutes, second=0, microsecond=0)
-        
-        # If the time has already passed today and it's the target day, add a week
-        if days_ahead == 0 and next_run <= now:
-            next_run += timedelta(days=7)
-        
-        return next_run
-        
-    elif frequency == "monthly":
-        # Next occurrence of the specified day of month and time
-        day_of_month = schedule.get("day_of_month", 1)
-        
-        # Try current month
-        try:
-            next_run = now.replace(day=day_of_month, hour=hours, minute=minutes, second=0, microsecond=0)
-        except ValueError:
-            # Day doesn't exist in current month (e.g., Feb 30), use last day
-            import calendar
-            last_day = calendar.monthrange(now.year, now.month)[1]
-            next_run = now.replace(day=last_day, hour=hours, minute=minutes, second=0, microsecond=0)
-        
-        # If this time has passed, go to next month
-        if next_run <= now:
-            if now.month == 12:
-                next_year = now.year + 1
-                next_month = 1
-            else:
-                next_year = now.year
-                next_month = now.month + 1
-            
-            try:
-                next_run = now.replace(year=next_year, month=next_month, day=day_of_month,
-                                      hour=hours, minute=minutes, second=0, microsecond=0)
-            except ValueError:
-                # Day doesn't exist in next month
-                import calendar
-                last_day = calendar.monthrange(next_year, next_month)[1]
-                next_run = now.replace(year=next_year, month=next_month, day=last_day,
-                                      hour=hours, minute=minutes, second=0, microsecond=0)
-        
-        return next_run
-        
-    elif frequency == "quarterly":
-        # Next occurrence of first day of quarter
-        current_quarter = (now.month - 1) // 3
-        next_quarter_month = (current_quarter + 1) * 3 + 1
-        
-        if next_quarter_month > 12:
-            next_year = now.year + 1
-            next_quarter_month = 1
-        else:
-            next_year = now.year
-        
-        next_run = now.replace(year=next_year, month=next_quarter_month, day=1,
-                               hour=hours, minute=minutes, second=0, microsecond=0)
-        
-        return next_run
+    if frequency == "weekly":
+        return cron(day_of_week=(day_of_week or "monday")[:3])
+    
+    if frequency == "quarterly":
+        # First day of each quarter
+        return cron(month="1,4,7,10", day=1)
+    
+    if frequency == "monthly":
+        day = day_of_month or 1
+        if day not in SHORT_MONTHS:
+            return cron(day=day)
+        # Months without that day run on their last day instead
+        return OrTrigger([
+            cron(day=day),
+            cron(month=SHORT_MONTHS[day], day="last")
+        ])
+    
+    # daily, and the default for unknown frequencies
+    return cron()
+
+
+def calculate_next_run_time(schedule: Dict[str, Any], now: Optional[datetime] = None) -> datetime:
+    """Calculate the next run time (UTC) for a schedule, strictly after now"""
+    trigger = build_schedule_trigger(
+        schedule.get("frequency"),
+        schedule.get("time_of_day", "09:00"),  # HH:MM
+        schedule.get("day_of_week"),
+        schedule.get("day_of_month")
+    )
     
-    else:
-        # Default: tomorrow at the specified time
-        next_run = now.replace(hour=hours, minute=minutes, second=0, microsecond=0) + timedelta(days=1)
-        return next_run
+    now = now or datetime.now(timezone.utc)
+    return trigger.get_next_fire_time(None, now + timedelta(microseconds=1))
 
 
 async def trigger_manual_run(schedule_id: str, company_id: str):
@@ -3,13 +3,17 @@ Report Scheduling API
 Handles automated report generation and email delivery
 """
 
-from fastapi import APIRouter, HTTPException, Depends, status
-from pydantic import BaseModel, EmailStr, field_validator
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from pydantic import BaseModel, field_validator
 from typing import Optional, List, Dict, Any
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
 from enum import Enum
 import logging
+import re
+from time import monotonic
 import uuid
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from database import report_schedules_collection, scheduled_report_history_collection, integrations_collection
 from auth import get_current_user, log_audit_event
@@ -17,6 +21,28 @@ from auth import get_current_user, log_audit_event
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# 24-hour HH:MM; single-digit hours and minutes are accepted as before
+_TIME_OF_DAY_RE = re.compile(r'(?:[01]?\d|2[0-3]):[0-5]?\d\Z')
+
+# local@domain.tld; deliverability is left to the mail server
+_EMAIL_RE = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+\Z')
+
+# Companies whose email integration was recently seen enabled, with expiry times
+EMAIL_ENABLED_CACHE_TTL_SECONDS = 60
+EMAIL_ENABLED_CACHE_MAX_ENTRIES = 1024
+_email_enabled_cache: Dict[str, float] = {}
+
+# Schedule fields update_schedule needs back to recalculate next_run
+SCHEDULE_TIMING_PROJECTION = {
+    "_id": 0,
+    "frequency": 1,
+    "time_of_day": 1,
+    "day_of_week": 1,
+    "day_of_month": 1,
+    "enabled": 1,
+    "next_run": 1
+}
+
 
 # ==================== Enums ====================
 
@@ -58,6 +84,18 @@ class ExportFormat(str, Enum):
 
 # ==================== Models ====================
 
+def validate_email_list(addresses: Optional[List[str]]) -> Optional[List[str]]:
+    """Strip and syntax-check a list of recipient addresses"""
+    if addresses is None:
+        return None
+    
+    addresses = [address.strip() for address in addresses]
+    for address in addresses:
+        if not _EMAIL_RE.match(address):
+            raise ValueError(f'{address!r} is not a valid email address')
+    return addresses
+
+
 class ReportScheduleCreate(BaseModel):
     """Create a new report schedule"""
     name: str
@@ -71,12 +109,13 @@ class ReportScheduleCreate(BaseModel):
     day_of_month: Optional[int] = None  # For monthly schedules (1-31)
     
     # Recipients
-    recipients: List[EmailStr]
-    cc_recipients: Optional[List[EmailStr]] = None
+    recipients: List[str]
+    cc_recipients: Optional[List[str]] = None
     
     # Report parameters
     include_attachments: bool = True
     include_charts: bool = True
+    merge_recipients: bool = True  # One Bcc email per group instead of one email per recipient
     
     # Status
     enabled: bool = True
@@ -91,15 +130,14 @@ class ReportScheduleCreate(BaseModel):
     @field_validator('time_of_day')
     @classmethod
     def validate_time_of_day(cls, v):
-        try:
-            hours, minutes = v.split(':')
-            hours = int(hours)
-            minutes = int(minutes)
-            if hours < 0 or hours > 23 or minutes < 0 or minutes > 59:
-                raise ValueError
-        except:
+        if not _TIME_OF_DAY_RE.match(v):
             raise ValueError('time_of_day must be in HH:MM format (24-hour)')
         return v
+    
+    @field_validator('recipients', 'cc_recipients')
+    @classmethod
+    def validate_recipients(cls, v):
+        return validate_email_list(v)
 
 
 class ReportScheduleUpdate(BaseModel):
@@ -110,11 +148,17 @@ class ReportScheduleUpdate(BaseModel):
     time_of_day: Optional[str] = None
     day_of_week: Optional[WeekDay] = None
     day_of_month: Optional[int] = None
-    recipients: Optional[List[EmailStr]] = None
-    cc_recipients: Optional[List[EmailStr]] = None
+    recipients: Optional[List[str]] = None
+    cc_recipients: Optional[List[str]] = None
     include_attachments: Optional[bool] = None
     include_charts: Optional[bool] = None
+    merge_recipients: Optional[bool] = None
     enabled: Optional[bool] = None
+    
+    @field_validator('recipients', 'cc_recipients')
+    @classmethod
+    def validate_recipients(cls, v):
+        return validate_email_list(v)
 
 
 class ReportScheduleResponse(BaseModel):
@@ -130,6 +174,7 @@ class ReportScheduleResponse(BaseModel):
     day_of_month: Optional[int]
     recipients: List[str]
     cc_recipients: Optional[List[str]]
+    merge_recipients: bool = True
     enabled: bool
     created_at: datetime
     updated_at: datetime
@@ -144,15 +189,13 @@ def calculate_next_run(
     frequency: str,
     time_of_day: str,
     day_of_week: Optional[str] = None,
-    day_of_month: Optional[int] = None
+    day_of_month: Optional[int] = None,
+    now: Optional[datetime] = None
 ) -> datetime:
     """
     Calculate the next run time for a schedule
     """
-    from datetime import datetime, timedelta
-    import calendar
-    
-    now = datetime.utcnow()
+    now = now or datetime.utcnow()
     hours, minutes = map(int, time_of_day.split(':'))
     
     if frequency == "daily":
@@ -191,24 +234,40 @@ def calculate_next_run(
     elif frequency == "quarterly":
         # Next quarter (every 3 months)
         target_day = day_of_month or 1
-        next_month = ((now.month - 1) // 3 + 1) * 3 + 1
-        if next_month > 12:
-            next_month = 1
-            next_year = now.year + 1
-        else:
-            next_year = now.year
-        next_run = datetime(next_year, next_month, target_day, hours, minutes)
+        quarter_month = ((now.month - 1) // 3) * 3 + 1
+        next_run = datetime(now.year, quarter_month, target_day, hours, minutes)
         if next_run <= now:
-            next_month += 3
-            if next_month > 12:
-                next_month -= 12
-                next_year += 1
-            next_run = datetime(next_year, next_month, target_day, hours, minutes)
+            # Advance one quarter; month 13 rolls over into January
+            quarter_month += 3
+            year = now.year + quarter_month // 13
+            next_run = datetime(year, (quarter_month - 1) % 12 + 1, target_day, hours, minutes)
         return next_run
     
     return now + timedelta(days=1)
 
 
+async def _email_enabled(company_id: str) -> bool:
+    """Whether the company's email integration is enabled; positive results are cached briefly"""
+    now = monotonic()
+    expires_at = _email_enabled_cache.get(company_id)
+    if expires_at is not None and expires_at > now:
+        return True
+    
+    integration_config = await integrations_collection.find_one(
+        {"company_id": company_id},
+        {"_id": 0, "email.enabled": 1}
+    )
+    if not integration_config or not integration_config.get("email", {}).get("enabled"):
+        # Not cached, so enabling email takes effect on the next request
+        _email_enabled_cache.pop(company_id, None)
+        return False
+    
+    if len(_email_enabled_cache) >= EMAIL_ENABLED_CACHE_MAX_ENTRIES:
+        _email_enabled_cache.clear()
+    _email_enabled_cache[company_id] = now + EMAIL_ENABLED_CACHE_TTL_SECONDS
+    return True
+
+
 # ==================== API Endpoints ====================
 
 @router.post("/schedules", response_model=Dict[str, Any])
@@ -221,11 +280,7 @@ async def create_schedule(
     """
     try:
         # Check if email is configured and enabled
-        integration_config = await integrations_collection.find_one({
-            "company_id": current_user["company_id"]
-        })
-        
-        if not integration_config or not integration_config.get("email", {}).get("enabled"):
+        if not await _email_enabled(current_user["company_id"]):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email integration must be enabled before creating report schedules"
@@ -269,6 +324,7 @@ async def create_schedule(
             "cc_recipients": schedule.cc_recipients or [],
             "include_attachments": schedule.include_attachments,
             "include_charts": schedule.include_charts,
+            "merge_recipients": schedule.merge_recipients,
             "enabled": schedule.enabled,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
@@ -277,7 +333,22 @@ async def create_schedule(
             "total_runs": 0
         }
         
-        await report_schedules_collection.insert_one(schedule_doc)
+        # Keyed on (company_id, name) so a retried POST cannot insert a duplicate
+        try:
+            result = await report_schedules_collection.update_one(
+                {"company_id": current_user["company_id"], "name": schedule.name},
+                {"$setOnInsert": schedule_doc},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent request inserted the same name first
+            result = None
+        
+        if result is None or result.upserted_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A report schedule with this name already exists"
+            )
         
         # Log audit event
         await log_audit_event(
@@ -310,19 +381,28 @@ async def create_schedule(
 
 @router.get("/schedules")
 async def list_schedules(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    List all report schedules for the company
+    List report schedules for the company, newest first
     """
     try:
-        schedules = await report_schedules_collection.find({
-            "company_id": current_user["company_id"]
-        }).to_list(length=None)
+        query = {"company_id": current_user["company_id"]}
+        
+        cursor = report_schedules_collection.find(query, {"_id": 0}).sort("created_at", -1).skip(offset).limit(limit)
+        schedules = await cursor.to_list(length=limit)
+        
+        # A short first page already holds every schedule; only count otherwise
+        if offset == 0 and len(schedules) < limit:
+            total = len(schedules)
+        else:
+            total = await report_schedules_collection.count_documents(query)
         
         return {
             "schedules": schedules,
-            "total": len(schedules)
+            "total": total
         }
         
     except Exception as e:
@@ -375,18 +455,6 @@ async def update_schedule(
     Update a report schedule
     """
     try:
-        # Get existing schedule
-        existing = await report_schedules_collection.find_one({
-            "schedule_id": schedule_id,
-            "company_id": current_user["company_id"]
-        })
-        
-        if not existing:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Report schedule not found"
-            )
-        
         # Prepare update data
         update_data = {"updated_at": datetime.utcnow()}
         
@@ -410,9 +478,31 @@ async def update_schedule(
             update_data["include_attachments"] = schedule_update.include_attachments
         if schedule_update.include_charts is not None:
             update_data["include_charts"] = schedule_update.include_charts
+        if schedule_update.merge_recipients is not None:
+            update_data["merge_recipients"] = schedule_update.merge_recipients
         if schedule_update.enabled is not None:
             update_data["enabled"] = schedule_update.enabled
         
+        # Apply the update and read back only the fields needed for next_run
+        try:
+            existing = await report_schedules_collection.find_one_and_update(
+                {"schedule_id": schedule_id, "company_id": current_user["company_id"]},
+                {"$set": update_data},
+                projection=SCHEDULE_TIMING_PROJECTION,
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A report schedule with this name already exists"
+            )
+        
+        if not existing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Report schedule not found"
+            )
+        
         # Recalculate next run if timing changed
         if any(k in update_data for k in ["frequency", "time_of_day", "day_of_week", "day_of_month"]):
             next_run = calculate_next_run(
@@ -422,12 +512,11 @@ async def update_schedule(
                 day_of_month=update_data.get("day_of_month", existing.get("day_of_month"))
             )
             update_data["next_run"] = next_run
-        
-        # Update schedule
-        await report_schedules_collection.update_one(
-            {"schedule_id": schedule_id},
-            {"$set": update_data}
-        )
+            
+            await report_schedules_collection.update_one(
+                {"schedule_id": schedule_id},
+                {"$set": {"next_run": next_run}}
+            )
         
         # Log audit event
         await log_audit_event(
@@ -504,10 +593,10 @@ async def run_schedule_now(
     Manually trigger a report schedule to run immediately
     """
     try:
-        schedule = await report_schedules_collection.find_one({
-            "schedule_id": schedule_id,
-            "company_id": current_user["company_id"]
-        })
+        schedule = await report_schedules_collection.find_one(
+            {"schedule_id": schedule_id, "company_id": current_user["company_id"]},
+            {"_id": 1}
+        )
         
         if not schedule:
             raise HTTPException(
@@ -515,19 +604,12 @@ async def run_schedule_now(
                 detail="Report schedule not found"
             )
         
-        # Trigger Celery task for report generation
+        # Hand rendering and delivery to the default Celery queue; the worker
+        # re-reads the schedule, so only its ID goes through the broker
         try:
-            from report_tasks import generate_and_send_report
+            from report_tasks import generate_scheduled_report
             
-            generate_and_send_report.delay(
-                schedule_id=schedule["schedule_id"],
-                company_id=schedule["company_id"],
-                report_type=schedule["report_type"],
-                export_format=schedule["export_format"],
-                recipients=schedule["recipients"],
-                cc_recipients=schedule.get("cc_recipients", []),
-                report_params={}
-            )
+            generate_scheduled_report.apply_async(args=[schedule_id])
             
             logger.info(f"Manual run triggered for schedule {schedule_id}")
             
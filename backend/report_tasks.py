@@ -3,49 +3,50 @@ Celery Tasks for Report Generation and Email Delivery
 """
 import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime
 from typing import Dict, Any, Optional
 import io
 
 from celery import Task
 from celery_app import celery_app
-
-# Import async database and services
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from pymongo import UpdateOne
 
 logger = logging.getLogger(__name__)
 
-# MongoDB connection for tasks
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-mongo_client = None
-db = None
-
 
 def get_db():
-    """Get database connection for tasks"""
-    global mongo_client, db
-    if mongo_client is None:
-        mongo_client = AsyncIOMotorClient(MONGO_URL)
-        db = mongo_client["afms"]
-    return db
+    """Get the application database the API writes schedules to"""
+    # Imported on first use so the worker's parent process never touches the
+    # client; each forked worker binds it to its own task loop
+    from database import database
+    return database
+
+
+# Event loop shared by every task in this worker process. Motor clients bind to
+# the loop of their first operation, so a loop per task would leave the cached
+# client pointing at a closed loop from the second task on.
+_task_loop = None
+
+
+def get_task_loop() -> asyncio.AbstractEventLoop:
+    """Get the worker process's persistent event loop for async tasks"""
+    global _task_loop
+    if _task_loop is None or _task_loop.is_closed():
+        _task_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_task_loop)
+    return _task_loop
 
 
 class AsyncTask(Task):
     """Custom task class that supports async functions"""
     
     def __call__(self, *args, **kwargs):
-        """Execute async task"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(self.run_async(*args, **kwargs))
-        finally:
-            loop.close()
+        """Execute async task on the worker's persistent event loop"""
+        return get_task_loop().run_until_complete(self.run_async(*args, **kwargs))
     
     async def run_async(self, *args, **kwargs):
-        """Override this method in async tasks"""
-        raise NotImplementedError
+        """Await the coroutine defined by the decorated task function"""
+        return await self.run(*args, **kwargs)
 
 
 @celery_app.task(bind=True, base=AsyncTask, max_retries=3)
@@ -74,58 +75,15 @@ async def generate_and_send_report(
     try:
         db = get_db()
         
-        logger.info(f"Generating {report_type} report for company {company_id}")
-        
-        # Get company details
-        company = await db.companies.find_one({"company_id": company_id})
-        if not company:
-            raise Exception(f"Company {company_id} not found")
-        
-        company_name = company.get("company_name", "Unknown Company")
-        
-        # Get email configuration
-        integration_config = await db.integrations.find_one({"company_id": company_id})
-        if not integration_config or not integration_config.get("email", {}).get("enabled"):
-            logger.warning(f"Email not configured for company {company_id}, using mock email")
-            email_config = {"provider": "mock"}
-        else:
-            email_config = integration_config.get("email", {})
-        
-        # Generate report data based on type
-        report_data = await _generate_report_data(db, company_id, report_type, report_params)
-        
-        # Export report to requested format
-        report_file = await _export_report(report_data, report_type, export_format, company_name)
-        
-        # Send email with report attachment
-        success = await _send_report_email(
-            email_config=email_config,
-            recipients=recipients,
-            cc_recipients=cc_recipients,
-            report_type=report_type,
-            report_file=report_file,
-            company_name=company_name,
-            export_format=export_format
-        )
-        
-        # Record execution in history
-        await _record_execution_history(
+        await _deliver_report(
             db=db,
             schedule_id=schedule_id,
             company_id=company_id,
-            success=success,
             report_type=report_type,
             export_format=export_format,
-            recipients=recipients
-        )
-        
-        # Update schedule last_run and total_runs
-        await db.report_schedules.update_one(
-            {"schedule_id": schedule_id},
-            {
-                "$set": {"last_run": datetime.utcnow()},
-                "$inc": {"total_runs": 1}
-            }
+            recipients=recipients,
+            cc_recipients=cc_recipients,
+            report_params=report_params
         )
         
         logger.info(f"Report {report_type} generated and sent successfully")
@@ -151,113 +109,275 @@ async def generate_and_send_report(
         raise self.retry(exc=e, countdown=60 * (2 ** self.request.retries))
 
 
+@celery_app.task(
+    bind=True,
+    base=AsyncTask,
+    acks_late=True,
+    max_retries=5,
+    default_retry_delay=60
+)
+async def generate_scheduled_report(self, schedule_id: str, dispatched: bool = False):
+    """
+    Generate and email the report for a schedule on the default Celery queue
+    
+    Only the schedule ID travels through the broker; the worker re-reads the
+    schedule so recipients and parameters are current when the task runs.
+    
+    Args:
+        schedule_id: Report schedule ID
+        dispatched: True when enqueued by dispatch_due_reports, which has
+            already recorded last_run and total_runs for this run
+    """
+    db = get_db()
+    
+    schedule = await db.report_schedules.find_one(
+        {"schedule_id": schedule_id},
+        {
+            "_id": 0,
+            "schedule_id": 1,
+            "company_id": 1,
+            "report_type": 1,
+            "export_format": 1,
+            "recipients": 1,
+            "cc_recipients": 1,
+            "merge_recipients": 1
+        }
+    )
+    if not schedule:
+        logger.warning(f"Schedule {schedule_id} no longer exists, skipping report")
+        return {"success": False, "message": "Report schedule not found"}
+    
+    try:
+        success = await _deliver_report(
+            db=db,
+            schedule_id=schedule_id,
+            company_id=schedule["company_id"],
+            report_type=schedule["report_type"],
+            export_format=schedule["export_format"],
+            recipients=schedule["recipients"],
+            cc_recipients=schedule.get("cc_recipients", []),
+            merge_recipients=schedule.get("merge_recipients", True),
+            record_run=not dispatched
+        )
+        
+        logger.info(f"Scheduled report {schedule_id} generated and sent")
+        return {"success": success, "message": "Report sent successfully" if success else "Report delivery failed"}
+        
+    except Exception as e:
+        logger.error(f"Error generating scheduled report {schedule_id}: {e}")
+        
+        await _record_execution_history(
+            db=db,
+            schedule_id=schedule_id,
+            company_id=schedule["company_id"],
+            success=False,
+            report_type=schedule["report_type"],
+            export_format=schedule["export_format"],
+            recipients=schedule["recipients"],
+            error_message=str(e)
+        )
+        
+        raise self.retry(exc=e)
+
+
+# Fields the dispatcher needs to enqueue a schedule and compute its next run
+DUE_SCHEDULE_PROJECTION = {
+    "_id": 0,
+    "schedule_id": 1,
+    "frequency": 1,
+    "time_of_day": 1,
+    "day_of_week": 1,
+    "day_of_month": 1
+}
+
+
 @celery_app.task(bind=True, base=AsyncTask)
-async def check_scheduled_reports(self):
+async def dispatch_due_reports(self):
     """
-    Periodic task to check and trigger scheduled reports
-    Runs every 5 minutes via Celery Beat
+    Periodic task to enqueue every due report schedule
+    Runs every minute via Celery Beat; the (enabled, next_run) index keeps the
+    scan proportional to the schedules actually due
     """
     try:
         db = get_db()
         now = datetime.utcnow()
         
-        # Find all enabled schedules where next_run is due
-        schedules = await db.report_schedules.find({
-            "enabled": True,
-            "next_run": {"$lte": now}
-        }).to_list(length=None)
+        cursor = db.report_schedules.find(
+            {"enabled": True, "next_run": {"$lte": now}},
+            DUE_SCHEDULE_PROJECTION
+        )
         
-        logger.info(f"Found {len(schedules)} scheduled reports to run")
+        schedule_ids = []
+        updates = []
+        next_runs = {}  # Schedules sharing a timing share one next_run
+        async for schedule in cursor:
+            try:
+                next_run = _calculate_next_run(schedule, now, next_runs)
+            except Exception as e:
+                logger.error(f"Error calculating next run for schedule {schedule['schedule_id']}: {e}")
+                continue
+            
+            schedule_ids.append(schedule["schedule_id"])
+            updates.append(UpdateOne(
+                {"schedule_id": schedule["schedule_id"]},
+                {
+                    "$set": {"last_run": now, "next_run": next_run},
+                    "$inc": {"total_runs": 1}
+                }
+            ))
+        
+        if not updates:
+            return {"success": True, "schedules_processed": 0}
+        
+        # Record the runs and advance next_run before enqueueing so an
+        # overlapping tick cannot pick up the same schedules again
+        await db.report_schedules.bulk_write(updates, ordered=False)
         
-        for schedule in schedules:
+        for schedule_id in schedule_ids:
             try:
-                # Trigger report generation task
-                generate_and_send_report.delay(
-                    schedule_id=schedule["schedule_id"],
-                    company_id=schedule["company_id"],
-                    report_type=schedule["report_type"],
-                    export_format=schedule["export_format"],
-                    recipients=schedule["recipients"],
-                    cc_recipients=schedule.get("cc_recipients", []),
-                    report_params={}
+                generate_scheduled_report.apply_async(
+                    args=[schedule_id],
+                    kwargs={"dispatched": True}
                 )
-                
-                # Calculate next run time
-                next_run = _calculate_next_run(schedule)
-                
-                # Update schedule
-                await db.report_schedules.update_one(
-                    {"schedule_id": schedule["schedule_id"]},
-                    {"$set": {"next_run": next_run}}
-                )
-                
-                logger.info(f"Triggered report for schedule {schedule['schedule_id']}, next run: {next_run}")
-                
             except Exception as e:
-                logger.error(f"Error processing schedule {schedule['schedule_id']}: {e}")
+                logger.error(f"Error enqueueing schedule {schedule_id}: {e}")
         
-        return {"success": True, "schedules_processed": len(schedules)}
+        logger.info(f"Dispatched {len(schedule_ids)} scheduled reports")
+        return {"success": True, "schedules_processed": len(schedule_ids)}
         
     except Exception as e:
-        logger.error(f"Error in check_scheduled_reports: {e}")
+        logger.error(f"Error in dispatch_due_reports: {e}")
         raise
 
 
 # ==================== Helper Functions ====================
 
-async def _generate_report_data(db, company_id: str, report_type: str, params: dict) -> Dict[str, Any]:
-    """Generate report data from database"""
-    from datetime import datetime, timedelta
+async def _deliver_report(
+    db,
+    schedule_id: str,
+    company_id: str,
+    report_type: str,
+    export_format: str,
+    recipients: list,
+    cc_recipients: list = None,
+    report_params: dict = None,
+    merge_recipients: bool = True,
+    record_run: bool = True
+) -> bool:
+    """Generate, export and email a report, then record the run"""
+    logger.info(f"Generating {report_type} report for company {company_id}")
+    
+    # Get company details
+    company = await db.companies.find_one({"_id": company_id}, {"name": 1})
+    if not company:
+        raise Exception(f"Company {company_id} not found")
+    
+    company_name = company.get("name", "Unknown Company")
+    
+    # Get email configuration
+    integration_config = await db.integrations.find_one({"company_id": company_id})
+    if not integration_config or not integration_config.get("email", {}).get("enabled"):
+        logger.warning(f"Email not configured for company {company_id}, using mock email")
+        email_config = {"provider": "mock"}
+    else:
+        email_config = integration_config.get("email", {})
+    
+    # Generate report data based on type
+    report_data = await _generate_report_data(company_id, report_type, report_params)
+    
+    # Export report to requested format
+    report_file = await _export_report(report_data, report_type, export_format, company_name)
+    
+    # Send email with report attachment
+    success = await _send_report_email(
+        email_config=email_config,
+        recipients=recipients,
+        cc_recipients=cc_recipients,
+        report_type=report_type,
+        report_file=report_file,
+        company_name=company_name,
+        export_format=export_format,
+        merge_recipients=merge_recipients
+    )
+    
+    # Record execution in history
+    await _record_execution_history(
+        db=db,
+        schedule_id=schedule_id,
+        company_id=company_id,
+        success=success,
+        report_type=report_type,
+        export_format=export_format,
+        recipients=recipients
+    )
+    
+    # Update schedule last_run and total_runs unless the dispatcher already did
+    if record_run:
+        await db.report_schedules.update_one(
+            {"schedule_id": schedule_id},
+            {
+                "$set": {"last_run": datetime.utcnow()},
+                "$inc": {"total_runs": 1}
+            }
+        )
+    
+    return success
+
+
+async def _generate_report_data(company_id: str, report_type: str, params: dict) -> Dict[str, Any]:
+    """Build report data with the report builders shared with the reports API"""
     from reports import (
-        generate_profit_loss_report,
-        generate_balance_sheet_report,
-        generate_cash_flow_report,
-        generate_trial_balance_report,
-        generate_general_ledger_report
+        ReportPeriod,
+        get_period_dates,
+        build_profit_loss_report,
+        build_balance_sheet_report,
+        build_cash_flow_report,
+        build_trial_balance_report,
+        build_general_ledger_report
     )
     
-    # Default to last month if no params provided
-    if not params:
-        now = datetime.utcnow()
-        start_date = (now.replace(day=1) - timedelta(days=1)).replace(day=1)
-        end_date = now.replace(day=1) - timedelta(days=1)
-        params = {
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": end_date.strftime("%Y-%m-%d")
-        }
+    params = params or {}
+    
+    # Default to last month if no dates provided
+    if params.get("start_date") and params.get("end_date"):
+        period_start, period_end = get_period_dates(
+            ReportPeriod.CUSTOM,
+            date.fromisoformat(params["start_date"]),
+            date.fromisoformat(params["end_date"])
+        )
+    else:
+        period_start, period_end = get_period_dates(ReportPeriod.LAST_MONTH)
+    
+    if params.get("as_of_date"):
+        as_of_date = date.fromisoformat(params["as_of_date"])
+    else:
+        as_of_date = datetime.utcnow().date()
     
     # Generate report based on type
     if report_type == "profit_loss":
-        return await generate_profit_loss_report(
-            db, company_id,
-            params.get("start_date"),
-            params.get("end_date")
-        )
+        report = await build_profit_loss_report(company_id, period_start, period_end)
     elif report_type == "balance_sheet":
-        return await generate_balance_sheet_report(
-            db, company_id,
-            params.get("as_of_date", datetime.utcnow().strftime("%Y-%m-%d"))
-        )
+        report = await build_balance_sheet_report(company_id, as_of_date)
     elif report_type == "cash_flow":
-        return await generate_cash_flow_report(
-            db, company_id,
-            params.get("start_date"),
-            params.get("end_date")
-        )
+        report = await build_cash_flow_report(company_id, period_start, period_end)
     elif report_type == "trial_balance":
-        return await generate_trial_balance_report(
-            db, company_id,
-            params.get("as_of_date", datetime.utcnow().strftime("%Y-%m-%d"))
-        )
+        report = await build_trial_balance_report(company_id, as_of_date)
     elif report_type == "general_ledger":
-        return await generate_general_ledger_report(
-            db, company_id,
-            params.get("account_id"),
-            params.get("start_date"),
-            params.get("end_date")
+        report = await build_general_ledger_report(
+            company_id, period_start, period_end, params.get("account_id")
         )
     else:
         raise ValueError(f"Unknown report type: {report_type}")
+    
+    return report.dict()
+
+
+# File extension and content type of each export format
+EXPORT_FILE_TYPES = {
+    "pdf": ("pdf", "application/pdf"),
+    "excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv", "text/csv")
+}
 
 
 async def _export_report(report_data: Dict[str, Any], report_type: str, export_format: str, company_name: str) -> Dict[str, Any]:
@@ -268,29 +388,17 @@ async def _export_report(report_data: Dict[str, Any], report_type: str, export_f
     report_data["company_name"] = company_name
     report_data["generated_at"] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
     
-    # Export based on format
-    if export_format == "pdf":
-        response = ReportExporter.export_to_pdf(report_data, report_type)
-    elif export_format == "excel":
-        response = ReportExporter.export_to_excel(report_data, report_type)
-    elif export_format == "csv":
-        response = ReportExporter.export_to_csv(report_data, report_type)
-    else:
+    if export_format not in EXPORT_FILE_TYPES:
         raise ValueError(f"Unknown export format: {export_format}")
+    extension, content_type = EXPORT_FILE_TYPES[export_format]
     
-    # Read file content
-    file_content = b""
-    async for chunk in response.body_iterator:
-        file_content += chunk
-    
-    # Get filename from headers
-    content_disposition = response.headers.get("content-disposition", "")
-    filename = content_disposition.split("filename=")[-1].strip('"')
+    # Render straight to bytes; rendering is CPU-bound, so keep it off the event loop
+    file_content = await asyncio.to_thread(ReportExporter.render, report_data, report_type, export_format)
     
     return {
-        "filename": filename,
+        "filename": f"{report_type}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}",
         "content": file_content,
-        "content_type": response.media_type
+        "content_type": content_type
     }
 
 
@@ -301,10 +409,11 @@ async def _send_report_email(
     report_type: str,
     report_file: Dict[str, Any],
     company_name: str,
-    export_format: str
+    export_format: str,
+    merge_recipients: bool = True
 ) -> bool:
-    """Send report via email"""
-    from email_service import send_email, generate_report_email_html
+    """Send report via email, reusing one SMTP session for every message"""
+    from email_service import send_bulk, build_recipient_messages, generate_report_email_html
     
     # If mock email, just log
     if email_config.get("provider") == "mock":
@@ -347,23 +456,22 @@ AFMS - Advanced Finance Management System
         "content": report_file["content"]
     }]
     
-    # Send email to each recipient
-    success = True
-    for recipient in recipients:
-        result = await send_email(
-            to_email=recipient,
-            subject=subject,
-            body=body,
-            email_config=email_config,
-            html_body=html_body,
-            attachments=attachments,
-            cc=cc_recipients
-        )
-        if not result:
-            success = False
-            logger.error(f"Failed to send email to {recipient}")
+    # Merged schedules send one Bcc email per recipient group instead of one per recipient
+    messages = build_recipient_messages(
+        recipients,
+        subject,
+        body,
+        html_body=html_body,
+        attachments=attachments,
+        cc=cc_recipients,
+        merge_recipients=merge_recipients
+    )
     
-    return success
+    failed_recipients = await send_bulk(email_config, messages)
+    if failed_recipients:
+        logger.error(f"Failed to send email to {', '.join(failed_recipients)}")
+    
+    return not failed_recipients
 
 
 async def _record_execution_history(
@@ -395,13 +503,24 @@ async def _record_execution_history(
     await db.scheduled_report_history.insert_one(history_doc)
 
 
-def _calculate_next_run(schedule: Dict[str, Any]) -> datetime:
-    """Calculate next run time for a schedule"""
+def _calculate_next_run(
+    schedule: Dict[str, Any],
+    now: Optional[datetime] = None,
+    memo: Optional[Dict[tuple, datetime]] = None
+) -> datetime:
+    """Calculate next run time for a schedule, reusing results from memo"""
     from report_scheduling import calculate_next_run
     
-    return calculate_next_run(
-        frequency=schedule["frequency"],
-        time_of_day=schedule["time_of_day"],
-        day_of_week=schedule.get("day_of_week"),
-        day_of_month=schedule.get("day_of_month")
+    key = (
+        schedule["frequency"],
+        schedule["time_of_day"],
+        schedule.get("day_of_week"),
+        schedule.get("day_of_month")
     )
+    if memo is not None and key in memo:
+        return memo[key]
+    
+    next_run = calculate_next_run(*key, now=now)
+    if memo is not None:
+        memo[key] = next_run
+    return next_run
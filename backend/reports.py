@@ -5,6 +5,7 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from enum import Enum
+import asyncio
 import uuid
 from database import database, transactions_collection, accounts_collection, companies_collection
 from auth import get_current_user, log_audit_event
@@ -145,41 +146,12 @@ class GeneralLedgerReport(BaseModel):
     currency: str
     accounts: List[Dict[str, Any]]
 
-@reports_router.get("/trial-balance", response_model=TrialBalanceReport)
-async def generate_trial_balance(
-    as_of_date: Optional[date] = Query(None),
-    format: ReportFormat = ReportFormat.JSON,
-    company_id: Optional[str] = Query(None, description="Filter by company ID (Super Admin only)"),
-    current_user: dict = Depends(get_current_user)
-):
-    """
-    Generate Trial Balance report
-    - Regular users: See only their company's report
-    - Super Admin: See report for any company (specify company_id)
-    """
-    
-    # Check if user is superadmin
-    from rbac import is_superadmin
-    is_super = await is_superadmin(current_user["_id"])
-    
-    # Determine target company
-    target_company_id = current_user["company_id"]
-    if is_super and company_id:
-        target_company_id = company_id
-        logger.info(f"🔍 Super Admin {current_user['email']} generating trial balance for company: {company_id}")
-    elif is_super and not company_id:
-        # Super Admin must specify a company for reports
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Super Admin must specify company_id parameter for reports"
-        )
-    
-    if not as_of_date:
-        as_of_date = date.today()
+async def build_trial_balance_report(company_id: str, as_of_date: date) -> TrialBalanceReport:
+    """Build the Trial Balance for a company as of a date"""
     
     # Get all active accounts
     accounts = await accounts_collection.find({
-        "company_id": target_company_id,
+        "company_id": company_id,
         "is_active": True
     }).sort("account_number", 1).to_list(length=None)
     
@@ -189,7 +161,7 @@ async def generate_trial_balance(
     
     for account in accounts:
         # Calculate balance for each account
-        balance = await calculate_account_balance(account["_id"], target_company_id)
+        balance = await calculate_account_balance(account["_id"], company_id)
         
         account_category = AccountCategory(account.get("account_category", "assets"))
         
@@ -227,26 +199,12 @@ async def generate_trial_balance(
     
     report_id = str(uuid.uuid4())
     
-    # Log audit event
-    await log_audit_event(
-        user_id=current_user["_id"],
-        company_id=target_company_id,
-        action="trial_balance_report_generated",
-        details={
-            "report_id": report_id,
-            "as_of_date": as_of_date.isoformat(),
-            "total_debits": float(total_debits),
-            "total_credits": float(total_credits),
-            "is_balanced": is_balanced
-        }
-    )
-    
     # Get company base currency
-    base_currency = await get_company_base_currency(target_company_id)
+    base_currency = await get_company_base_currency(company_id)
     
     report_data = TrialBalanceReport(
         report_id=report_id,
-        company_id=target_company_id,
+        company_id=company_id,
         report_name=f"Trial Balance as of {as_of_date}",
         as_of_date=as_of_date,
         generated_at=datetime.utcnow(),
@@ -257,35 +215,17 @@ async def generate_trial_balance(
         is_balanced=is_balanced
     )
     
-    # Handle export formats
-    if format == ReportFormat.PDF:
-        from report_exports import ReportExporter
-        report_dict = report_data.dict()
-        report_dict['company_name'] = (await companies_collection.find_one({"_id": target_company_id}))["name"]
-        return ReportExporter.export_to_pdf(report_dict, "trial_balance")
-    elif format == ReportFormat.EXCEL:
-        from report_exports import ReportExporter
-        report_dict = report_data.dict()
-        return ReportExporter.export_to_excel(report_dict, "trial_balance")
-    elif format == ReportFormat.CSV:
-        from report_exports import ReportExporter
-        report_dict = report_data.dict()
-        return ReportExporter.export_to_csv(report_dict, "trial_balance")
-    
     return report_data
 
-@reports_router.get("/general-ledger", response_model=GeneralLedgerReport)
-async def generate_general_ledger(
-    period: ReportPeriod = ReportPeriod.CURRENT_MONTH,
-    start_date: Optional[date] = Query(None),
-    end_date: Optional[date] = Query(None),
-    account_id: Optional[str] = Query(None),
+@reports_router.get("/trial-balance", response_model=TrialBalanceReport)
+async def generate_trial_balance(
+    as_of_date: Optional[date] = Query(None),
     format: ReportFormat = ReportFormat.JSON,
     company_id: Optional[str] = Query(None, description="Filter by company ID (Super Admin only)"),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Generate General Ledger report (detailed transaction listing by account)
+    Generate Trial Balance report
     - Regular users: See only their company's report
     - Super Admin: See report for any company (specify company_id)
     """
@@ -298,18 +238,60 @@ async def generate_general_ledger(
     target_company_id = current_user["company_id"]
     if is_super and company_id:
         target_company_id = company_id
-        logger.info(f"🔍 Super Admin {current_user['email']} generating general ledger for company: {company_id}")
+        logger.info(f"🔍 Super Admin {current_user['email']} generating trial balance for company: {company_id}")
     elif is_super and not company_id:
+        # Super Admin must specify a company for reports
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Super Admin must specify company_id parameter for reports"
         )
     
-    # Get period dates
-    period_start, period_end = get_period_dates(period, start_date, end_date)
+    if not as_of_date:
+        as_of_date = date.today()
+    
+    report_data = await build_trial_balance_report(target_company_id, as_of_date)
+    
+    # Log audit event
+    await log_audit_event(
+        user_id=current_user["_id"],
+        company_id=target_company_id,
+        action="trial_balance_report_generated",
+        details={
+            "report_id": report_data.report_id,
+            "as_of_date": as_of_date.isoformat(),
+            "total_debits": float(report_data.total_debits),
+            "total_credits": float(report_data.total_credits),
+            "is_balanced": report_data.is_balanced
+        }
+    )
+    
+    # Handle export formats
+    if format == ReportFormat.PDF:
+        from report_exports import ReportExporter
+        report_dict = report_data.dict()
+        report_dict['company_name'] = (await companies_collection.find_one({"_id": target_company_id}))["name"]
+        return await asyncio.to_thread(ReportExporter.export_to_pdf, report_dict, "trial_balance")
+    elif format == ReportFormat.EXCEL:
+        from report_exports import ReportExporter
+        report_dict = report_data.dict()
+        return await asyncio.to_thread(ReportExporter.export_to_excel, report_dict, "trial_balance")
+    elif format == ReportFormat.CSV:
+        from report_exports import ReportExporter
+        report_dict = report_data.dict()
+        return await asyncio.to_thread(ReportExporter.export_to_csv, report_dict, "trial_balance")
+    
+    return report_data
+
+async def build_general_ledger_report(
+    company_id: str,
+    period_start: datetime,
+    period_end: datetime,
+    account_id: Optional[str] = None
+) -> GeneralLedgerReport:
+    """Build the General Ledger for a company over a period, optionally for one account"""
     
     # Get accounts to include in report
-    account_query = {"company_id": target_company_id, "is_active": True}
+    account_query = {"company_id": company_id, "is_active": True}
     if account_id:
         account_query["_id"] = account_id
     
@@ -323,7 +305,7 @@ async def generate_general_ledger(
         opening_balance_pipeline = [
             {
                 "$match": {
-                    "company_id": target_company_id,
+                    "company_id": company_id,
                     "transaction_date": {"$lt": period_start},
                     "status": {"$ne": "void"},
                     "journal_entries.account_id": account["_id"]
@@ -381,7 +363,7 @@ async def generate_general_ledger(
         pipeline = [
             {
                 "$match": {
-                    "company_id": target_company_id,
+                    "company_id": company_id,
                     "transaction_date": {"$gte": period_start, "$lte": period_end},
                     "status": {"$ne": "void"},
                     "journal_entries.account_id": account["_id"]
@@ -447,25 +429,12 @@ async def generate_general_ledger(
     
     report_id = str(uuid.uuid4())
     
-    # Log audit event
-    await log_audit_event(
-        user_id=current_user["_id"],
-        company_id=target_company_id,
-        action="general_ledger_report_generated",
-        details={
-            "report_id": report_id,
-            "period_start": period_start.isoformat(),
-            "period_end": period_end.isoformat(),
-            "account_count": len(account_ledgers)
-        }
-    )
-    
     # Get company base currency
-    base_currency = await get_company_base_currency(current_user["company_id"])
+    base_currency = await get_company_base_currency(company_id)
     
     report_data = GeneralLedgerReport(
         report_id=report_id,
-        company_id=target_company_id,
+        company_id=company_id,
         report_name=f"General Ledger - {period_start.date()} to {period_end.date()}",
         period_start=period_start.date() if isinstance(period_start, datetime) else period_start,
         period_end=period_end.date() if isinstance(period_end, datetime) else period_end,
@@ -474,20 +443,71 @@ async def generate_general_ledger(
         accounts=account_ledgers
     )
     
+    return report_data
+
+@reports_router.get("/general-ledger", response_model=GeneralLedgerReport)
+async def generate_general_ledger(
+    period: ReportPeriod = ReportPeriod.CURRENT_MONTH,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    account_id: Optional[str] = Query(None),
+    format: ReportFormat = ReportFormat.JSON,
+    company_id: Optional[str] = Query(None, description="Filter by company ID (Super Admin only)"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Generate General Ledger report (detailed transaction listing by account)
+    - Regular users: See only their company's report
+    - Super Admin: See report for any company (specify company_id)
+    """
+    
+    # Check if user is superadmin
+    from rbac import is_superadmin
+    is_super = await is_superadmin(current_user["_id"])
+    
+    # Determine target company
+    target_company_id = current_user["company_id"]
+    if is_super and company_id:
+        target_company_id = company_id
+        logger.info(f"🔍 Super Admin {current_user['email']} generating general ledger for company: {company_id}")
+    elif is_super and not company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Super Admin must specify company_id parameter for reports"
+        )
+    
+    # Get period dates
+    period_start, period_end = get_period_dates(period, start_date, end_date)
+    
+    report_data = await build_general_ledger_report(target_company_id, period_start, period_end, account_id)
+    
+    # Log audit event
+    await log_audit_event(
+        user_id=current_user["_id"],
+        company_id=target_company_id,
+        action="general_ledger_report_generated",
+        details={
+            "report_id": report_data.report_id,
+            "period_start": period_start.isoformat(),
+            "period_end": period_end.isoformat(),
+            "account_count": len(report_data.accounts)
+        }
+    )
+    
     # Handle export formats
     if format == ReportFormat.PDF:
         from report_exports import ReportExporter
         report_dict = report_data.dict()
         report_dict['company_name'] = (await companies_collection.find_one({"_id": current_user["company_id"]}))["name"]
-        return ReportExporter.export_to_pdf(report_dict, "general_ledger")
+        return await asyncio.to_thread(ReportExporter.export_to_pdf, report_dict, "general_ledger")
     elif format == ReportFormat.EXCEL:
         from report_exports import ReportExporter
         report_dict = report_data.dict()
-        return ReportExporter.export_to_excel(report_dict, "general_ledger")
+        return await asyncio.to_thread(ReportExporter.export_to_excel, report_dict, "general_ledger")
     elif format == ReportFormat.CSV:
         from report_exports import ReportExporter
         report_dict = report_data.dict()
-        return ReportExporter.export_to_csv(report_dict, "general_ledger")
+        return await asyncio.to_thread(ReportExporter.export_to_csv, report_dict, "general_ledger")
     
     return report_data
 
@@ -537,42 +557,12 @@ def get_period_dates(period: ReportPeriod, custom_start: Optional[date] = None,
     
     return start_date, end_date
 
-@reports_router.get("/profit-loss", response_model=ProfitLossReport)
-async def generate_profit_loss_report(
-    period: ReportPeriod = ReportPeriod.CURRENT_MONTH,
-    start_date: Optional[date] = Query(None),
-    end_date: Optional[date] = Query(None),
-    format: ReportFormat = ReportFormat.JSON,
-    company_id: Optional[str] = Query(None, description="Filter by company ID (Super Admin only)"),
-    current_user: dict = Depends(get_current_user)
-):
-    """
-    Generate Profit & Loss statement
-    - Regular users: See only their company's report
-    - Super Admin: See report for any company (specify company_id)
-    """
-    
-    # Check if user is superadmin
-    from rbac import is_superadmin
-    is_super = await is_superadmin(current_user["_id"])
-    
-    # Determine target company
-    target_company_id = current_user["company_id"]
-    if is_super and company_id:
-        target_company_id = company_id
-        logger.info(f"🔍 Super Admin {current_user['email']} generating P&L for company: {company_id}")
-    elif is_super and not company_id:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Super Admin must specify company_id parameter for reports"
-        )
-    
-    # Get period dates
-    period_start, period_end = get_period_dates(period, start_date, end_date)
+async def build_profit_loss_report(company_id: str, period_start: datetime, period_end: datetime) -> ProfitLossReport:
+    """Build the Profit & Loss statement for a company over a period"""
     
     # Get all income and expense accounts
     income_accounts = await accounts_collection.find({
-        "company_id": target_company_id,
+        "company_id": company_id,
         "account_type": {"$in": [
             AccountType.REVENUE.value,
             AccountType.SERVICE_INCOME.value,
@@ -583,7 +573,7 @@ async def generate_profit_loss_report(
     }).to_list(length=None)
     
     expense_accounts = await accounts_collection.find({
-        "company_id": target_company_id,
+        "company_id": company_id,
         "account_type": {"$in": [
             AccountType.COST_OF_GOODS_SOLD.value,
             AccountType.OPERATING_EXPENSES.value,
@@ -615,7 +605,7 @@ async def generate_profit_loss_report(
         pipeline = [
             {
                 "$match": {
-                    "company_id": target_company_id,
+                    "company_id": company_id,
                     "transaction_date": {"$gte": period_start, "$lte": period_end},
                     "status": {"$ne": "void"},
                     "journal_entries.account_id": account["_id"]
@@ -678,7 +668,7 @@ async def generate_profit_loss_report(
         pipeline = [
             {
                 "$match": {
-                    "company_id": target_company_id,
+                    "company_id": company_id,
                     "transaction_date": {"$gte": period_start, "$lte": period_end},
                     "status": {"$ne": "void"},
                     "journal_entries.account_id": account["_id"]
@@ -738,27 +728,12 @@ async def generate_profit_loss_report(
     
     report_id = str(uuid.uuid4())
     
-    # Log audit event
-    await log_audit_event(
-        user_id=current_user["_id"],
-        company_id=target_company_id,
-        action="profit_loss_report_generated",
-        details={
-            "report_id": report_id,
-            "period_start": period_start.isoformat(),
-            "period_end": period_end.isoformat(),
-            "total_revenue": float(total_revenue),
-            "total_expenses": float(total_expenses),
-            "net_income": float(net_income)
-        }
-    )
-    
     # Get company base currency
-    base_currency = await get_company_base_currency(current_user["company_id"])
+    base_currency = await get_company_base_currency(company_id)
     
     report_data = ProfitLossReport(
         report_id=report_id,
-        company_id=target_company_id,
+        company_id=company_id,
         report_name=f"Profit & Loss Statement - {period_start} to {period_end}",
         period_start=period_start.date() if isinstance(period_start, datetime) else period_start,
         period_end=period_end.date() if isinstance(period_end, datetime) else period_end,
@@ -772,32 +747,19 @@ async def generate_profit_loss_report(
         net_income=net_income
     )
     
-    # Handle export formats
-    if format == ReportFormat.PDF:
-        from report_exports import ReportExporter
-        report_dict = report_data.dict()
-        report_dict['company_name'] = (await companies_collection.find_one({"_id": current_user["company_id"]}))["name"]
-        return ReportExporter.export_to_pdf(report_dict, "profit_loss")
-    elif format == ReportFormat.EXCEL:
-        from report_exports import ReportExporter
-        report_dict = report_data.dict()
-        return ReportExporter.export_to_excel(report_dict, "profit_loss")
-    elif format == ReportFormat.CSV:
-        from report_exports import ReportExporter
-        report_dict = report_data.dict()
-        return ReportExporter.export_to_csv(report_dict, "profit_loss")
-    
     return report_data
 
-@reports_router.get("/balance-sheet", response_model=BalanceSheetReport)
-async def generate_balance_sheet_report(
-    as_of_date: Optional[date] = Query(None),
+@reports_router.get("/profit-loss", response_model=ProfitLossReport)
+async def generate_profit_loss_report(
+    period: ReportPeriod = ReportPeriod.CURRENT_MONTH,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
     format: ReportFormat = ReportFormat.JSON,
     company_id: Optional[str] = Query(None, description="Filter by company ID (Super Admin only)"),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Generate Balance Sheet report
+    Generate Profit & Loss statement
     - Regular users: See only their company's report
     - Super Admin: See report for any company (specify company_id)
     """
@@ -810,19 +772,56 @@ async def generate_balance_sheet_report(
     target_company_id = current_user["company_id"]
     if is_super and company_id:
         target_company_id = company_id
-        logger.info(f"🔍 Super Admin {current_user['email']} generating balance sheet for company: {company_id}")
+        logger.info(f"🔍 Super Admin {current_user['email']} generating P&L for company: {company_id}")
     elif is_super and not company_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Super Admin must specify company_id parameter for reports"
         )
     
-    if not as_of_date:
-        as_of_date = date.today()
+    # Get period dates
+    period_start, period_end = get_period_dates(period, start_date, end_date)
+    
+    report_data = await build_profit_loss_report(target_company_id, period_start, period_end)
+    
+    # Log audit event
+    await log_audit_event(
+        user_id=current_user["_id"],
+        company_id=target_company_id,
+        action="profit_loss_report_generated",
+        details={
+            "report_id": report_data.report_id,
+            "period_start": period_start.isoformat(),
+            "period_end": period_end.isoformat(),
+            "total_revenue": float(report_data.total_revenue),
+            "total_expenses": float(report_data.total_expenses),
+            "net_income": float(report_data.net_income)
+        }
+    )
+    
+    # Handle export formats
+    if format == ReportFormat.PDF:
+        from report_exports import ReportExporter
+        report_dict = report_data.dict()
+        report_dict['company_name'] = (await companies_collection.find_one({"_id": current_user["company_id"]}))["name"]
+        return await asyncio.to_thread(ReportExporter.export_to_pdf, report_dict, "profit_loss")
+    elif format == ReportFormat.EXCEL:
+        from report_exports import ReportExporter
+        report_dict = report_data.dict()
+        return await asyncio.to_thread(ReportExporter.export_to_excel, report_dict, "profit_loss")
+    elif format == ReportFormat.CSV:
+        from report_exports import ReportExporter
+        report_dict = report_data.dict()
+        return await asyncio.to_thread(ReportExporter.export_to_csv, report_dict, "profit_loss")
+    
+    return report_data
+
+async def build_balance_sheet_report(company_id: str, as_of_date: date) -> BalanceSheetReport:
+    """Build the Balance Sheet for a company as of a date"""
     
     # Get all balance sheet accounts
     asset_accounts = await accounts_collection.find({
-        "company_id": target_company_id,
+        "company_id": company_id,
         "account_type": {"$in": [
             AccountType.CASH.value,
             AccountType.CHECKING.value,
@@ -837,7 +836,7 @@ async def generate_balance_sheet_report(
     }).to_list(length=None)
     
     liability_accounts = await accounts_collection.find({
-        "company_id": target_company_id,
+        "company_id": company_id,
         "account_type": {"$in": [
             AccountType.ACCOUNTS_PAYABLE.value,
             AccountType.CREDIT_CARD.value,
@@ -850,7 +849,7 @@ async def generate_balance_sheet_report(
     }).to_list(length=None)
     
     equity_accounts = await accounts_collection.find({
-        "company_id": target_company_id,
+        "company_id": company_id,
         "account_type": {"$in": [
             AccountType.OWNER_EQUITY.value,
             AccountType.RETAINED_EARNINGS.value,
@@ -865,7 +864,7 @@ async def generate_balance_sheet_report(
     current_assets = Decimal("0")
     
     for account in asset_accounts:
-        balance = await calculate_account_balance(account["_id"], current_user["company_id"])
+        balance = await calculate_account_balance(account["_id"], company_id)
         
         # Determine if current or non-current asset
         is_current_asset = account["account_type"] in [
@@ -897,7 +896,7 @@ async def generate_balance_sheet_report(
     current_liabilities = Decimal("0")
     
     for account in liability_accounts:
-        balance = await calculate_account_balance(account["_id"], current_user["company_id"])
+        balance = await calculate_account_balance(account["_id"], company_id)
         
         # Determine if current or long-term liability
         is_current_liability = account["account_type"] in [
@@ -926,7 +925,7 @@ async def generate_balance_sheet_report(
     total_equity = Decimal("0")
     
     for account in equity_accounts:
-        balance = await calculate_account_balance(account["_id"], current_user["company_id"])
+        balance = await calculate_account_balance(account["_id"], company_id)
         
         equity_data.append({
             "account_id": account["_id"],
@@ -946,27 +945,12 @@ async def generate_balance_sheet_report(
     
     report_id = str(uuid.uuid4())
     
-    # Log audit event
-    await log_audit_event(
-        user_id=current_user["_id"],
-        company_id=target_company_id,
-        action="balance_sheet_report_generated",
-        details={
-            "report_id": report_id,
-            "as_of_date": as_of_date.isoformat(),
-            "total_assets": float(total_assets),
-            "total_liabilities": float(total_liabilities),
-            "total_equity": float(total_equity),
-            "is_balanced": is_balanced
-        }
-    )
-    
     # Get company base currency
-    base_currency = await get_company_base_currency(current_user["company_id"])
+    base_currency = await get_company_base_currency(company_id)
     
     report_data = BalanceSheetReport(
         report_id=report_id,
-        company_id=target_company_id,
+        company_id=company_id,
         report_name=f"Balance Sheet as of {as_of_date}",
         as_of_date=as_of_date,
         generated_at=datetime.utcnow(),
@@ -985,34 +969,17 @@ async def generate_balance_sheet_report(
         is_balanced=is_balanced
     )
     
-    # Handle export formats
-    if format == ReportFormat.PDF:
-        from report_exports import ReportExporter
-        report_dict = report_data.dict()
-        report_dict['company_name'] = (await companies_collection.find_one({"_id": current_user["company_id"]}))["name"]
-        return ReportExporter.export_to_pdf(report_dict, "balance_sheet")
-    elif format == ReportFormat.EXCEL:
-        from report_exports import ReportExporter
-        report_dict = report_data.dict()
-        return ReportExporter.export_to_excel(report_dict, "balance_sheet")
-    elif format == ReportFormat.CSV:
-        from report_exports import ReportExporter
-        report_dict = report_data.dict()
-        return ReportExporter.export_to_csv(report_dict, "balance_sheet")
-    
     return report_data
 
-@reports_router.get("/cash-flow", response_model=CashFlowReport)
-async def generate_cash_flow_report(
-    period: ReportPeriod = ReportPeriod.CURRENT_MONTH,
-    start_date: Optional[date] = Query(None),
-    end_date: Optional[date] = Query(None),
+@reports_router.get("/balance-sheet", response_model=BalanceSheetReport)
+async def generate_balance_sheet_report(
+    as_of_date: Optional[date] = Query(None),
     format: ReportFormat = ReportFormat.JSON,
     company_id: Optional[str] = Query(None, description="Filter by company ID (Super Admin only)"),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Generate Cash Flow statement (simplified direct method)
+    Generate Balance Sheet report
     - Regular users: See only their company's report
     - Super Admin: See report for any company (specify company_id)
     """
@@ -1025,22 +992,59 @@ async def generate_cash_flow_report(
     target_company_id = current_user["company_id"]
     if is_super and company_id:
         target_company_id = company_id
-        logger.info(f"🔍 Super Admin {current_user['email']} generating cash flow for company: {company_id}")
+        logger.info(f"🔍 Super Admin {current_user['email']} generating balance sheet for company: {company_id}")
     elif is_super and not company_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Super Admin must specify company_id parameter for reports"
         )
     
-    # Get period dates
-    period_start, period_end = get_period_dates(period, start_date, end_date)
+    if not as_of_date:
+        as_of_date = date.today()
+    
+    report_data = await build_balance_sheet_report(target_company_id, as_of_date)
+    
+    # Log audit event
+    await log_audit_event(
+        user_id=current_user["_id"],
+        company_id=target_company_id,
+        action="balance_sheet_report_generated",
+        details={
+            "report_id": report_data.report_id,
+            "as_of_date": as_of_date.isoformat(),
+            "total_assets": float(report_data.total_assets),
+            "total_liabilities": float(report_data.total_liabilities),
+            "total_equity": float(report_data.total_equity),
+            "is_balanced": report_data.is_balanced
+        }
+    )
+    
+    # Handle export formats
+    if format == ReportFormat.PDF:
+        from report_exports import ReportExporter
+        report_dict = report_data.dict()
+        report_dict['company_name'] = (await companies_collection.find_one({"_id": current_user["company_id"]}))["name"]
+        return await asyncio.to_thread(ReportExporter.export_to_pdf, report_dict, "balance_sheet")
+    elif format == ReportFormat.EXCEL:
+        from report_exports import ReportExporter
+        report_dict = report_data.dict()
+        return await asyncio.to_thread(ReportExporter.export_to_excel, report_dict, "balance_sheet")
+    elif format == ReportFormat.CSV:
+        from report_exports import ReportExporter
+        report_dict = report_data.dict()
+        return await asyncio.to_thread(ReportExporter.export_to_csv, report_dict, "balance_sheet")
+    
+    return report_data
+
+async def build_cash_flow_report(company_id: str, period_start: datetime, period_end: datetime) -> CashFlowReport:
+    """Build the Cash Flow statement (simplified direct method) for a company over a period"""
     
     # This is a simplified cash flow calculation
     # In practice, you'd need more sophisticated categorization of cash flows
     
     # Get cash accounts
     cash_accounts = await accounts_collection.find({
-        "company_id": target_company_id,
+        "company_id": company_id,
         "account_type": {"$in": [
             AccountType.CASH.value,
             AccountType.CHECKING.value,
@@ -1056,11 +1060,11 @@ async def generate_cash_flow_report(
     for account in cash_accounts:
         # Calculate balance at beginning of period
         # This is simplified - you'd need to calculate historical balances properly
-        current_balance = await calculate_account_balance(account["_id"], current_user["company_id"])
+        current_balance = await calculate_account_balance(account["_id"], company_id)
         ending_cash += current_balance
     
     # Get net income from P&L for the period
-    pl_report = await generate_profit_loss_report(period, start_date, end_date, ReportFormat.JSON, current_user)
+    pl_report = await build_profit_loss_report(company_id, period_start, period_end)
     net_income = pl_report.net_income
     
     # Operating activities (simplified)
@@ -1094,26 +1098,12 @@ async def generate_cash_flow_report(
     
     report_id = str(uuid.uuid4())
     
-    # Log audit event
-    await log_audit_event(
-        user_id=current_user["_id"],
-        company_id=target_company_id,
-        action="cash_flow_report_generated",
-        details={
-            "report_id": report_id,
-            "period_start": period_start.isoformat(),
-            "period_end": period_end.isoformat(),
-            "net_change_in_cash": float(net_change_in_cash),
-            "ending_cash": float(ending_cash)
-        }
-    )
-    
     # Get company base currency
-    base_currency = await get_company_base_currency(current_user["company_id"])
+    base_currency = await get_company_base_currency(company_id)
     
     report_data = CashFlowReport(
         report_id=report_id,
-        company_id=target_company_id,
+        company_id=company_id,
         report_name=f"Cash Flow Statement - {period_start} to {period_end}",
         period_start=period_start.date() if isinstance(period_start, datetime) else period_start,
         period_end=period_end.date() if isinstance(period_end, datetime) else period_end,
@@ -1131,20 +1121,71 @@ async def generate_cash_flow_report(
         ending_cash=ending_cash
     )
     
+    return report_data
+
+@reports_router.get("/cash-flow", response_model=CashFlowReport)
+async def generate_cash_flow_report(
+    period: ReportPeriod = ReportPeriod.CURRENT_MONTH,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    format: ReportFormat = ReportFormat.JSON,
+    company_id: Optional[str] = Query(None, description="Filter by company ID (Super Admin only)"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Generate Cash Flow statement (simplified direct method)
+    - Regular users: See only their company's report
+    - Super Admin: See report for any company (specify company_id)
+    """
+    
+    # Check if user is superadmin
+    from rbac import is_superadmin
+    is_super = await is_superadmin(current_user["_id"])
+    
+    # Determine target company
+    target_company_id = current_user["company_id"]
+    if is_super and company_id:
+        target_company_id = company_id
+        logger.info(f"🔍 Super Admin {current_user['email']} generating cash flow for company: {company_id}")
+    elif is_super and not company_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Super Admin must specify company_id parameter for reports"
+        )
+    
+    # Get period dates
+    period_start, period_end = get_period_dates(period, start_date, end_date)
+    
+    report_data = await build_cash_flow_report(target_company_id, period_start, period_end)
+    
+    # Log audit event
+    await log_audit_event(
+        user_id=current_user["_id"],
+        company_id=target_company_id,
+        action="cash_flow_report_generated",
+        details={
+            "report_id": report_data.report_id,
+            "period_start": period_start.isoformat(),
+            "period_end": period_end.isoformat(),
+            "net_change_in_cash": float(report_data.net_change_in_cash),
+            "ending_cash": float(report_data.beginning_cash + report_data.net_change_in_cash)
+        }
+    )
+    
     # Handle export formats
     if format == ReportFormat.PDF:
         from report_exports import ReportExporter
         report_dict = report_data.dict()
         report_dict['company_name'] = (await companies_collection.find_one({"_id": current_user["company_id"]}))["name"]
-        return ReportExporter.export_to_pdf(report_dict, "cash_flow")
+        return await asyncio.to_thread(ReportExporter.export_to_pdf, report_dict, "cash_flow")
     elif format == ReportFormat.EXCEL:
         from report_exports import ReportExporter
         report_dict = report_data.dict()
-        return ReportExporter.export_to_excel(report_dict, "cash_flow")
+        return await asyncio.to_thread(ReportExporter.export_to_excel, report_dict, "cash_flow")
     elif format == ReportFormat.CSV:
         from report_exports import ReportExporter
         report_dict = report_data.dict()
-        return ReportExporter.export_to_csv(report_dict, "cash_flow")
+        return await asyncio.to_thread(ReportExporter.export_to_csv, report_dict, "cash_flow")
     
     return report_data
 
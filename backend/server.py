@@ -2,7 +2,7 @@ from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import Response
+from fastapi.responses import Response, ORJSONResponse
 import asyncio
 import os
 from dotenv import load_dotenv
@@ -11,6 +11,7 @@ from datetime import datetime, timedelta
 from typing import Optional, List
 import uuid
 import json
+from pymongo import IndexModel
 from database import client, database, users_collection, companies_collection, accounts_collection, transactions_collection, documents_collection, audit_logs_collection
 
 # Load environment variables
@@ -90,6 +91,8 @@ async def ensure_rbac_initialized():
                         "assigned_at": datetime.utcnow(),
                         "assigned_by": "system"
                     })
+                    from permission_cache import permission_cache
+                    permission_cache.invalidate_user(superadmin_user["_id"])
                     logger.info("✅ Assigned superadmin role to superadmin user")
                 
                 logger.info("🔑 Superadmin login: superadmin@afms.system / admin123")
@@ -107,7 +110,8 @@ async def ensure_rbac_initialized():
 app = FastAPI(
     title="Advanced Finance Management System",
     description="Enterprise-grade finance management with ML-powered document processing",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware - MUST be added before mounting and including routers
@@ -201,6 +205,13 @@ async def startup_event():
         await users_collection.create_index("email", unique=True)
         await users_collection.create_index("company_id")
         await transactions_collection.create_index([("company_id", 1), ("transaction_date", -1)])
+        # Reconciliation candidate lookup: unreconciled transactions in a date range
+        await transactions_collection.create_index([
+            ("company_id", 1),
+            ("is_reconciled", 1),
+            ("transaction_date", 1),
+            ("amount", 1)
+        ])
         await documents_collection.create_index([("company_id", 1), ("created_at", -1)])
         await audit_logs_collection.create_index([("company_id", 1), ("timestamp", -1)])
         
@@ -223,8 +234,23 @@ async def startup_event():
         await bank_transactions_collection.create_index([("connection_id", 1), ("imported", 1)])
         await payment_transactions_collection.create_index([("company_id", 1), ("created_at", -1)])
         await payment_transactions_collection.create_index("session_id")
-        await invoices_collection.create_index([("company_id", 1), ("invoice_date", -1)])
-        await invoices_collection.create_index([("company_id", 1), ("payment_status", 1)])
+        await invoices_collection.create_indexes([
+            IndexModel(
+                [("company_id", 1), ("invoice_id", 1)],
+                unique=True,
+                partialFilterExpression={"invoice_id": {"$type": "string"}}
+            ),
+            IndexModel([("company_id", 1), ("invoice_date", -1)]),
+            IndexModel([("company_id", 1), ("payment_status", 1), ("due_date", 1)]),
+            IndexModel([("company_id", 1), ("status", 1)])
+        ])
+        try:
+            await invoices_collection.create_index(
+                [("company_id", 1), ("invoice_number", 1)],
+                unique=True
+            )
+        except Exception as e:
+            logger.warning(f"⚠️  Could not create unique invoice number index (duplicate invoice numbers?): {e}")
         
         # Phase 14: Integration & Report Scheduling indexes
         from database import (
@@ -233,11 +259,44 @@ async def startup_event():
             scheduled_report_history_collection
         )
         await integrations_collection.create_index("company_id", unique=True)
-        await report_schedules_collection.create_index([("company_id", 1), ("enabled", 1)])
-        await report_schedules_collection.create_index("schedule_id", unique=True)
-        await report_schedules_collection.create_index([("next_run", 1), ("enabled", 1)])
+        await integrations_collection.create_index([("company_id", 1), ("integration_type", 1)])
+        await report_schedules_collection.create_indexes([
+            IndexModel("schedule_id", unique=True),
+            IndexModel([("company_id", 1), ("schedule_id", 1)], unique=True),
+            IndexModel([("company_id", 1), ("enabled", 1), ("next_run", 1)]),
+            # Serves list_schedules' newest-first pages without an in-memory sort
+            IndexModel([("company_id", 1), ("created_at", -1)]),
+            IndexModel([("enabled", 1), ("next_run", 1)], name="idx_due_schedules")
+        ])
+        try:
+            await report_schedules_collection.create_index(
+                [("company_id", 1), ("name", 1)],
+                unique=True
+            )
+        except Exception as e:
+            logger.warning(f"⚠️  Could not create unique report schedule name index (duplicate schedule names?): {e}")
         await scheduled_report_history_collection.create_index([("schedule_id", 1), ("executed_at", -1)])
         
+        # Phase 15: Reconciliation indexes
+        from database import (
+            reconciliation_sessions_collection,
+            reconciliation_bank_entries_collection,
+            reconciliation_matches_collection
+        )
+        # Session lookups by _id are served by the default _id index; listing filters by company
+        await reconciliation_sessions_collection.create_index([("company_id", 1), ("created_at", -1)])
+        await reconciliation_bank_entries_collection.create_index([("session_id", 1), ("position", 1)])
+        await reconciliation_bank_entries_collection.create_index([("session_id", 1), ("matched", 1), ("position", 1)])
+        # Its session_id prefix also serves the per-session match reads and deletes
+        try:
+            await reconciliation_matches_collection.create_index(
+                [("session_id", 1), ("bank_entry_id", 1)],
+                unique=True
+            )
+        except Exception as e:
+            logger.warning(f"⚠️  Could not create unique reconciliation match index (duplicate matches?): {e}")
+            await reconciliation_matches_collection.create_index([("session_id", 1), ("bank_entry_id", 1)])
+        
         # RBAC indexes
         from database import (
             permissions_collection,
@@ -255,6 +314,10 @@ async def startup_event():
         await menus_collection.create_index([("name", 1)], unique=True)
         await menus_collection.create_index([("parent_id", 1), ("order", 1)])
         
+        # Audit events are written in batches by a background task
+        from auth import start_audit_log_writer
+        start_audit_log_writer()
+        
         # Initialize RBAC and ensure superadmin exists
         logger.info("🛡️  Ensuring RBAC system is initialized...")
         await ensure_rbac_initialized()
@@ -272,7 +335,7 @@ async def startup_event():
             from report_tasks import celery_app
             # Ping Celery
             celery_app.control.inspect().ping()
-            celery_status = "✅ Active (Celery worker running, checks every 5 minutes)"
+            celery_status = "✅ Active (Celery worker running, checks every minute)"
         except:
             pass
         
@@ -302,6 +365,13 @@ async def shutdown_event():
     except Exception as e:
         logger.error(f"Error stopping currency scheduler: {e}")
     
+    # Flush pending audit events before closing the database connection
+    try:
+        from auth import stop_audit_log_writer
+        await stop_audit_log_writer()
+    except Exception as e:
+        logger.error(f"Error stopping audit log writer: {e}")
+    
     client.close()
 
 @app.get("/api/health")
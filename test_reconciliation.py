@@ -10,11 +10,13 @@ import io
 sys.path.insert(0, '/app/backend')
 
 from motor.motor_asyncio import AsyncIOMotorClient
+import reconciliation
 from reconciliation import (
     parse_csv_statement,
     parse_ofx_statement,
     calculate_match_confidence,
-    find_matching_transactions
+    find_matching_transactions,
+    score_matches
 )
 
 # MongoDB connection
@@ -114,6 +116,76 @@ async def test_ofx_parsing():
         print(f"❌ OFX parsing failed: {str(e)}")
         return False
 
+async def test_sgml_ofx_parsing():
+    """Test SGML (OFX 1.x) statement parsing keeps statement order"""
+    print("\n🧪 Testing SGML OFX Statement Parsing...")
+    
+    # OFX 1.x leaves field tags unclosed; only aggregates like STMTTRN close
+    ofx_content = """OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+SECURITY:NONE
+ENCODING:USASCII
+CHARSET:1252
+COMPRESSION:NONE
+OLDFILEUID:NONE
+NEWFILEUID:NONE
+
+<OFX>
+<BANKMSGSRSV1>
+<STMTTRNRS>
+<TRNUID>1
+<STMTRS>
+<CURDEF>USD
+<BANKTRANLIST>
+<DTSTART>20251001
+<DTEND>20251031
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20251002120000
+<TRNAMT>-125.50
+<FITID>TXN001
+<NAME>Amazon.com
+<MEMO>Online Purchase
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20251003090000
+<TRNAMT>3000.00
+<FITID>TXN002
+<NAME>Payroll Deposit
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20251004
+<TRNAMT>-85.25
+<FITID>TXN003
+<NAME>Electric Bill
+</STMTTRN>
+</BANKTRANLIST>
+</STMTRS>
+</STMTTRNRS>
+</BANKMSGSRSV1>
+</OFX>"""
+    
+    try:
+        entries = parse_ofx_statement(ofx_content)
+        print(f"✅ Parsed {len(entries)} entries from SGML OFX")
+        
+        for entry in entries:
+            print(f"   - {entry['date']}: {entry['description']} = ${entry['amount']}")
+        
+        assert [entry['reference'] for entry in entries] == ['TXN001', 'TXN002', 'TXN003'], \
+            "Entries should come back in statement order"
+        assert entries[0]['description'] == 'Amazon.com - Online Purchase'
+        assert [entry['amount'] for entry in entries] == [-125.50, 3000.00, -85.25]
+        assert entries[2]['date'] == date(2025, 10, 4)
+        
+        return True
+    except Exception as e:
+        print(f"❌ SGML OFX parsing failed: {str(e)}")
+        return False
+
 async def test_matching_algorithm():
     """Test transaction matching algorithm"""
     print("\n🧪 Testing Matching Algorithm...")
@@ -179,6 +251,85 @@ async def test_matching_algorithm():
     
     return all_passed
 
+def build_scoring_fixture():
+    """Bank entries and system transactions with known match scores"""
+    bank_entries = [
+        {'date': date(2025, 10, 2), 'description': 'Amazon Purchase', 'amount': -125.50},
+        {'date': date(2025, 10, 10), 'description': 'Coffee Shop', 'amount': -4.75},
+    ]
+    system_transactions = [
+        {'_id': 'TXN-AMZ', 'transaction_date': datetime(2025, 10, 2), 'description': 'Amazon.com Purchase', 'amount': 125.50},
+        {'_id': 'TXN-AMZ-CENT', 'transaction_date': datetime(2025, 10, 3), 'description': 'Amazon', 'amount': 125.51},
+        {'_id': 'TXN-ELEC', 'transaction_date': datetime(2025, 10, 6), 'description': 'Electric Bill', 'amount': 125.50},
+        # Outside both the amount and the date window of every bank entry
+        {'_id': 'TXN-FAR', 'transaction_date': datetime(2025, 10, 20), 'description': 'Amazon Purchase', 'amount': 999.00},
+    ]
+    # Seven same-amount candidates, one day apart, so only the top 5 are kept
+    for offset in range(7):
+        system_transactions.append({
+            '_id': f'TXN-COFFEE-{offset}',
+            'transaction_date': datetime(2025, 10, 10) + timedelta(days=offset),
+            'description': 'Coffee Shop',
+            'amount': 4.75
+        })
+    return bank_entries, system_transactions
+
+async def test_score_matches():
+    """Test match scoring pins the top suggestions with and without RapidFuzz"""
+    print("\n🧪 Testing Match Scoring...")
+    
+    # Description similarity is the only part that depends on RapidFuzz
+    expected = {
+        True: [('TXN-AMZ', 1.0), ('TXN-AMZ-CENT', 0.8), ('TXN-ELEC', 0.643)],
+        False: [('TXN-AMZ', 0.933), ('TXN-AMZ-CENT', 0.7), ('TXN-ELEC', 0.6)],
+    }
+    expected_coffee = [
+        ('TXN-COFFEE-0', 1.0),
+        ('TXN-COFFEE-1', 0.9),
+        ('TXN-COFFEE-2', 0.9),
+        ('TXN-COFFEE-3', 0.8),
+        ('TXN-COFFEE-4', 0.8),
+    ]
+    
+    has_rapidfuzz = reconciliation.HAS_RAPIDFUZZ
+    modes = [True, False] if has_rapidfuzz else [False]
+    if not has_rapidfuzz:
+        print("   ⚠️  RapidFuzz not installed, only testing the word-overlap fallback")
+    
+    try:
+        for use_rapidfuzz in modes:
+            reconciliation.HAS_RAPIDFUZZ = use_rapidfuzz
+            bank_entries, system_transactions = build_scoring_fixture()
+            
+            matches = score_matches(bank_entries, system_transactions)
+            suggestions = [
+                [(s['system_transaction_id'], s['confidence_score']) for s in match['suggested_matches']]
+                for match in matches
+            ]
+            
+            label = "RapidFuzz" if use_rapidfuzz else "word overlap"
+            assert suggestions[0] == expected[use_rapidfuzz], f"{label}: {suggestions[0]}"
+            assert suggestions[1] == expected_coffee, f"{label}: {suggestions[1]}"
+            
+            # The windowed scoring must agree with the per-pair reference scorer
+            transactions_by_id = {txn['_id']: txn for txn in system_transactions}
+            for bank_entry, match in zip(bank_entries, matches):
+                assert match['bank_entry_id'] == bank_entry['id']
+                for suggestion in match['suggested_matches']:
+                    system_txn = transactions_by_id[suggestion['system_transaction_id']]
+                    assert suggestion['confidence_score'] == calculate_match_confidence(bank_entry, system_txn)
+            
+            print(f"✅ Scoring with {label} matches the pinned suggestions")
+            for system_id, score in suggestions[0]:
+                print(f"   - {system_id}: {score}")
+        
+        return True
+    except Exception as e:
+        print(f"❌ Match scoring failed: {str(e)}")
+        return False
+    finally:
+        reconciliation.HAS_RAPIDFUZZ = has_rapidfuzz
+
 async def test_full_reconciliation_workflow():
     """Test complete reconciliation workflow"""
     print("\n🧪 Testing Full Reconciliation Workflow...")
@@ -304,7 +455,9 @@ async def main():
     results = {
         'CSV Parsing': await test_csv_parsing(),
         'OFX Parsing': await test_ofx_parsing(),
+        'SGML OFX Parsing': await test_sgml_ofx_parsing(),
         'Matching Algorithm': await test_matching_algorithm(),
+        'Match Scoring': await test_score_matches(),
         'Collections': await test_reconciliation_collections(),
         'Full Workflow': await test_full_reconciliation_workflow(),
     }